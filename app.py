@@ -1,7 +1,11 @@
 from config import Config
-from flask import Flask, current_app
+from flask import Flask, current_app, jsonify
 from flask_cors import CORS
+from infrastructure.background import init_background_tasks
+from infrastructure.cache import init_profile_cache
 from infrastructure.clients import init_clients
+from infrastructure.identity_map import init_identity_map
+from infrastructure.image_pool import init_image_pool
 from infrastructure.logger import setup_logger
 from routes.connections import connection_bp
 from routes.context_route import context_bp
@@ -12,10 +16,17 @@ from routes.message_engine import generate_bp
 from routes.ocr import ocr_bp
 from routes.onboarding import onboarding_bp
 from routes.user_management import user_management_bp
+from services.account_deletion import resume_account_deletions
+from services.example_retrieval import start_example_index_load
+from services.search_indexer import start_search_indexer
+from utils.uploads import SpooledUploadRequest
+from werkzeug.exceptions import RequestEntityTooLarge
+import os
 
 
 def create_app():
     app = Flask(__name__)
+    app.request_class = SpooledUploadRequest
     CORS(app)
     app.config.from_object("config.Config")
     app.register_blueprint(onboarding_bp, url_prefix="/onboarding")
@@ -27,7 +38,14 @@ def create_app():
     app.register_blueprint(user_management_bp, url_prefix="/user")
     app.register_blueprint(context_bp, url_prefix="/context")
     app.register_blueprint(generate_bp, url_prefix="/generate")
-    
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def request_too_large(e):
+        return jsonify({"error": "Request body exceeds the upload size limit."}), 413
+
+    init_identity_map(app)
+    init_profile_cache(app)
+
     level = app.config.get("LOGGER_LEVEL", "INFO")
     setup_logger(name="spurly", level=level, toFile=True, fileName="spurly.log")
 
@@ -35,6 +53,15 @@ def create_app():
 
 if __name__ == "__main__":
     app = create_app()
-    with app.app_context():
-        init_clients(app)
+    # debug=True runs this file in a reloader parent that only watches for changes, and again in
+    # the child it starts (WERKZEUG_RUN_MAIN=true) that serves requests. Start workers and resume
+    # deletion jobs in the child only, so there is one indexer, one image pool and one run per job.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        with app.app_context():
+            init_clients(app)
+            init_image_pool(app)
+            init_background_tasks(app)
+            start_search_indexer(app)
+            start_example_index_load(app)
+            resume_account_deletions(app)
     app.run(debug=True)
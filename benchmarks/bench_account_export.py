@@ -0,0 +1,99 @@
+"""
+Throughput and peak memory of the streaming account export vs account size.
+
+    python -m benchmarks.bench_account_export [--conversations 200 1000 5000] [--spurs-per-conversation 2] [--page-size 100]
+
+Each synthetic account (one connection per 20 conversations, 10-300 messages per conversation,
+so the longer ones use the compact encoding) is written to a temporary SQLite repository, then
+exported plain and gzipped. MB/s is NDJSON (uncompressed) bytes per second. "stream peak" is
+the Python heap high-water mark while consuming the stream chunk by chunk; "buffered peak" is
+the same export joined into one body, as a non-streaming endpoint would build it.
+"""
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from services.account_export import stream_account_export
+from services.repository import SQLiteRepository, set_repository
+from services.storage_service import build_conversation_preview
+from utils.conversation_codec import encode_for_storage
+import argparse
+import numpy as np
+import os
+import tempfile
+import time
+import tracemalloc
+
+USER_ID = "u1"
+WORDS = ["hey", "sounds", "good", "what", "are", "you", "up", "to", "tonight", "haha", "coffee",
+         "tomorrow", "love", "that", "place", "weekend", "hike", "dog", "movie", "sure", "lol",
+         "dinner", "concert", "beach", "museum", "brunch", "tacos", "pizza", "running", "yoga"]
+
+
+def build_account(repo, conversations: int, spurs_per_conversation: int, rng):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    repo.set_user(USER_ID, {"user_id": USER_ID, "name": "Bench", "age": 30, "created_at": start})
+    for c in range(max(1, conversations // 20)):
+        repo.set_connection(USER_ID, f"{USER_ID}:p{c}", {"connection_id": f"{USER_ID}:p{c}", "name": f"Connection {c}", "age": 29})
+    for i in range(conversations):
+        messages = [{"sender": "user" if rng.random() < 0.5 else "connection",
+                     "text": " ".join(rng.choice(WORDS, size=int(rng.integers(2, 18))))}
+                    for _ in range(int(rng.integers(10, 300)))]
+        created_at = start + timedelta(minutes=i)
+        repo.save_conversation(USER_ID, f"{USER_ID}:c{i}", {
+            "user_id": USER_ID, "conversation_id": f"{USER_ID}:c{i}", "connection_id": f"{USER_ID}:p{i % 20}",
+            "conversation": encode_for_storage(messages, 100, 2048), "created_at": created_at,
+            **build_conversation_preview(messages, 120),
+        })
+        for s in range(spurs_per_conversation):
+            repo.set_spur(USER_ID, f"{USER_ID}:s{i}-{s}", {"spur_id": f"{USER_ID}:s{i}-{s}", "variant": "main_spur",
+                                                           "text": " ".join(rng.choice(WORDS, size=12)), "created_at": created_at})
+
+
+def consume(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--spurs-per-conversation", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    app = Flask(__name__)
+    app.config["ACCOUNT_EXPORT_PAGE_SIZE"] = args.page_size
+
+    print(f"{'convos':>7} {'docs':>7} | {'gzip':>5} {'bytes':>12} {'seconds':>8} {'MB/s':>7} {'docs/s':>8} | "
+          f"{'stream peak':>11} {'buffered peak':>13}")
+    with app.app_context(), tempfile.TemporaryDirectory() as tmp:
+        for count in args.conversations:
+            repo = SQLiteRepository(os.path.join(tmp, f"account_{count}.db"))
+            set_repository(repo)
+            build_account(repo, count, args.spurs_per_conversation, rng)
+            docs = 1 + max(1, count // 20) + count * (1 + args.spurs_per_conversation)
+
+            ndjson_size = None
+            for compress in (False, True):
+                started = time.perf_counter()
+                size = consume(stream_account_export(USER_ID, compress=compress))
+                seconds = time.perf_counter() - started
+                ndjson_size = ndjson_size or size
+                stream_peak = peak_memory(lambda: consume(stream_account_export(USER_ID, compress=compress)))
+                buffered_peak = peak_memory(lambda: b"".join(stream_account_export(USER_ID, compress=compress)))
+                print(f"{count:>7} {docs:>7} | {'yes' if compress else 'no':>5} {size:>12,} {seconds:>8.2f} "
+                      f"{ndjson_size / seconds / 1e6:>7.1f} {docs / seconds:>8,.0f} | "
+                      f"{stream_peak / 1e6:>9.1f}MB {buffered_peak / 1e6:>11.1f}MB")
+    set_repository(None)
+
+
+if __name__ == "__main__":
+    main()
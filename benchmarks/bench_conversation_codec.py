@@ -0,0 +1,74 @@
+"""
+Stored size and encode/decode cost of the compact conversation encoding vs message count.
+
+    python -m benchmarks.bench_conversation_codec [--counts 10 100 1000 5000 20000] [--repeat 20]
+
+"array" is the size of the plain array-of-maps field under Firestore's storage size rules
+(string = UTF-8 bytes + 1, map = field names + values); "compact" is the encoded blob. Times
+are per conversation: encode, full decode, and Conversation.from_dict with lazy messages (no
+element access) vs the eager decode it defers.
+"""
+from class_defs.conversation_def import Conversation
+from datetime import datetime, timezone
+from utils.conversation_codec import decode_messages, encode_messages
+import argparse
+import numpy as np
+import time
+
+FIRESTORE_MAX_DOCUMENT_BYTES = 1_048_576
+WORDS = ["hey", "sounds", "good", "what", "are", "you", "up", "to", "tonight", "haha", "coffee",
+         "tomorrow", "love", "that", "place", "weekend", "hike", "dog", "movie", "sure", "lol",
+         "dinner", "concert", "beach", "museum", "brunch", "tacos", "pizza", "running", "yoga"]
+
+
+def make_messages(count: int, rng) -> list[dict]:
+    return [{"speaker": "user" if rng.random() < 0.5 else "other",
+             "text": " ".join(rng.choice(WORDS, size=int(rng.integers(2, 18))))} for _ in range(count)]
+
+
+def firestore_size(value) -> int:
+    """ Storage size of a value under Firestore's documented size rules. """
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, dict):
+        return sum(firestore_size(k) + firestore_size(v) for k, v in value.items())
+    if isinstance(value, list):
+        return sum(firestore_size(v) for v in value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 8
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'messages':>8} | {'array':>10} {'compact':>10} {'ratio':>6} | {'encode':>9} {'decode':>9} | {'from_dict lazy':>14} {'eager':>9}")
+    for count in args.counts:
+        messages = make_messages(count, rng)
+        blob = encode_messages(messages)
+        assert decode_messages(blob) == messages
+        array_size = firestore_size(messages)
+        doc = {"user_id": "u1", "conversation_id": "u1:c1", "created_at": datetime.now(timezone.utc), "conversation": blob}
+
+        encode_ms = timed(lambda: encode_messages(messages), args.repeat)
+        decode_ms = timed(lambda: decode_messages(blob), args.repeat)
+        lazy_ms = timed(lambda: len(Conversation.from_dict(doc).conversation), args.repeat)
+        eager_ms = timed(lambda: Conversation.from_dict(doc).conversation[0], args.repeat)
+        over = " (array over 1 MiB limit)" if array_size > FIRESTORE_MAX_DOCUMENT_BYTES else ""
+        print(f"{count:>8} | {array_size:>10,} {len(blob):>10,} {array_size / len(blob):>5.1f}x | "
+              f"{encode_ms:>7.3f}ms {decode_ms:>7.3f}ms | {lazy_ms:>12.4f}ms {eager_ms:>7.3f}ms{over}")
+
+
+if __name__ == "__main__":
+    main()
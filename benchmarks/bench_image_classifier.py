@@ -0,0 +1,63 @@
+"""
+Accuracy and throughput of the heuristic vs trained image classifiers.
+
+    python -m benchmarks.bench_image_classifier [--per-class 200] [--fixtures DIR] [--save PATH]
+
+Trains on one synthetic split and evaluates on a held-out split generated with a different
+seed (plus fixtures, if given, which are only used for evaluation).
+"""
+from services.classifier_dataset import build_dataset, load_fixtures
+from services.classifiers import classify_image_heuristic
+from services.image_model import CLASSES, ImageClassifierModel, extract_features
+import argparse
+import logging
+import numpy as np
+import time
+
+
+def evaluate(name: str, predict, images: list, labels: list):
+    started = time.perf_counter()
+    predictions = [CLASSES.index(p) if p in CLASSES else -1 for p in (predict(img) for img in images)]
+    elapsed = time.perf_counter() - started
+    predictions = np.array(predictions)
+    truth = np.array(labels)
+    accuracy = float((predictions == truth).mean())
+    print(f"\n{name}: accuracy={accuracy:.3f}  throughput={len(images) / elapsed:.1f} img/s  "
+          f"latency={elapsed / len(images) * 1000:.2f} ms/img")
+    print("  confusion (rows=truth, cols=predicted): " + ", ".join(CLASSES))
+    for label, class_name in enumerate(CLASSES):
+        row = [int(np.sum((truth == label) & (predictions == p))) for p in range(len(CLASSES))]
+        print(f"  {class_name:>16}: {row}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--per-class", type=int, default=200)
+    parser.add_argument("--fixtures", default=None, help="Directory with <class>/* real images (evaluation only)")
+    parser.add_argument("--save", default=None, help="Save trained weights to this .npz path")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # The heuristic classifier logs every decision
+
+    train_images, train_labels = build_dataset(args.per_class, seed=1)
+    test_images, test_labels = build_dataset(max(args.per_class // 2, 1), seed=2)
+    if args.fixtures:
+        fixture_images, fixture_labels = load_fixtures(args.fixtures)
+        test_images += fixture_images
+        test_labels += fixture_labels
+
+    started = time.perf_counter()
+    features = np.stack([extract_features(img) for img in train_images])
+    model = ImageClassifierModel.train(features, np.array(train_labels))
+    print(f"Trained on {len(train_images)} images in {time.perf_counter() - started:.2f}s; "
+          f"evaluating on {len(test_images)} images.")
+
+    evaluate("heuristic", classify_image_heuristic, test_images, test_labels)
+    evaluate("trained", lambda img: model.predict(img)[0], test_images, test_labels)
+
+    if args.save:
+        model.save(args.save)
+        print(f"\nSaved weights to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Photo forwarder latency against the local stub model server.
+
+    python -m benchmarks.bench_photo_forwarder [--requests 200] [--concurrency 16] [--delay-ms 50]
+
+Compares the old per-call requests.Session with the pooled keep-alive session and the async
+httpx client, all posting the same payload to benchmarks.photo_model_stub, so the numbers
+isolate connection handling. The one-off downscale cost and payload saving are reported
+separately (in production the downscale runs in the image process pool).
+"""
+from benchmarks.photo_model_stub import start_stub_server
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils import photo_forwarder
+import argparse
+import asyncio
+import base64
+import cv2
+import logging
+import numpy as np
+import requests
+import time
+
+
+def make_photo(width: int = 3024, height: int = 4032) -> bytes:
+    rng = np.random.default_rng(0)
+    img = cv2.resize(rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8), (width, height))
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def per_call_session(url: str, image_bytes: bytes) -> dict:
+    """ The previous implementation: new session + adapter per call, no timeout. """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount('http://', HTTPAdapter(max_retries=retry))
+    resp = session.post(url, json={'image_base64': base64.b64encode(image_bytes).decode('utf-8')})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def report(name: str, latencies: list, elapsed: float):
+    latencies = np.array(latencies) * 1000
+    print(f"{name:>18}: {len(latencies) / elapsed:7.1f} req/s  p50={np.percentile(latencies, 50):6.1f}ms  "
+          f"p95={np.percentile(latencies, 95):6.1f}ms")
+
+
+def run_threaded(name: str, call, total: int, concurrency: int, app: Flask):
+    def timed(_):
+        with app.app_context():
+            started = time.perf_counter()
+            call()
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(timed, range(total)))
+    report(name, latencies, time.perf_counter() - started)
+
+
+async def run_async(total: int, concurrency: int, image_bytes: bytes, settings: dict):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            await photo_forwarder.forward_full_image_to_model_async(image_bytes, settings)
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(timed() for _ in range(total)))
+    report("async httpx", latencies, time.perf_counter() - started)
+    await photo_forwarder.close_photo_model_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--delay-ms", type=float, default=50, help="Simulated model latency")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    server, url = start_stub_server(delay_ms=args.delay_ms)
+    app = Flask(__name__)
+    app.config.update(PHOTO_MODEL_ENDPOINT_URL=url, PHOTO_MODEL_POOL_SIZE=args.concurrency)
+    photo_bytes = make_photo()
+    with app.app_context():
+        settings = photo_forwarder._settings()
+        started = time.perf_counter()
+        payload = photo_forwarder.build_photo_payload(photo_bytes, settings)
+        downscale_ms = (time.perf_counter() - started) * 1000
+    image_bytes = base64.b64decode(payload["image_base64"])
+    print(f"Stub at {url}; {args.requests} requests at concurrency {args.concurrency}")
+    print(f"Downscale: {len(photo_bytes)} -> {len(image_bytes)} bytes in {downscale_ms:.1f}ms")
+
+    run_threaded("per-call session", lambda: per_call_session(url, image_bytes), args.requests, args.concurrency, app)
+    run_threaded("pooled session", lambda: photo_forwarder.forward_full_image_to_model(image_bytes),
+                 args.requests, args.concurrency, app)
+    with app.app_context():
+        asyncio.run(run_async(args.requests, args.concurrency, image_bytes, settings))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Recall and latency of the few-shot retrieval index (brute force vs IVF) from 10^4 to 10^6 items.
+
+    python -m benchmarks.bench_retrieval [--sizes 10000 100000 1000000] [--queries 200] [--nprobe 4 8 16 32]
+
+Part 1 embeds synthetic Party A / Party B conversations with HashedTfidfEmbedder and reports
+embedding throughput and brute-force latency on real TF-IDF vectors.
+Part 2 scales the index with clustered synthetic unit vectors (embedding 10^6 texts would
+dominate the run) and reports recall@k of IVF against exact brute-force results.
+"""
+from services.example_retrieval import HashedTfidfEmbedder, VectorIndex
+import argparse
+import logging
+import numpy as np
+import time
+
+WORDS = ["hey", "sounds", "good", "what", "are", "you", "up", "to", "tonight", "haha", "coffee",
+         "tomorrow", "love", "that", "place", "weekend", "hike", "dog", "movie", "sure", "lol",
+         "dinner", "concert", "beach", "museum", "brunch", "tacos", "pizza", "running", "yoga",
+         "travel", "paris", "tokyo", "books", "podcast", "guitar", "painting", "soccer", "climbing"]
+SITUATIONS = ["cold_open", "reengagement", "recovery", "follow_up"]
+
+
+def make_conversation(rng) -> str:
+    theme = rng.choice(WORDS, size=4)
+    lines = []
+    for turn in range(int(rng.integers(2, 10))):
+        words = list(rng.choice(WORDS, size=int(rng.integers(3, 10)))) + list(rng.choice(theme, size=2))
+        rng.shuffle(words)
+        lines.append(f"{'Party A' if turn % 2 == 0 else 'Party B'}: {' '.join(words)}")
+    return f"{rng.choice(SITUATIONS)} " + "\n".join(lines)
+
+
+def clustered_vectors(count: int, dim: int, clusters: int, rng, chunk: int = 100000):
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    for start in range(0, count, chunk):
+        n = min(chunk, count - start)
+        vectors = centers[rng.integers(0, clusters, size=n)] + rng.normal(scale=0.8, size=(n, dim)).astype(np.float32)
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_searches(index: VectorIndex, queries: np.ndarray, k: int, exact: bool):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        ids, _ = index.search(query, k, exact=exact)
+        latencies.append(time.perf_counter() - started)
+        results.append(set(ids.tolist()))
+    return results, np.array(latencies) * 1000
+
+
+def embedding_benchmark(count: int, queries: int, k: int, rng):
+    texts = [make_conversation(rng) for _ in range(count)]
+    embedder = HashedTfidfEmbedder()
+    started = time.perf_counter()
+    vectors = embedder.fit_embed(texts)
+    elapsed = time.perf_counter() - started
+    index = VectorIndex(embedder.dim, ivf_threshold=count + 1)
+    index.add(vectors)
+    query_vectors = np.stack([embedder.embed(make_conversation(rng)) for _ in range(queries)])
+    _, latencies = timed_searches(index, query_vectors, k, exact=True)
+    print(f"Embedding: {count / elapsed:.0f} texts/s ({embedder.dim} dims); "
+          f"brute force over {count} text vectors p50={np.percentile(latencies, 50):.2f}ms")
+
+
+def scale_benchmark(size: int, dim: int, queries: int, k: int, nprobes: list, rng):
+    index = VectorIndex(dim, ivf_threshold=size + 1)  # Train explicitly below
+    for vectors in clustered_vectors(size, dim, max(64, size // 1000), rng):
+        index.add(vectors)
+    sample = index.vectors[rng.integers(0, size, size=queries)]
+    query_vectors = sample + rng.normal(scale=0.05, size=sample.shape).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    truth, exact_latencies = timed_searches(index, query_vectors, k, exact=True)
+    print(f"\n{size:>8} items: brute force p50={np.percentile(exact_latencies, 50):7.2f}ms  "
+          f"p95={np.percentile(exact_latencies, 95):7.2f}ms")
+
+    started = time.perf_counter()
+    index.train_ivf()
+    print(f"{'':>14} IVF train ({len(index.centroids)} lists): {time.perf_counter() - started:.1f}s")
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        found, latencies = timed_searches(index, query_vectors, k, exact=False)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{'':>14} IVF nprobe={nprobe:<3} recall@{k}={recall:.3f}  p50={np.percentile(latencies, 50):6.2f}ms  "
+              f"p95={np.percentile(latencies, 95):6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--texts", type=int, default=10000, help="Conversations embedded in part 1")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    rng = np.random.default_rng(0)
+    embedding_benchmark(args.texts, args.queries, args.k, rng)
+    for size in args.sizes:
+        scale_benchmark(size, args.dim, args.queries, args.k, args.nprobe, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Indexing and query throughput of the embedded SQLite FTS5 search backend vs corpus size.
+
+    python -m benchmarks.bench_search [--sizes 1000 10000 50000] [--users 200] [--queries 500] [--path :memory:]
+
+Each corpus is a set of synthetic conversations spread over --users users, indexed with the
+same records save_conversation builds. Queries are one- and two-word keyword searches scoped
+to a random user, half of them with a date range, at the default page size.
+"""
+from services.search_backend import SQLiteSearchBackend
+import argparse
+import numpy as np
+import os
+import tempfile
+import time
+
+WORDS = ["hey", "sounds", "good", "what", "are", "you", "up", "to", "tonight", "haha", "coffee",
+         "tomorrow", "love", "that", "place", "weekend", "hike", "dog", "movie", "sure", "lol",
+         "dinner", "concert", "beach", "museum", "brunch", "tacos", "pizza", "running", "yoga",
+         "travel", "paris", "tokyo", "books", "podcast", "guitar", "painting", "soccer", "climbing"]
+SITUATIONS = ["cold_open", "reengagement", "recovery", "follow_up", None]
+BASE_TIMESTAMP = 1_700_000_000
+
+
+def make_records(count: int, users: int, rng) -> list[dict]:
+    records = []
+    for i in range(count):
+        lines = []
+        for _ in range(int(rng.integers(4, 16))):
+            sender = "user" if rng.random() < 0.5 else "connection"
+            lines.append(f"{sender}: " + " ".join(rng.choice(WORDS, size=int(rng.integers(3, 12)))))
+        user = int(rng.integers(0, users))
+        records.append({
+            "objectID": f"u{user}:{i:08x}:c",
+            "user_id": f"u{user}",
+            "text": "\n".join(lines),
+            "created_at_timestamp": BASE_TIMESTAMP + int(rng.integers(0, 365 * 86400)),
+            "connection_id": f"u{user}:p{int(rng.integers(0, 5))}",
+            "situation": rng.choice(SITUATIONS),
+        })
+    return [{k: v for k, v in r.items() if v is not None} for r in records]
+
+
+def run(size: int, users: int, queries: int, path: str, rng):
+    backend = SQLiteSearchBackend(path)
+    index_name = f"bench_{size}"
+    records = make_records(size, users, rng)
+
+    started = time.perf_counter()
+    for i in range(0, len(records), 500):  # Same batch size the search indexer drains with
+        backend.save_objects(index_name, records[i:i + 500])
+    index_seconds = time.perf_counter() - started
+
+    latencies = []
+    total_hits = 0
+    for _ in range(queries):
+        query = " ".join(rng.choice(WORDS, size=int(rng.integers(1, 3))))
+        filters = {}
+        if rng.random() < 0.5:
+            start = BASE_TIMESTAMP + int(rng.integers(0, 300 * 86400))
+            filters = {"created_at_from": start, "created_at_to": start + 60 * 86400}
+        started = time.perf_counter()
+        result = backend.search(index_name, query, f"u{int(rng.integers(0, users))}", filters, hits_per_page=20)
+        latencies.append(time.perf_counter() - started)
+        total_hits += result["nbHits"]
+
+    latencies = np.array(latencies) * 1000
+    print(f"{size:>8} docs: index {size / index_seconds:9.0f} docs/s | query {queries / (latencies.sum() / 1000):7.0f} q/s  "
+          f"p50={np.percentile(latencies, 50):6.2f}ms  p95={np.percentile(latencies, 95):6.2f}ms  "
+          f"avg hits/query={total_hits / queries:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--path", default=None, help="SQLite file (default: a temporary file); ':memory:' for in-memory")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or os.path.join(tmp, "bench_search.db")
+        print(f"SQLite FTS5 backend at {path}, {args.users} users, {args.queries} queries per size")
+        for size in args.sizes:
+            run(size, args.users, args.queries, path, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Request size and preprocessing cost of photo trait inference: base64 inlined into the text
+prompt (previous approach) vs downscaled JPEG image parts.
+
+    python -m benchmarks.bench_trait_images [--photos 1 3 6] [--width 3024] [--height 4032] [--detail low]
+
+The model is replaced by a stub client, so this measures what is sent, not model latency. Text
+tokens are estimated at 4 characters per token (base64 tokenizes worse than prose, so the inline
+figure is a lower bound); image-part tokens follow OpenAI's published vision formula (85 per
+image at "low" detail; 85 + 170 per 512px tile at "high"). The stub reports those numbers as
+usage, so the per-call figures also come back through get_trait_inference_stats().
+"""
+from flask import Flask
+from services import repository
+from types import SimpleNamespace
+from utils import trait_manager
+import argparse
+import base64
+import cv2
+import json
+import logging
+import math
+import numpy as np
+import time
+
+CHARS_PER_TOKEN = 4
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    img = cv2.resize(rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8), (width, height))
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def image_tokens(jpeg: bytes, detail: str) -> int:
+    if detail == "low":
+        return 85
+    height, width = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR).shape[:2]
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class StubCompletions:
+    """ Counts request bytes and reports estimated token usage instead of calling a model. """
+
+    def __init__(self, detail: str):
+        self.detail = detail
+        self.request_bytes = 0
+
+    def create(self, **kwargs):
+        self.request_bytes += len(json.dumps(kwargs["messages"]))
+        tokens = 0
+        for message in kwargs["messages"]:
+            content = message["content"]
+            parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+            for part in parts:
+                if part["type"] == "text":
+                    tokens += len(part["text"]) // CHARS_PER_TOKEN
+                else:
+                    jpeg = base64.b64decode(part["image_url"]["url"].split(",", 1)[1])
+                    tokens += image_tokens(jpeg, self.detail)
+        images = sum(1 for message in kwargs["messages"] if isinstance(message["content"], list)
+                     for part in message["content"] if part["type"] == "image_url")
+        traits = {"images": [{"personality_traits": [{"personality_trait": "curious", "confidence_score": 0.8}]}] * images}
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=tokens, completion_tokens=60),
+                               choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(traits)))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--width", type=int, default=3024)
+    parser.add_argument("--height", type=int, default=4032)
+    parser.add_argument("--detail", default="low", choices=["low", "high"])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    app = Flask(__name__)
+    app.root_path = "."
+    app.config.update(AI_MODEL="stub", AI_MESSAGES_ROLE_USER="user", AI_TEMPERATURE_RETRY=0.65, STORAGE_BACKEND="memory",
+                      TRAIT_IMAGE_DETAIL=args.detail, TRAIT_IMAGE_MAX_SIDE=512 if args.detail == "low" else 1024)
+    completions = StubCompletions(args.detail)
+    trait_manager.get_openai_client = lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    print(f"{'photos':>6} | {'inline b64 bytes':>16} {'~tokens':>10} | {'parts bytes':>11} {'tokens':>7} {'requests':>8} "
+          f"{'prep ms':>8} | {'token cut':>9}")
+    with app.app_context():
+        template = trait_manager._load_inference_prompt()
+        for count in args.photos:
+            photos = [make_photo(args.width, args.height, seed) for seed in range(count)]
+            inline_prompt = template + "\n\nImages: \n" + json.dumps([base64.b64encode(p).decode("utf-8") for p in photos])
+            inline_tokens = len(inline_prompt) // CHARS_PER_TOKEN
+
+            trait_manager._stats.clear()
+            trait_manager._cache = None  # Measure cold inference, not the per-image trait cache or its store
+            repository._repository = None
+            completions.request_bytes = 0
+            started = time.perf_counter()
+            trait_manager.prepare_trait_images(photos)
+            prep_ms = (time.perf_counter() - started) * 1000
+            trait_manager.infer_personality_traits_from_pics("bench-user", photos)
+            stats = trait_manager.get_trait_inference_stats()["pics"]
+            print(f"{count:>6} | {len(inline_prompt):>16,} {inline_tokens:>10,} | {completions.request_bytes:>11,} "
+                  f"{stats['prompt_tokens']:>7,} {stats['calls']:>8} {prep_ms:>8.1f} | {inline_tokens / stats['prompt_tokens']:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Local stand-in for the photo model endpoint, for load-testing the photo path.
+
+    python -m benchmarks.photo_model_stub [--port 8765] [--delay-ms 50]
+
+Accepts POST {"image_base64": ...} and answers like the real endpoint:
+{"type": "photo_analysis", "traits": [...], "image_bytes": n}. Point the app at it with
+PHOTO_MODEL_ENDPOINT_URL=http://127.0.0.1:8765/.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import base64
+import json
+import threading
+import time
+
+STUB_TRAITS = [
+    {"trait": "Outdoorsy", "confidence": 0.8},
+    {"trait": "Has a dog", "confidence": 0.6},
+]
+
+
+def make_handler(delay_seconds: float):
+    class PhotoModelStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                image_size = len(base64.b64decode(body["image_base64"]))
+            except (ValueError, KeyError):
+                self._send(400, {"error": "expected JSON body with image_base64"})
+                return
+            if delay_seconds:
+                time.sleep(delay_seconds)
+            self._send(200, {"type": "photo_analysis", "traits": STUB_TRAITS, "image_bytes": image_size})
+
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PhotoModelStubHandler
+
+
+def start_stub_server(port: int = 0, delay_ms: float = 50) -> tuple[ThreadingHTTPServer, str]:
+    """ Starts the stub in a daemon thread. Returns (server, url); port 0 picks a free port. """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay_ms / 1000.0))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.delay_ms / 1000.0))
+    print(f"Photo model stub listening on http://127.0.0.1:{args.port}/ (delay {args.delay_ms}ms)")
+    server.serve_forever()
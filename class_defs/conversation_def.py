@@ -10,13 +10,15 @@ Defines a dataclass named Conversation with the following fields:
     created_at: Datetime indicating when the conversation was initiated.
     
     to_dict returns a Conversation object formatted as a python dictionary.
-    from_dict converts a python dictionary into a custom Conversation object.
+    from_dict converts a python dictionary into a custom Conversation object. Messages stored in the
+        compact encoding (utils/conversation_codec.py) are decoded lazily, on first access.
 """
 
 from dataclasses import dataclass
 from dataclasses import field as attr_field
 from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
+from utils.conversation_codec import LazyMessages, is_encoded
 
 @dataclass
 class Conversation:
@@ -34,7 +36,7 @@ class Conversation:
         return {
             "user_id": self.user_id,
             "conversation_id": self.conversation_id,
-            "conversation": self.conversation,
+            "conversation": self.conversation if isinstance(self.conversation, list) else list(self.conversation),
             "connection_id": self.connection_id,
             "situation": self.situation,
             "topic": self.topic,
@@ -45,18 +47,30 @@ class Conversation:
     @classmethod
     def from_dict(cls, data):
         created_at_str = data.get("created_at")
+        messages = data.get("conversation", [])
+        if is_encoded(messages):
+            messages = LazyMessages(messages)
 
         return cls(
             user_id=data["user_id"],
             conversation_id=data["conversation_id"],
-            conversation=data.get("conversation", []),
+            conversation=messages,
             connection_id=data.get("connection_id"),
             situation=data.get("situation"),
             topic=data.get("topic"),
             spurs=data.get("spurs", {}),
-            created_at=datetime.fromisoformat(created_at_str.replace("Z", "+00:00")) or datetime.now(timezone.utc)
+            created_at=cls._parse_created_at(created_at_str)
         )
 
+    @staticmethod
+    def _parse_created_at(value) -> datetime:
+        # Firestore returns datetimes; JSON payloads carry ISO strings
+        if isinstance(value, datetime):
+            return value
+        if value:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return datetime.now(timezone.utc)
+
     @classmethod
     def get_attr(cls, convo_instance: "Conversation", attr_key: str):
         """
@@ -77,8 +91,13 @@ class Conversation:
         Each message in the conversation list is expected to be a dictionary
         with at least a 'sender' and 'text' key. Adjust if your actual structure differs.
         """
+        return self.messages_as_string(self.conversation)
+
+    @staticmethod
+    def messages_as_string(messages) -> str:
+        """ Formats messages the way conversation_as_string does, e.g. just the newly appended ones. """
         lines = []
-        for message in self.conversation:
+        for message in messages:
             sender = message.get("sender", "Unknown")
             text = message.get("text", "")
             lines.append(f"{sender}: {text}")
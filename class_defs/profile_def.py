@@ -26,6 +26,8 @@ UserProfile (inherits from BaseProfile):
 ConnectionProfile (inherits from BaseProfile):
     connection_id: str - Unique identifier for the connection.
     user_id: str - Identifier for the associated user (each connection is linked to one user).
+    traits_status: Optional[str] - "pending" while personality traits are inferred in the background,
+        then "complete" or "failed"; None for connections created without images or links.
     
 
     from_dict converts a python dictionary into a custom ConnectionProfile object.
@@ -87,6 +89,8 @@ class ConnectionProfile(BaseProfile):
     connection_id: str = ""
     # The associated user's ID; every connection must be linked to a user.
     user_id: str = ""
+    # Background trait enrichment state (see connection_service.enrich_connection_traits)
+    traits_status: Optional[str] = None
 
     @classmethod
     def from_dict(cls, data):
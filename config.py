@@ -17,6 +17,20 @@ class Config:
     ALGOLIA_CONVERSATIONS_INDEX = os.getenv("ALGOLIA_CONVERSATIONS_INDEX", "conversations")
     ALGOLIA_SEARCH_RESULTS_LIMIT = os.getenv("ALGOLIA_SEARCH_RESULTS_LIMIT", 20)
 
+    ## Keyword search backend: "algolia", "sqlite" (embedded FTS5), or "auto" (Algolia when configured)
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto")
+    SEARCH_SQLITE_PATH = os.environ.get("SEARCH_SQLITE_PATH", "search_index.db")
+
+    FIRESTORE_GET_ALL_CHUNK_SIZE = 100  # Document refs per batched get_all when hydrating search hits
+
+    ## Search outbox: index/delete intents written with the data, applied in batches by the indexer
+    SEARCH_OUTBOX_COLLECTION = "search_outbox"
+    SEARCH_INDEXER_INTERVAL = float(os.environ.get("SEARCH_INDEXER_INTERVAL", 5.0))  # seconds between polls
+    SEARCH_INDEXER_COALESCE_DELAY = 0.5  # seconds to wait after a write so bursts share one drain
+    SEARCH_INDEXER_BATCH_SIZE = int(os.environ.get("SEARCH_INDEXER_BATCH_SIZE", 500))
+    SEARCH_INDEXER_RETRY_BACKOFF = 2.0  # seconds, doubled per failed attempt
+    SEARCH_INDEXER_MAX_BACKOFF = 300.0
+
 
     
 
@@ -45,6 +59,18 @@ class Config:
         "playful_spur": "P"
         }
 
+    ## Conversations with at least this many messages are stored in the compact encoding
+    ## (utils/conversation_codec.py); -1 keeps every conversation as a plain message array
+    CONVERSATION_COMPACT_MIN_MESSAGES = int(os.environ.get("CONVERSATION_COMPACT_MIN_MESSAGES", 100))
+    CONVERSATION_COMPRESS_MIN_BYTES = 2048  # Compact payloads this large are also zlib-compressed
+    CONVERSATION_PREVIEW_CHARS = 120  # Length of the stored last-message preview shown in list views
+    CONVERSATION_APPEND_MAX_MESSAGES = 500  # Most messages accepted by one append request
+    CONVERSATION_SEGMENT_MAX_MESSAGES = 256  # Appends re-encode only a compact conversation's last segment, up to this size
+
+    ## Pagination (cursors are signed with SECRET_KEY)
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
     JWT_EXPIRATION = 60 * 60 * 24 * 7  # 1 week
 
     ID_DELIMITER = ":"    
@@ -67,5 +93,78 @@ class Config:
     
     ##Used as part of conversation_id to flag conversations extracted via OCR
     OCR_MARKER = "OCR"
+
+    ## Upload limits, enforced from Content-Length before the request body is buffered
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 48 * 1024 * 1024))
+    MAX_FORM_MEMORY_SIZE = 512 * 1024  # Non-file form fields
+    MAX_IMAGE_SIZE_BYTES = int(os.environ.get("MAX_IMAGE_SIZE_BYTES", 10 * 1024 * 1024))
+    OCR_UPLOAD_MAX_BYTES = MAX_IMAGE_SIZE_BYTES + 64 * 1024  # One image plus multipart overhead
+    CONNECTION_UPLOAD_MAX_BYTES = int(os.environ.get("CONNECTION_UPLOAD_MAX_BYTES", 40 * 1024 * 1024))
+
+    ## Process pool for CPU-bound image work (decode/classify/crop/encode). 0 workers runs inline.
+    IMAGE_POOL_WORKERS = int(os.environ.get("IMAGE_POOL_WORKERS", 2))
+    IMAGE_POOL_MAX_PENDING = int(os.environ.get("IMAGE_POOL_MAX_PENDING", 8))
+    IMAGE_POOL_QUEUE_TIMEOUT = float(os.environ.get("IMAGE_POOL_QUEUE_TIMEOUT", 2.0))  # seconds
+    IMAGE_POOL_TASK_TIMEOUT = float(os.environ.get("IMAGE_POOL_TASK_TIMEOUT", 30.0))  # seconds
+
+    ## Background tasks (anonymization, search indexing). 0 workers runs inline.
+    BACKGROUND_TASK_WORKERS = int(os.environ.get("BACKGROUND_TASK_WORKERS", 4))
+    BACKGROUND_TASK_MAX_RETRIES = int(os.environ.get("BACKGROUND_TASK_MAX_RETRIES", 3))
+    BACKGROUND_TASK_RETRY_BACKOFF = float(os.environ.get("BACKGROUND_TASK_RETRY_BACKOFF", 0.5))  # seconds, doubled per retry
+
+    ## Read-through cache for user/connection profiles (infrastructure/cache.py)
+    PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", 1024))  # Per process, per kind
+    PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", 300))  # seconds, with a cross-process shared tier
+    PROFILE_CACHE_SHARED = os.environ.get("PROFILE_CACHE_SHARED", "none")  # "none", "redis" (needs the redis package), or "memory" (local stand-in)
+    PROFILE_CACHE_REDIS_URL = os.environ.get("PROFILE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # TTL (seconds) without a cross-process tier, where other workers' writes are not seen; 0 disables caching.
+    # Only raise it for single-process deployments.
+    PROFILE_CACHE_UNSHARED_TTL = float(os.environ.get("PROFILE_CACHE_UNSHARED_TTL", 0))
+
+    ## Storage repository (services/repository.py): "firestore", "memory" or "sqlite"
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firestore")
+    STORAGE_SQLITE_PATH = os.environ.get("STORAGE_SQLITE_PATH", "spurly_storage.db")
+
+    ## Request-scoped identity map (infrastructure/identity_map.py): warn when one request reads more
+    ## single documents than this from one collection
+    IDENTITY_MAP_N_PLUS_ONE_THRESHOLD = int(os.environ.get("IDENTITY_MAP_N_PLUS_ONE_THRESHOLD", 10))
+
+    ## Background account deletion (services/account_deletion.py)
+    DELETION_JOBS_COLLECTION = "deletion_jobs"
+    ACCOUNT_DELETION_BATCH_SIZE = 500  # Writes per Firestore batch (500 is the Firestore maximum)
+
+    ## Streaming NDJSON account export (services/account_export.py)
+    ACCOUNT_EXPORT_PAGE_SIZE = 100  # Documents per repository read; bounds export memory
+    ACCOUNT_EXPORT_GZIP_LEVEL = 6
+
+    ## Few-shot retrieval of similar thumbs-up conversations (services/example_retrieval.py)
+    FEW_SHOT_EXAMPLES_K = int(os.environ.get("FEW_SHOT_EXAMPLES_K", 3))
+    FEW_SHOT_MIN_SCORE = 0.2  # Cosine similarity below which examples are not used
+    RETRIEVAL_EMBEDDING_DIM = 256
+    RETRIEVAL_IVF_THRESHOLD = 50000  # Index size at which search switches from brute force to IVF
+    RETRIEVAL_IVF_NPROBE = 8
+
+    ## Photo model endpoint (see benchmarks/photo_model_stub.py for a local stand-in)
+    PHOTO_MODEL_ENDPOINT_URL = os.environ.get("PHOTO_MODEL_ENDPOINT_URL", "https://your-model-endpoint")
+    PHOTO_MODEL_CONNECT_TIMEOUT = float(os.environ.get("PHOTO_MODEL_CONNECT_TIMEOUT", 3.0))  # seconds
+    PHOTO_MODEL_READ_TIMEOUT = float(os.environ.get("PHOTO_MODEL_READ_TIMEOUT", 20.0))  # seconds
+    PHOTO_MODEL_POOL_SIZE = int(os.environ.get("PHOTO_MODEL_POOL_SIZE", 10))
+    PHOTO_MODEL_MAX_SIDE = 1024  # Longest side (px) of images sent to the photo model
+    PHOTO_MODEL_JPEG_QUALITY = 85
+
+    ## Personality-trait inference from photos (utils/trait_manager.py). Images are downscaled and
+    ## sent as image parts; "low" detail is processed at 512px (fixed 85 tokens), so larger is wasted
+    TRAIT_IMAGE_DETAIL = os.environ.get("TRAIT_IMAGE_DETAIL", "low")  # "low", "high" or "auto"
+    TRAIT_IMAGE_MAX_SIDE = int(os.environ.get("TRAIT_IMAGE_MAX_SIDE", 512))  # Use 768-1024 with "high" detail
+    TRAIT_IMAGE_JPEG_QUALITY = 80
+    TRAIT_IMAGES_PER_REQUEST = 4  # Image budget per model request; more images are split into batches
+    TRAIT_IMAGE_REQUEST_MAX_BYTES = 4 * 1024 * 1024  # Encoded image bytes per model request
+    TRAIT_INFERENCE_CONCURRENCY = int(os.environ.get("TRAIT_INFERENCE_CONCURRENCY", 4))  # Model calls in flight per profile
+    TRAIT_CACHE_MAX_ENTRIES = 4096  # Per-image / per-URL trait results kept in process, in front of users/{uid}/item_traits
+    TRAIT_CACHE_TTL = 7 * 24 * 3600  # seconds; also the age after which stored item traits are inferred again and deleted
+
+    ## Image classifier: "heuristic" or "trained" (weights from `python -m services.image_model`)
+    IMAGE_CLASSIFIER = os.environ.get("IMAGE_CLASSIFIER", "heuristic")
+    IMAGE_CLASSIFIER_MODEL_PATH = os.environ.get("IMAGE_CLASSIFIER_MODEL_PATH", "resources/image_classifier.npz")
     
     DEFAULT_LOG_LEVEL = 20
\ No newline at end of file
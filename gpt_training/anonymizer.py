@@ -2,14 +2,48 @@ from class_defs.conversation_def import Conversation
 from class_defs.spur_def import Spur
 from datetime import datetime, timezone
 from flask import current_app, jsonify
-from infrastructure.clients import db
 from infrastructure.id_generator import generate_anonymous_user_id, generate_anonymous_conversation_id, generate_anonymous_connection_id, generate_anonymous_spur_id
 from infrastructure.logger import get_logger
 from services.connection_service import get_connection_profile
+from services.repository import TRAINING_BAD_SPURS, TRAINING_CONVERSATIONS, TRAINING_QUALITY_SPURS, get_repository
 from services.user_service import get_user_profile
+import re
 
 logger = get_logger(__name__)
 
+# Contact details replaced by scrub_text; URLs go before emails and handles they may contain
+SCRUB_PATTERNS = [
+	(re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE), "[link]"),
+	(re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "[email]"),
+	(re.compile(r"(?<!\w)@\w{2,}"), "[handle]"),
+	(re.compile(r"(?<![\w+])\+?\d[\d\s().-]{6,}\d(?!\w)"), "[phone]"),
+]
+
+def scrub_text(text: str, names: list[str] | None = None) -> str:
+	"""
+	Removes personal details from free text: links, email addresses, @handles, phone numbers,
+	and each word of the given names (e.g. the user's and the connection's), matched as whole
+	words regardless of case.
+
+	Args:
+		text: text to scrub
+			str
+		names: names of the people in the conversation
+			list[str] | None
+
+	Returns:
+		scrubbed: text with those details replaced by [link], [email], [handle], [phone] and [name]
+			str
+	"""
+	scrubbed = text or ""
+	for pattern, replacement in SCRUB_PATTERNS:
+		scrubbed = pattern.sub(replacement, scrubbed)
+	words = {word for name in names or [] for word in re.findall(r"\w{2,}", str(name or ""))}
+	if words:
+		name_pattern = re.compile(r"\b(?:" + "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+		scrubbed = name_pattern.sub("[name]", scrubbed)
+	return scrubbed
+
 def anonymize_conversation(original_conversation: Conversation) -> str:
 	"""
 	Replaces speaker labels with generic gender-based labels when available,
@@ -117,9 +151,7 @@ def save_anonymized_conversation(anonymized_conversation: Conversation):
 	anonymized_conversation_id = anonymized_conversation_dict.get("conversation_id", generate_anonymous_conversation_id(None))
 	
 	try:
-		training_ref = db.collection("training").document("conversations").collection("batch").document(anonymized_conversation_id)
-		
-		training_ref.set(anonymized_conversation_dict)
+		get_repository().set_training_record(TRAINING_CONVERSATIONS, anonymized_conversation_id, anonymized_conversation_dict)
 		return jsonify(f"Anonymized conversation successfully anonymized with id: {anonymized_conversation_id}")
 	except RuntimeError as e:
 		logger.error("[%s] Error: %s Save anonymized conversation failed", __name__, e)
@@ -189,11 +221,9 @@ def save_anonymized_spur(anonymized_spur: Spur, is_quality_spur) -> str:
 	anonymized_spur_id = anonymized_spur_dict.get("spur_id", generate_anonymous_spur_id(None))
 	try:
 		if is_quality_spur:
-			training_ref = db.collection("training").document("quality_spurs").collection("batch").document(anonymized_spur_id)
-			training_ref.set(anonymized_spur_dict)
+			get_repository().set_training_record(TRAINING_QUALITY_SPURS, anonymized_spur_id, anonymized_spur_dict)
 		elif not is_quality_spur:
-			training_ref = db.collection("training").document("bad_spurs").collection("batch").document(anonymized_spur_id)
-			training_ref.set(anonymized_spur_dict)
+			get_repository().set_training_record(TRAINING_BAD_SPURS, anonymized_spur_id, anonymized_spur_dict)
 
 		
 		
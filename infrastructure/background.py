@@ -0,0 +1,128 @@
+# infrastructure/background.py
+"""
+Background task runner for work that should not sit on the request path (training-data
+anonymization, search indexing, ...).
+
+submit_background_task(...) hands a callable to a thread pool. Each task runs inside an
+application context (current_app and the clients are available, flask.g is not, so pass
+user_id explicitly) and is retried with exponential backoff before the failure is logged.
+
+If init_background_tasks() has not been called (scripts, local debugging) tasks run inline.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import current_app
+from .logger import get_logger
+import atexit
+import threading
+import time
+
+logger = get_logger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_app = None
+_max_retries = 3
+_retry_backoff = 0.5
+_stats_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "succeeded": 0,
+    "retried": 0,
+    "failed": 0,
+}
+
+
+def init_background_tasks(app):
+    """
+    Starts the background task thread pool using the Flask app config.
+
+    Args:
+        app: Flask app object providing configuration.
+    """
+    global _executor, _app, _max_retries, _retry_backoff
+
+    if _executor is not None:
+        logger.info("Background tasks already initialized.")
+        return
+
+    _app = app
+    workers = int(app.config.get("BACKGROUND_TASK_WORKERS", 4))
+    _max_retries = int(app.config.get("BACKGROUND_TASK_MAX_RETRIES", 3))
+    _retry_backoff = float(app.config.get("BACKGROUND_TASK_RETRY_BACKOFF", 0.5))
+
+    if workers <= 0:
+        logger.info("Background tasks disabled (BACKGROUND_TASK_WORKERS=%d). Tasks run inline.", workers)
+        return
+
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="background")
+    atexit.register(shutdown_background_tasks)
+    logger.info("Background tasks initialized with %d workers.", workers)
+
+
+def shutdown_background_tasks(wait: bool = True):
+    """ Stops the background pool. By default waits for queued tasks so pending writes are not lost. """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        logger.info("Background tasks shut down.")
+    _executor = None
+
+
+def _record(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _run_with_retries(task_name: str, fn, args: tuple, kwargs: dict):
+    """ Runs fn, retrying with exponential backoff. Returns the result, or None after the final failure. """
+    for attempt in range(_max_retries + 1):
+        try:
+            result = fn(*args, **kwargs)
+            _record("succeeded")
+            return result
+        except Exception as e:
+            if attempt < _max_retries:
+                delay = _retry_backoff * (2 ** attempt)
+                _record("retried")
+                logger.warning("Background task '%s' failed (attempt %d/%d): %s. Retrying in %.1fs",
+                               task_name, attempt + 1, _max_retries + 1, e, delay)
+                time.sleep(delay)
+            else:
+                _record("failed")
+                err_point = __package__ or __name__
+                logger.error("[%s] Error: background task '%s' failed after %d attempts: %s",
+                             err_point, task_name, attempt + 1, e, exc_info=True)
+    return None
+
+
+def _run_in_app_context(app, task_name: str, fn, args: tuple, kwargs: dict):
+    with app.app_context():
+        return _run_with_retries(task_name, fn, args, kwargs)
+
+
+def submit_background_task(task_name: str, fn, *args, **kwargs) -> Future | None:
+    """
+    Runs fn(*args, **kwargs) in the background inside an application context, with retries.
+
+    Args
+        task_name: name used in logs
+            str
+        fn: callable to run; raise to trigger a retry
+            callable
+    Return
+        Future for the task, or None if it ran inline (pool not initialized)
+            Future | None
+    """
+    _record("submitted")
+    if _executor is None:
+        app = _app or current_app._get_current_object()
+        _run_in_app_context(app, task_name, fn, args, kwargs)
+        return None
+    return _executor.submit(_run_in_app_context, _app, task_name, fn, args, kwargs)
+
+
+def get_background_stats() -> dict:
+    """ Returns counters for submitted, succeeded, retried and failed background tasks. """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["running"] = _executor is not None
+    return stats
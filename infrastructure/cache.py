@@ -0,0 +1,346 @@
+# infrastructure/cache.py
+"""
+Read-through cache for profile documents (user and connection profiles).
+
+Two tiers:
+    - local: a per-process LRU with a TTL. Hits cost a dict lookup and a copy.
+    - shared: an optional store (SharedCacheBackend) holding version stamps and documents.
+      RedisSharedCache (PROFILE_CACHE_SHARED="redis") is shared by all processes.
+      InMemorySharedCache ("memory") is a process-local stand-in with the same semantics
+      (values are serialized, so callers never share objects), for tests and benchmarks.
+
+Entries are keyed by entity id plus a version stamp. Writers call invalidate(), which bumps
+the stamp. With a cross-process shared tier the stamp lives there, so after a write no process
+serves the previous version again. A load that races with a write is stored under the version
+it started with and is therefore never served after the write.
+
+Without a cross-process tier, a write in one process cannot reach the others, which would
+keep serving their copy until the TTL expires. Caches are therefore created with
+PROFILE_CACHE_UNSHARED_TTL (default 0: no caching, every read goes to storage) unless
+PROFILE_CACHE_SHARED names a cross-process backend.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from flask import current_app
+from .logger import get_logger
+import copy
+import json
+import threading
+import time
+
+logger = get_logger(__name__)
+
+
+class LRUCache:
+    """ Thread-safe LRU with a per-entry TTL. """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Returns the value for key, or None if it is missing or expired. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_prefix(self, prefix: tuple):
+        """ Drops entries whose key tuple starts with prefix (frees stale versions early). """
+        with self._lock:
+            stale = [key for key in self._entries if key[:len(prefix)] == prefix]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedCacheBackend(ABC):
+    """
+    Interface for the shared cache tier. Values are strings; implementations must make incr atomic.
+    """
+
+    cross_process = True  # Whether every process sees the same values (so invalidation reaches all of them)
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """ Atomically increments an integer counter (missing counts as 0) and returns the new value. """
+        raise NotImplementedError
+
+
+class InMemorySharedCache(SharedCacheBackend):
+    """ Process-local stand-in for a shared cache server. """
+
+    cross_process = False
+
+    def __init__(self):
+        self._values: dict[str, tuple[str, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._values.get(key, ("0", None))[0]) + 1
+            self._values[key] = (str(value), None)  # Version counters never expire
+            return value
+
+
+class RedisSharedCache(SharedCacheBackend):
+    """ Shared tier on a Redis server (requires the redis package: pip install "spurly[redis]"). """
+
+    def __init__(self, url: str):
+        try:
+            import redis  # Optional dependency, only needed when this backend is selected
+        except ImportError as e:
+            raise RuntimeError(
+                'PROFILE_CACHE_SHARED="redis" requires the redis package (pip install "spurly[redis]").'
+            ) from e
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> str | None:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: float):
+        self._client.set(key, value, ex=max(1, int(ttl)))
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+class ProfileCache:
+    """
+    Read-through cache for one kind of document (e.g. "user", "connection").
+    Cached values are JSON-compatible dicts; callers always receive their own copy.
+    """
+
+    def __init__(self, kind: str, max_entries: int = 1024, ttl: float = 300.0,
+                 shared: SharedCacheBackend | None = None):
+        self.kind = kind
+        self.ttl = float(ttl)
+        self.local = LRUCache(max_entries, ttl)
+        self.shared = shared
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+    def _record(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _version_key(self, entity_id: str) -> str:
+        return f"profile:{self.kind}:{entity_id}:version"
+
+    def _version(self, entity_id: str) -> int:
+        if self.shared is not None:
+            try:
+                return int(self.shared.get(self._version_key(entity_id)) or 0)
+            except Exception as e:
+                # Without a trustworthy version, entries cannot be served safely
+                self._record("errors")
+                logger.warning("Shared cache version lookup failed for %s %s: %s", self.kind, entity_id, e)
+                return -1
+        with self._lock:
+            return self._versions.get(entity_id, 0)
+
+    def get_or_load(self, entity_id: str, loader) -> dict | None:
+        """
+        Returns the cached document for entity_id, calling loader() on a miss.
+
+        Args
+            entity_id: id of the document within this cache's kind
+                str
+            loader: callable returning the document dict, or None if it does not exist (not cached)
+                callable
+        Return
+            copy of the document
+                dict | None
+        """
+        if self.ttl <= 0:  # Caching disabled (no cross-process tier to invalidate through)
+            self._record("misses")
+            return loader()
+
+        version = self._version(entity_id)
+        if version < 0:
+            self._record("misses")
+            return loader()
+
+        local_key = (entity_id, version)
+        value = self.local.get(local_key)
+        if value is not None:
+            self._record("local_hits")
+            return copy.deepcopy(value)
+
+        shared_key = f"profile:{self.kind}:{entity_id}:v{version}"
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(shared_key)
+            except Exception as e:
+                self._record("errors")
+                logger.warning("Shared cache read failed for %s %s: %s", self.kind, entity_id, e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(local_key, value)
+                self._record("shared_hits")
+                return copy.deepcopy(value)
+
+        self._record("misses")
+        value = loader()
+        if value is None:
+            return None
+        value = json.loads(json.dumps(value, default=str))  # Detach from the caller and normalize
+        self.local.set(local_key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(shared_key, json.dumps(value), self.ttl)
+            except Exception as e:
+                self._record("errors")
+                logger.warning("Shared cache write failed for %s %s: %s", self.kind, entity_id, e)
+        return copy.deepcopy(value)
+
+    def invalidate(self, entity_id: str):
+        """
+        Bumps the version stamp for entity_id. This process stops serving the previous document
+        at once, and so does every other process when the shared tier is cross-process.
+        """
+        self._record("invalidations")
+        if self.shared is not None:
+            try:
+                self.shared.incr(self._version_key(entity_id))
+            except Exception as e:
+                self._record("errors")
+                err_point = __package__ or __name__
+                logger.error("[%s] Error: cache invalidation failed for %s %s: %s", err_point, self.kind, entity_id, e)
+        with self._lock:
+            self._versions[entity_id] = self._versions.get(entity_id, 0) + 1
+        self.local.discard_prefix((entity_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        return stats
+
+
+_caches: dict[str, ProfileCache] = {}
+_caches_lock = threading.Lock()
+_shared_backend: SharedCacheBackend | None = None
+_shared_configured = False
+
+
+def set_shared_cache_backend(backend: SharedCacheBackend | None):
+    """ Sets the shared tier. Existing caches are dropped, since their TTL depends on the tier. """
+    global _shared_backend, _shared_configured
+    with _caches_lock:
+        _shared_backend = backend
+        _shared_configured = True
+        _caches.clear()
+
+
+def _configured_shared_backend() -> SharedCacheBackend | None:
+    global _shared_backend, _shared_configured
+    if not _shared_configured:
+        mode = str(current_app.config.get("PROFILE_CACHE_SHARED", "none")).lower()
+        if mode == "memory":
+            _shared_backend = InMemorySharedCache()
+        elif mode == "redis":
+            _shared_backend = RedisSharedCache(current_app.config.get("PROFILE_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        elif mode not in ("", "none"):
+            logger.warning("Unknown PROFILE_CACHE_SHARED '%s'; shared profile cache disabled.", mode)
+        _shared_configured = True
+    return _shared_backend
+
+
+def init_profile_cache(app):
+    """
+    Resolves the shared tier from the app config at startup, so a misconfigured backend
+    (e.g. "redis" without the redis package) fails when the app is created, not on first read.
+
+    Args:
+        app: Flask app object.
+    """
+    with app.app_context():
+        _configured_shared_backend()
+
+
+def get_profile_cache(kind: str) -> ProfileCache:
+    """
+    Returns the process-wide cache for a document kind, creating it from the app config.
+
+    Args
+        kind: document kind, e.g. "user" or "connection"
+            str
+    Return
+        cache for that kind
+            ProfileCache
+    """
+    cache = _caches.get(kind)
+    if cache is not None:
+        return cache
+    with _caches_lock:
+        cache = _caches.get(kind)
+        if cache is None:
+            shared = _configured_shared_backend()
+            if shared is not None and shared.cross_process:
+                ttl = float(current_app.config.get("PROFILE_CACHE_TTL", 300))
+            else:
+                # Writes in other processes cannot invalidate this cache, so bound staleness by this TTL
+                ttl = float(current_app.config.get("PROFILE_CACHE_UNSHARED_TTL", 0))
+            cache = ProfileCache(
+                kind,
+                max_entries=int(current_app.config.get("PROFILE_CACHE_MAX_ENTRIES", 1024)),
+                ttl=ttl,
+                shared=shared,
+            )
+            _caches[kind] = cache
+    return cache
+
+
+def get_cache_stats() -> dict:
+    """ Returns hit/miss counters and hit rate per cache kind. """
+    return {kind: cache.stats() for kind, cache in list(_caches.items())}
@@ -123,6 +123,18 @@ def get_openai_client() -> openai.OpenAI:
         raise RuntimeError("OpenAI client has not been initialized. Ensure init_clients() is called.")
     return openai_client
 
+def get_firestore_client() -> firestore.Client:
+    """ Safely returns the initialized Firestore client instance. """
+    if db is None:
+        raise RuntimeError("Firestore client has not been initialized. Ensure init_clients() is called.")
+    return db
+
+def get_vision_client() -> vision_v1.ImageAnnotatorClient:
+    """ Safely returns the initialized Google Cloud Vision client instance. """
+    if vision_client is None:
+        raise RuntimeError("Vision client has not been initialized. Ensure init_clients() is called.")
+    return vision_client
+
 def get_algolia_client():
     """ Safely returns the initialized Algolia index instance. """
     if _algolia_client is None:
@@ -0,0 +1,160 @@
+# infrastructure/identity_map.py
+"""
+Request-scoped identity map for Firestore documents.
+
+Within one request, services read documents through get_document(ref): the first read goes to
+Firestore, later reads of the same path return the snapshot already loaded. Query results are
+registered with record_documents(...) so a follow-up get of a listed document is free too.
+Writers call forget_document(ref) so the rest of the request sees their write.
+
+The map lives on flask.g and only applies inside a request; background tasks and scripts read
+straight through. At teardown the request's Firestore read counts are logged, with a warning
+when one collection was read document-by-document more than IDENTITY_MAP_N_PLUS_ONE_THRESHOLD
+times (the usual sign of an N+1 loop). Long streaming reads (exports) run inside
+untracked_reads() so the map does not end up holding every document they touch.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+_STATE_ATTR = "_identity_map"
+_SUSPENDED_ATTR = "_identity_map_suspended"
+
+
+def _state() -> dict | None:
+    if not has_request_context() or getattr(g, _SUSPENDED_ATTR, False):
+        return None
+    state = getattr(g, _STATE_ATTR, None)
+    if state is None:
+        state = {
+            "documents": {},
+            "gets": Counter(),     # single-document reads that went to Firestore, per collection
+            "queried": Counter(),  # documents returned by queries/batch reads, per collection
+            "hits": 0,
+        }
+        setattr(g, _STATE_ATTR, state)
+    return state
+
+
+def _collection_group(path: str) -> str:
+    """ "users/u1/connections/p1" -> "users/connections" (ids stripped so reads group by collection). """
+    return "/".join(path.split("/")[::2])
+
+
+def get_document(doc_ref):
+    """
+    Reads a document, returning the snapshot already loaded in this request if there is one.
+
+    Args
+        doc_ref: Firestore document reference
+            DocumentReference
+    Return
+        document snapshot (check .exists)
+            DocumentSnapshot
+    """
+    state = _state()
+    if state is None:
+        return doc_ref.get()
+    path = doc_ref.path
+    snapshot = state["documents"].get(path)
+    if snapshot is not None:
+        state["hits"] += 1
+        return snapshot
+    snapshot = doc_ref.get()
+    state["gets"][_collection_group(path)] += 1
+    state["documents"][path] = snapshot
+    return snapshot
+
+
+def peek_document(doc_ref):
+    """ Returns the snapshot loaded in this request for doc_ref, or None without reading Firestore. """
+    state = _state()
+    if state is None:
+        return None
+    snapshot = state["documents"].get(doc_ref.path)
+    if snapshot is not None:
+        state["hits"] += 1
+    return snapshot
+
+
+def record_documents(snapshots) -> list:
+    """
+    Registers snapshots returned by a query or batch read so later gets in this request reuse them.
+
+    Args
+        snapshots: document snapshots (iterable; consumed)
+            Iterable[DocumentSnapshot]
+    Return
+        the snapshots
+            list[DocumentSnapshot]
+    """
+    snapshots = list(snapshots)
+    state = _state()
+    if state is not None:
+        for snapshot in snapshots:
+            path = snapshot.reference.path
+            state["queried"][_collection_group(path)] += 1
+            state["documents"][path] = snapshot
+    return snapshots
+
+
+def forget_document(doc_ref):
+    """ Drops doc_ref from this request's map after a write, so the next read sees the new data. """
+    state = _state()
+    if state is not None:
+        state["documents"].pop(doc_ref.path, None)
+
+
+@contextmanager
+def untracked_reads():
+    """ Reads inside the block go straight to Firestore and are not kept in the map. """
+    if not has_request_context():
+        yield
+        return
+    previous = getattr(g, _SUSPENDED_ATTR, False)
+    setattr(g, _SUSPENDED_ATTR, True)
+    try:
+        yield
+    finally:
+        setattr(g, _SUSPENDED_ATTR, previous)
+
+
+def get_request_read_stats() -> dict:
+    """ Returns this request's Firestore read counts: gets and query reads per collection, and map hits. """
+    state = _state()
+    if state is None:
+        return {}
+    return {
+        "gets": dict(state["gets"]),
+        "queried": dict(state["queried"]),
+        "hits": state["hits"],
+        "reads": sum(state["gets"].values()) + sum(state["queried"].values()),
+    }
+
+
+def log_request_reads(exc=None):
+    """ Teardown handler: logs the request's read counts and flags N+1 patterns. """
+    state = getattr(g, _STATE_ATTR, None)
+    if state is None:
+        return
+    stats = get_request_read_stats()
+    logger.log(current_app.config['DEFAULT_LOG_LEVEL'], "%s %s: %d Firestore reads (%d served from identity map) gets=%s queried=%s",
+               request.method, request.path, stats["reads"], stats["hits"], stats["gets"], stats["queried"])
+    threshold = int(current_app.config.get("IDENTITY_MAP_N_PLUS_ONE_THRESHOLD", 10))
+    for collection, count in state["gets"].items():
+        if count > threshold:
+            logger.warning("Possible N+1 read pattern in %s %s: %d single-document reads from %s",
+                           request.method, request.path, count, collection)
+
+
+def init_identity_map(app):
+    """
+    Registers the per-request read logging.
+
+    Args:
+        app: Flask app object.
+    """
+    app.teardown_request(log_request_reads)
@@ -0,0 +1,260 @@
+# infrastructure/image_pool.py
+"""
+Managed process pool for CPU-bound OpenCV work (decode, classify, crop, encode).
+
+Request handlers call run_image_task(...) instead of running OpenCV on the request thread.
+Uploaded bytes are copied once into a shared-memory segment and only the segment name is
+sent to the worker, so full frames are never pickled. Submissions are bounded: when all
+workers are busy and the pending queue is full, callers wait up to IMAGE_POOL_QUEUE_TIMEOUT
+and then get ImagePoolBusyError (routes answer 503). A task that times out is cancelled if it
+has not started; if it has, it keeps its slot and segment until the worker finishes it, so the
+bound covers abandoned work too.
+
+If init_image_pool() has not been called (scripts, local debugging) tasks run inline.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing import get_context, shared_memory
+from .logger import get_logger
+import atexit
+import cv2
+import numpy as np
+import threading
+import time
+
+logger = get_logger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+_queue_timeout = 2.0
+_task_timeout = 30.0
+_stats_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "timed_out": 0,
+    "wait_ms_total": 0.0,
+    "exec_ms_total": 0.0,
+    "total_ms_total": 0.0,
+}
+
+
+class ImagePoolBusyError(RuntimeError):
+    """Raised when the image pool queue is full and no slot frees up in time."""
+
+
+# --- Worker-side tasks (run in the pool processes; no Flask context available) ---
+
+def decode_image(buffer) -> np.ndarray | None:
+    """ Decodes encoded image bytes (any buffer-protocol object) into a BGR array. """
+    np_arr = np.frombuffer(buffer, np.uint8)
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+
+def classify_task(buffer) -> str:
+    """ Decodes and classifies an image. Returns 'invalid' if the bytes cannot be decoded. """
+    from services.classifiers import classify_image
+
+    image_cv2 = decode_image(buffer)
+    if image_cv2 is None:
+        return "invalid"
+    return classify_image(image_cv2)
+
+
+def prepare_ocr_task(buffer) -> bytes | None:
+    """ Decodes a conversation screenshot, crops it to the chat region and re-encodes it as PNG. """
+    from utils.ocr_utils import crop_chat_region_cv
+
+    image_cv2 = decode_image(buffer)
+    if image_cv2 is None:
+        return None
+    cropped_img = crop_chat_region_cv(image_cv2)
+    if cropped_img is None:
+        return None
+    success, encoded_image = cv2.imencode('.png', cropped_img)
+    if not success:
+        return None
+    return encoded_image.tobytes()
+
+
+def downscale_task(buffer, max_side: int = 1024, jpeg_quality: int = 85, reencode: bool = False) -> bytes | None:
+    """
+    Decodes an image, shrinks it so its longest side is at most max_side, and re-encodes it as JPEG.
+    Images that already fit are returned unchanged rather than re-encoded, unless reencode is set
+    (for callers that need JPEG output, e.g. to send a small but heavy PNG compactly).
+    """
+    image_cv2 = decode_image(buffer)
+    if image_cv2 is None:
+        return None
+    height, width = image_cv2.shape[:2]
+    scale = max_side / float(max(height, width))
+    if scale >= 1.0 and not reencode:
+        return bytes(buffer)
+    if scale < 1.0:
+        image_cv2 = cv2.resize(image_cv2, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    success, encoded_image = cv2.imencode('.jpg', image_cv2, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+    if not success:
+        return None
+    return encoded_image.tobytes()
+
+
+IMAGE_TASKS = {
+    "classify": classify_task,
+    "prepare_ocr": prepare_ocr_task,
+    "downscale": downscale_task,
+}
+
+
+def _init_worker(classifier: str, classifier_model_path: str):
+    """ Applies parent-process settings in a freshly spawned worker. """
+    from services.classifiers import set_image_classifier
+    set_image_classifier(classifier, classifier_model_path)
+
+
+def _run_in_worker(task_name: str, shm_name: str, size: int, options: dict):
+    """ Pool entry point: attaches to the shared segment, runs the task and reports execution time. """
+    started = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        result = IMAGE_TASKS[task_name](view, **options)
+    finally:
+        view.release()
+        shm.close()
+    return result, (time.perf_counter() - started) * 1000
+
+
+# --- Parent-side API ---
+
+def init_image_pool(app):
+    """
+    Starts the image process pool using the Flask app config.
+
+    Args:
+        app: Flask app object providing configuration.
+    """
+    global _pool, _slots, _queue_timeout, _task_timeout
+
+    if _pool is not None:
+        logger.info("Image pool already initialized.")
+        return
+
+    workers = int(app.config.get("IMAGE_POOL_WORKERS", 2))
+    max_pending = int(app.config.get("IMAGE_POOL_MAX_PENDING", 8))
+    _queue_timeout = float(app.config.get("IMAGE_POOL_QUEUE_TIMEOUT", 2.0))
+    _task_timeout = float(app.config.get("IMAGE_POOL_TASK_TIMEOUT", 30.0))
+
+    classifier = app.config.get("IMAGE_CLASSIFIER", "heuristic")
+    classifier_model_path = app.config.get("IMAGE_CLASSIFIER_MODEL_PATH", "resources/image_classifier.npz")
+    _init_worker(classifier, classifier_model_path)  # Inline tasks use the same settings
+
+    if workers <= 0:
+        logger.info("Image pool disabled (IMAGE_POOL_WORKERS=%d). Image tasks run inline.", workers)
+        return
+
+    # spawn: forking a process that already holds gRPC/HTTP client threads is unsafe
+    _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                initializer=_init_worker, initargs=(classifier, classifier_model_path))
+    _slots = threading.BoundedSemaphore(workers + max_pending)
+    atexit.register(shutdown_image_pool)
+    logger.info("Image pool initialized with %d workers, %d pending slots.", workers, max_pending)
+
+
+def shutdown_image_pool():
+    """ Stops the image process pool, waiting for running tasks. """
+    global _pool, _slots
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("Image pool shut down.")
+    _pool = None
+    _slots = None
+
+
+def run_image_task(task_name: str, image_bytes, **options):
+    """
+    Runs an image task in the process pool (or inline if the pool is not running).
+
+    Args:
+        task_name: Key of IMAGE_TASKS to run
+            str
+        image_bytes: Encoded image data
+            bytes | bytearray | memoryview
+        options: Keyword arguments for the task function (must be picklable)
+
+    Return
+        Result of the task function
+            Any
+    """
+    if task_name not in IMAGE_TASKS:
+        raise ValueError(f"Unknown image task: {task_name}")
+
+    started = time.perf_counter()
+    pool, slots = _pool, _slots
+    if pool is None or slots is None:
+        result = IMAGE_TASKS[task_name](image_bytes, **options)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record(task_name, 0.0, elapsed_ms, elapsed_ms, True)
+        return result
+
+    if not slots.acquire(timeout=_queue_timeout):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        logger.warning("Image pool saturated; rejected '%s' task after %.1fs.", task_name, _queue_timeout)
+        raise ImagePoolBusyError("Image processing is busy. Try again shortly.")
+
+    wait_ms = (time.perf_counter() - started) * 1000
+    size = len(image_bytes)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    def release(_future=None):
+        slots.release()
+        shm.close()
+        shm.unlink()
+
+    succeeded = False
+    try:
+        try:
+            shm.buf[:size] = image_bytes
+            future = pool.submit(_run_in_worker, task_name, shm.name, size, options)
+        except BaseException:
+            release()
+            raise
+        # Released when the worker is done with the segment, not when this caller stops waiting
+        future.add_done_callback(release)
+        try:
+            result, exec_ms = future.result(timeout=_task_timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Only succeeds if the task has not started
+            with _stats_lock:
+                _stats["timed_out"] += 1
+            logger.warning("Image task '%s' timed out after %.1fs.", task_name, _task_timeout)
+            raise
+        succeeded = True
+        return result
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        _record(task_name, wait_ms, exec_ms if succeeded else 0.0, total_ms, succeeded)
+
+
+def _record(task_name: str, wait_ms: float, exec_ms: float, total_ms: float, succeeded: bool):
+    with _stats_lock:
+        _stats["submitted"] += 1
+        _stats["completed" if succeeded else "failed"] += 1
+        _stats["wait_ms_total"] += wait_ms
+        _stats["exec_ms_total"] += exec_ms
+        _stats["total_ms_total"] += total_ms
+    logger.info("Image task '%s': wait=%.1fms exec=%.1fms total=%.1fms ok=%s",
+                task_name, wait_ms, exec_ms, total_ms, succeeded)
+
+
+def get_image_pool_stats() -> dict:
+    """ Returns counters and average timings (ms) for image tasks in this process. """
+    with _stats_lock:
+        stats = dict(_stats)
+    finished = max(stats["completed"] + stats["failed"], 1)
+    stats["avg_wait_ms"] = stats["wait_ms_total"] / finished
+    stats["avg_exec_ms"] = stats["exec_ms_total"] / finished
+    stats["avg_total_ms"] = stats["total_ms_total"] / finished
+    stats["pool_running"] = _pool is not None
+    return stats
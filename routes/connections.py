@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify, g, current_app
 from infrastructure.auth import require_auth
 from infrastructure.id_generator import get_null_connection_id
 from infrastructure.logger import get_logger
+from utils.middleware import limit_upload_size
+from utils.pagination import parse_list_view
+from utils.uploads import get_upload_size, read_upload_buffer
 from services.connection_service import (
      save_connection_profile,
      get_user_connections,
@@ -12,6 +15,7 @@ from services.connection_service import (
      get_connection_profile,
      update_connection_profile,
      delete_connection_profile,
+     get_connection_traits_status,
 )
 
 logger = get_logger(__name__)
@@ -29,7 +33,13 @@ def save_connection():
 @require_auth
 def fetch_user_connections():
     user_id = g.user['user_id']
-    result = get_user_connections(user_id)
+    try:
+        view = parse_list_view(request.args.get("view"))
+    except ValueError as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"{err_point} - Error: {str(e)}"}), 400
+    result = get_user_connections(user_id, view=view)
     return jsonify(result)
 
 @connection_bp.route("/connection/set-active", methods=["POST"])
@@ -71,14 +81,31 @@ def clear_active_connection():
     result = clear_active_connection_firestore(user_id)
     return jsonify(result)
 
+def read_image_uploads(images) -> tuple[list, str]:
+    """
+    Reads uploaded images as memoryviews over their spooled buffers, rejecting oversized images
+    before any of them is read.
+
+    Return
+        (image buffers, error message or "")
+    """
+    max_image_size_bytes = current_app.config['MAX_IMAGE_SIZE_BYTES']
+    for img in images:
+        if get_upload_size(img) > max_image_size_bytes:
+            logger.error("Uploaded image '%s' too large. Limit is %d bytes.", img.filename, max_image_size_bytes)
+            return [], f"Image size exceeds limit of {max_image_size_bytes // (1024*1024)}MB"
+    return [read_upload_buffer(img) for img in images], ""
+
 @connection_bp.route("/connection/create", methods=["POST"])
 @require_auth
+@limit_upload_size('CONNECTION_UPLOAD_MAX_BYTES')
 def create_connection():
     # Parse multipart/form-data for connection details, images, and links
     data = request.form.to_dict()
     images = request.files.getlist('images')
-    # Convert uploaded FileStorage objects to raw bytes
-    image_bytes = [img.read() for img in images]
+    image_bytes, error = read_image_uploads(images)
+    if error:
+        return jsonify({'error': error}), 413
     links = request.form.getlist('links')
     result = create_connection_profile(data, image_bytes, links)
     return jsonify(result)
@@ -91,14 +118,30 @@ def fetch_single_connection():
     result = get_connection_profile(user_id, connection_id)
     return jsonify(result)
 
+@connection_bp.route("/connection/traits-status", methods=["GET"])
+@require_auth
+def fetch_connection_traits_status():
+    # Polled after /connection/create until traits_status is no longer "pending"
+    user_id = g.user['user_id']
+    connection_id = request.args.get("connection_id", "")
+    try:
+        result = get_connection_traits_status(user_id, connection_id)
+    except TypeError as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"{err_point} - Error: {str(e)}"}), 404
+    return jsonify(result)
+
 @connection_bp.route("/connection/update", methods=["PATCH"])
 @require_auth
+@limit_upload_size('CONNECTION_UPLOAD_MAX_BYTES')
 def update_connection():
     # Parse multipart/form-data for update details, images, and links
     data = request.form.to_dict()
     images = request.files.getlist('images')
-    # Convert uploaded FileStorage objects to raw bytes
-    image_bytes = [img.read() for img in images]
+    image_bytes, error = read_image_uploads(images)
+    if error:
+        return jsonify({'error': error}), 413
     links = request.form.getlist('links')
     user_id = g.user['user_id']
     connection_id = data.get("connection_id")
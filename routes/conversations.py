@@ -4,12 +4,15 @@ from flask import Blueprint, request, jsonify, g
 from infrastructure.auth import require_auth
 from infrastructure.logger import get_logger
 from services.spur_service import save_spur, delete_saved_spur, get_saved_spurs
+from services.repository import DocumentNotFoundError
 from services.storage_service import (
+    append_messages,
     get_conversations,
     save_conversation,
     get_conversation,
     delete_conversation,
 )
+from utils.pagination import parse_list_view, parse_page_size
 
 logger = get_logger(__name__)
 
@@ -40,9 +43,15 @@ def get_conversations_bp():
                 logger.error("[%s] Error: %s", err_point, e) # L37
                 return jsonify({'error': f"{err_point} - Error: {str(e)}"}), 400 # L38
 
-    # L39, L40 (result assignment + return)
-    result = get_conversations(user_id, filters) # L41
-    return jsonify(result) # L42
+    try:
+        page_size = parse_page_size(request.args.get("limit"))
+        view = parse_list_view(request.args.get("view"))
+        result = get_conversations(user_id, filters, cursor=request.args.get("cursor"), page_size=page_size, view=view)
+    except ValueError as e: # Invalid cursor, page size or view
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"{err_point} - Error: {str(e)}"}), 400
+    return jsonify(result)
 
 @conversations_bp.route("/conversations", methods=["POST"])
 @require_auth
@@ -69,6 +78,29 @@ def get_conversation_bp(conversation_id):
     result = get_conversation(conversation_id) # L66 - Note: Coverage request ended at L65, but this covers L66 too.
     return jsonify(result) # L67
 
+@conversations_bp.route("/conversations/<conversation_id>/messages", methods=["POST"])
+@require_auth
+def append_messages_bp(conversation_id):
+    data = request.get_json(silent=True) or {}
+    user_id = g.user['user_id']
+    if not user_id: # pragma: no cover
+        err_point = __package__ or __name__ # pragma: no cover
+        logger.error(f"Error: {err_point}") # pragma: no cover
+        return jsonify({'error': f"[{err_point}] - Error:"}), 400 # pragma: no cover
+    try:
+        result = append_messages(user_id, conversation_id, data.get("messages"))
+    except DocumentNotFoundError:
+        return jsonify({'error': f"Conversation {conversation_id} not found"}), 404
+    except ValueError as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"{err_point} - Error: {str(e)}"}), 400
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"{err_point} - Error: could not append messages"}), 500
+    return jsonify(result)
+
 @conversations_bp.route("/conversations/<conversation_id>", methods=["DELETE"])
 @require_auth
 def delete_conversation_bp(conversation_id):
@@ -117,9 +149,14 @@ def fetch_saved_spurs_bp():
     if sort in ["asc", "desc"]:
         filters["sort"] = sort
 
-    # L109, L110 (result assignment + return)
-    result = get_saved_spurs(user_id, filters) # L111
-    return jsonify(result) # L112 - Note: Coverage request ended at L111, but this covers L112 too.
+    try:
+        page_size = parse_page_size(request.args.get("limit"))
+        result = get_saved_spurs(user_id, filters, cursor=request.args.get("cursor"), page_size=page_size)
+    except ValueError as e: # Invalid cursor or page size
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"{err_point} - Error: {str(e)}"}), 400
+    return jsonify(result)
 
 @conversations_bp.route("/saved-spurs", methods=["POST"])
 @require_auth
@@ -2,6 +2,8 @@ from class_defs.spur_def import Spur
 from flask import Blueprint, request, jsonify, g
 from gpt_training.anonymizer import anonymize_spur
 from infrastructure.auth import require_auth
+from infrastructure.background import submit_background_task
+from services.example_retrieval import record_quality_example
 from services.spur_service import save_spur
 
 feedback_bp = Blueprint("feedback", __name__)
@@ -24,6 +26,7 @@ def feedback():
     if feedback_type == "thumbs_up":
         result = save_spur(user_id, spur_obj)
         anonymize_spur(spur_obj, True)
+        submit_background_task("record_quality_example", record_quality_example, user_id, spur_obj)
     elif feedback_type == "thumbs_down":
         anonymize_spur(spur_obj, False)
 
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify, g
 from infrastructure.auth import require_auth
 from infrastructure.logger import get_logger
 from services.spur_service import get_spur, get_saved_spurs, delete_saved_spur, save_spur
+from utils.pagination import parse_page_size
 
 
 logger = get_logger(__name__)
@@ -41,7 +42,13 @@ def fetch_saved_spurs_bp():
     if sort in ["asc", "desc"]:
         filters["sort"] = sort
 
-    result = get_saved_spurs(user_id, filters)
+    try:
+        page_size = parse_page_size(request.args.get("limit"))
+        result = get_saved_spurs(user_id, filters, cursor=request.args.get("cursor"), page_size=page_size)
+    except ValueError as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"[{err_point}] - Error: {str(e)}"}), 400
     return jsonify(result)
 
 @spurs_bp.route("/", methods=["POST"])
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from infrastructure.auth import require_auth
 from infrastructure.logger import get_logger
+from services.account_deletion import get_account_deletion_job
+from services.account_export import stream_account_export
 from services.user_service import update_user_profile, get_user_profile, delete_user_profile
 
 user_management_bp = Blueprint("user_management", __name__)
@@ -44,11 +46,38 @@ def get_user_bp():
 def delete_user_bp():
     try:
         user_id = g.user['user_id']
-        if delete_user_profile(user_id):
-            return jsonify({"message": "User profile deleted successfully."}), 200
-        else:
-            return jsonify({"message": "ERROR - user profile not deleted."}), 200
+        job = delete_user_profile(user_id)
+        return jsonify({"message": "User deletion started.", **job}), 202
     except Exception as e:
         err_point = __package__ or __name__
         logger.error("[%s] Error: %s", err_point, e)
-        return jsonify({'error': f"[{err_point}] - Error: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({'error': f"[{err_point}] - Error: {str(e)}"}), 500
+
+@user_management_bp.route("/user/deletion/<job_id>", methods=["GET"])
+@require_auth
+def get_user_deletion_bp(job_id):
+    try:
+        user_id = g.user['user_id']
+        job = get_account_deletion_job(user_id, job_id)
+        if job is None:
+            return jsonify({"error": "Deletion job not found"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        return jsonify({'error': f"[{err_point}] - Error: {str(e)}"}), 500
+
+@user_management_bp.route("/export", methods=["GET"])
+@require_auth
+def export_user_bp():
+    user_id = g.user['user_id']
+    if not user_id: # pragma: no cover
+        err_point = __package__ or __name__ # pragma: no cover
+        logger.error(f"Error: {err_point}") # pragma: no cover
+        return jsonify({'error': f"[{err_point}] - Error:"}), 400 # pragma: no cover
+    compress = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+    filename = f"spurly-export-{user_id}.ndjson" + (".gz" if compress else "")
+    # Streamed as it is read: nothing holds the whole export in memory
+    return Response(stream_with_context(stream_account_export(user_id, compress=compress)),
+                    mimetype="application/gzip" if compress else "application/x-ndjson",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
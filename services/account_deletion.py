@@ -0,0 +1,219 @@
+"""
+Background account deletion.
+
+start_account_deletion(user_id) records a job in the deletion_jobs collection and hands it to
+the background task runner; the HTTP request returns the job id immediately. Jobs and deletes
+go through the storage repository, so the same code runs against Firestore and the local
+backends.
+
+The job first deletes the few-shot examples the user contributed (training records linked from
+their settings), then every subcollection under users/{user_id} in pages of up to
+ACCOUNT_DELETION_BATCH_SIZE writes (Firestore's batch limit is 500). Each page also updates
+the job's progress counters, so progress commits atomically with the deletes it describes.
+Because deleted documents are gone, resuming simply re-reads the first page of the current
+subcollection: a job that failed or was interrupted (process restart) picks up where its last
+committed batch left off. Conversation deletes add a de-index intent to the search outbox in
+the same batch, so search records are removed in bulk by the indexer.
+
+Once the subcollections are empty the user document and the Firebase Auth account (when
+Firebase is initialized) are deleted and the job is marked completed.
+"""
+from datetime import datetime, timezone
+from firebase_admin import auth
+from flask import current_app
+from infrastructure.background import submit_background_task
+from infrastructure.cache import get_profile_cache
+from infrastructure.logger import get_logger
+from services.example_retrieval import purge_user_examples
+from services.repository import CONNECTIONS, CONVERSATIONS, get_repository
+from utils.trait_manager import forget_user_traits
+import firebase_admin
+import threading
+import uuid
+
+logger = get_logger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+UNFINISHED_STATUSES = [STATUS_QUEUED, STATUS_RUNNING, STATUS_FAILED]
+
+# Firestore rejects batches with more than 500 writes
+FIRESTORE_MAX_BATCH_WRITES = 500
+
+_active_jobs: set[str] = set()
+_active_jobs_lock = threading.Lock()
+
+
+def _public_job(data: dict) -> dict:
+    """ Job fields returned to the client. """
+    return {key: data.get(key) for key in (
+        "job_id", "status", "phase", "deleted", "total_deleted", "error", "created_at", "updated_at", "completed_at")}
+
+
+def _find_unfinished_job(user_id: str) -> dict | None:
+    jobs = get_repository().list_deletion_jobs(user_id=user_id, statuses=UNFINISHED_STATUSES)
+    return jobs[0] if jobs else None
+
+
+def start_account_deletion(user_id: str) -> dict:
+    """
+    Queues deletion of a user's account and all of its data. If the user already has an
+    unfinished job, that job is resumed instead of starting another one.
+
+    Args
+        user_id: User ID of the account to delete
+            str
+    Return
+        job summary including job_id and status
+            dict
+    """
+    if not user_id:
+        logger.error("Error: Missing user ID - start account deletion failed")
+        raise ValueError("Error: Missing user ID - start account deletion failed")
+
+    job = _find_unfinished_job(user_id)
+    if job is None:
+        now = datetime.now(timezone.utc)
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "status": STATUS_QUEUED,
+            "phase": None,
+            "deleted": {},
+            "total_deleted": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None,
+        }
+        get_repository().set_deletion_job(job["job_id"], job)
+        logger.info("Account deletion job %s queued for user %s", job["job_id"], user_id)
+    else:
+        logger.info("Resuming account deletion job %s for user %s", job["job_id"], user_id)
+
+    submit_background_task("account_deletion", run_account_deletion, job["job_id"])
+    return _public_job(job)
+
+
+def get_account_deletion_job(user_id: str, job_id: str) -> dict | None:
+    """
+    Gets the status of a deletion job owned by user_id.
+
+    Args
+        user_id: User ID the job must belong to
+            str
+        job_id: deletion job ID
+            str
+    Return
+        job summary, or None if there is no such job for this user
+            dict | None
+    """
+    if not user_id or not job_id:
+        return None
+    data = get_repository().get_deletion_job(job_id)
+    if data is None or data.get("user_id") != user_id:
+        return None
+    return _public_job(data)
+
+
+def _delete_subcollection(job_id: str, user_id: str, name: str, batch_size: int) -> int:
+    """ Deletes one subcollection page by page; returns the number of documents deleted. """
+    repository = get_repository()
+    search_index = current_app.config['ALGOLIA_CONVERSATIONS_INDEX'] if name == CONVERSATIONS else None
+    # One write is reserved for the progress update; conversations also write an outbox intent
+    page_size = (batch_size - 1) // 2 if search_index else batch_size - 1
+    deleted = 0
+
+    while True:
+        ids = repository.delete_user_documents(user_id, name, page_size, job_id, search_index)
+        if not ids:
+            return deleted
+        deleted += len(ids)
+        if name == CONNECTIONS:
+            for connection_id in ids:
+                get_profile_cache("connection").invalidate(f"{user_id}/{connection_id}")
+
+
+def run_account_deletion(job_id: str):
+    """
+    Runs (or resumes) a deletion job. Raises on failure so the background runner retries it.
+
+    Args
+        job_id: deletion job ID
+            str
+    """
+    with _active_jobs_lock:
+        if job_id in _active_jobs:
+            logger.info("Account deletion job %s is already running in this process", job_id)
+            return
+        _active_jobs.add(job_id)
+
+    repository = get_repository()
+    try:
+        job = repository.get_deletion_job(job_id)
+        if job is None:
+            logger.error("Error: Account deletion job %s not found", job_id)
+            return
+        if job.get("status") == STATUS_COMPLETED:
+            return
+
+        user_id = job["user_id"]
+        repository.update_deletion_job(job_id, {"status": STATUS_RUNNING, "error": None, "updated_at": datetime.now(timezone.utc)})
+
+        batch_size = min(int(current_app.config.get('ACCOUNT_DELETION_BATCH_SIZE', FIRESTORE_MAX_BATCH_WRITES)),
+                         FIRESTORE_MAX_BATCH_WRITES)
+        # The example links live in the user's settings, so purge before the subcollections go
+        purged = purge_user_examples(user_id)
+        if purged:
+            logger.info("Account deletion job %s: deleted %d few-shot examples", job_id, purged)
+        for name in repository.list_user_collections(user_id):
+            count = _delete_subcollection(job_id, user_id, name, batch_size)
+            if count:
+                logger.info("Account deletion job %s: deleted %d documents from %s", job_id, count, name)
+
+        repository.delete_user(user_id)
+        get_profile_cache("user").invalidate(user_id)
+        forget_user_traits(user_id)
+        if firebase_admin._apps:
+            try:
+                auth.delete_user(user_id)
+            except auth.UserNotFoundError:
+                pass  # Already removed by an earlier attempt
+        else:
+            logger.info("Firebase is not initialized; no Auth account to delete for user %s", user_id)
+
+        now = datetime.now(timezone.utc)
+        repository.update_deletion_job(job_id, {"status": STATUS_COMPLETED, "phase": None, "updated_at": now, "completed_at": now})
+        logger.info("Account deletion job %s completed for user %s", job_id, user_id)
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: account deletion job %s failed: %s", err_point, job_id, e)
+        try:
+            repository.update_deletion_job(job_id, {"status": STATUS_FAILED, "error": str(e), "updated_at": datetime.now(timezone.utc)})
+        except Exception:
+            logger.error("[%s] Error: could not record failure of account deletion job %s", err_point, job_id)
+        raise
+    finally:
+        with _active_jobs_lock:
+            _active_jobs.discard(job_id)
+
+
+def resume_account_deletions(app):
+    """
+    Re-queues deletion jobs left unfinished by a previous process (e.g. a restart mid-job).
+
+    Args:
+        app: Flask app object providing configuration.
+    """
+    with app.app_context():
+        try:
+            jobs = get_repository().list_deletion_jobs(statuses=UNFINISHED_STATUSES)
+        except Exception as e:
+            logger.error("[%s] Error: could not list unfinished account deletion jobs: %s", __name__, e)
+            return
+        for job in jobs:
+            submit_background_task("account_deletion", run_account_deletion, job["job_id"])
+        if jobs:
+            logger.info("Resumed %d unfinished account deletion jobs.", len(jobs))
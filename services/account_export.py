@@ -0,0 +1,187 @@
+"""
+Streaming export of a user's account (privacy requests, migrations).
+
+The export is NDJSON: one JSON object per line, produced by a generator pipeline that reads the
+account page by page from the storage repository, so memory stays bounded by one page no matter
+how large the account is:
+
+    {"type": "export", "format_version": 1, "user_id": ..., "exported_at": ...}
+    {"type": "user", "id": ..., "data": {...}}
+    {"type": "connection", "id": ..., "data": {...}}       (one per connection)
+    {"type": "conversation", "id": ..., "data": {...}}     (messages always as a plain array)
+    {"type": "spur", "id": ..., "data": {...}}
+    {"type": "summary", "counts": {"user": 1, "connection": ..., ...}}
+
+The trailing summary line lets a consumer check the export is complete. Datetimes are ISO 8601
+strings; any other bytes values are base64.
+
+    python -m services.account_export <user_id> [--out export.ndjson.gz] [--gzip]
+"""
+from datetime import datetime, timezone
+from flask import current_app
+from infrastructure.identity_map import untracked_reads
+from infrastructure.logger import get_logger
+from services.repository import get_repository
+from typing import Iterator
+from utils.conversation_codec import expand_messages
+import base64
+import json
+import zlib
+
+logger = get_logger(__name__)
+
+EXPORT_FORMAT_VERSION = 1
+CHUNK_BYTES = 64 * 1024  # Lines are grouped into chunks of about this size before they are written
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    return str(value)
+
+
+def _paged(fetch, page_size: int):
+    """ Yields documents from fetch(start_after, limit) one page at a time, continuing from the last (created_at, id). """
+    start_after = None
+    while True:
+        page = fetch(start_after, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        start_after = (last.data.get("created_at"), last.id)
+
+
+def iter_account_records(user_id: str, page_size: int | None = None) -> Iterator[dict]:
+    """
+    Yields the export records for one account, in export order.
+
+    Args
+        user_id: account to export
+            str
+        page_size: documents read per repository call; defaults to ACCOUNT_EXPORT_PAGE_SIZE
+            int
+    Return
+        export records (header, user, connections, conversations, spurs, summary)
+            Iterator[dict]
+    """
+    if not user_id:
+        logger.error("Error: Missing user ID - account export failed")
+        raise ValueError("Error: Missing user ID - account export failed")
+
+    repository = get_repository()
+    page_size = page_size or int(current_app.config.get('ACCOUNT_EXPORT_PAGE_SIZE', 100))
+    counts = {"user": 0, "connection": 0, "conversation": 0, "spur": 0}
+
+    yield {"type": "export", "format_version": EXPORT_FORMAT_VERSION, "user_id": user_id,
+           "exported_at": datetime.now(timezone.utc)}
+
+    # Every document is read once and then dropped, so skip the request identity map
+    with untracked_reads():
+        user = repository.get_user(user_id)
+        if user is not None:
+            counts["user"] += 1
+            yield {"type": "user", "id": user_id, "data": user}
+
+        connections = _paged(lambda start_after, limit: repository.list_connections(
+            user_id, start_after=start_after, limit=limit), page_size)
+        for doc in connections:
+            counts["connection"] += 1
+            yield {"type": "connection", "id": doc.id, "data": doc.data}
+
+        conversations = _paged(lambda start_after, limit: repository.list_conversations(
+            user_id, descending=False, start_after=start_after, limit=limit), page_size)
+        for doc in conversations:
+            data = doc.data
+            data["conversation"] = expand_messages(data.get("conversation"))
+            counts["conversation"] += 1
+            yield {"type": "conversation", "id": doc.id, "data": data}
+
+        spurs = _paged(lambda start_after, limit: list(repository.iter_spurs(
+            user_id, descending=False, start_after=start_after, limit=limit)), page_size)
+        for doc in spurs:
+            counts["spur"] += 1
+            yield {"type": "spur", "id": doc.id, "data": doc.data}
+
+    logger.info("Account export for user %s: %s", user_id, counts)
+    yield {"type": "summary", "counts": counts}
+
+
+def iter_ndjson(records: Iterator[dict], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """ Serializes records as NDJSON, yielding chunks of about chunk_bytes. """
+    buffer = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_gzip(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    """ Gzip-compresses a byte stream incrementally. """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_account_export(user_id: str, compress: bool = False, page_size: int | None = None) -> Iterator[bytes]:
+    """
+    Streams a user's account as NDJSON bytes, optionally gzip-compressed.
+
+    Args
+        user_id: account to export
+            str
+        compress: gzip the stream
+            bool
+        page_size: documents read per repository call; defaults to ACCOUNT_EXPORT_PAGE_SIZE
+            int
+    Return
+        export bytes, in chunks
+            Iterator[bytes]
+    """
+    chunks = iter_ndjson(iter_account_records(user_id, page_size))
+    if compress:
+        level = int(current_app.config.get('ACCOUNT_EXPORT_GZIP_LEVEL', 6))
+        chunks = iter_gzip(chunks, level)
+    return chunks
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from app import create_app
+    from infrastructure.clients import init_clients
+
+    parser = argparse.ArgumentParser(description="Export a user's account as NDJSON.")
+    parser.add_argument("user_id")
+    parser.add_argument("--out", default="-", help="Output file; '-' writes to stdout")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output (implied by an --out ending in .gz)")
+    parser.add_argument("--page-size", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if app.config.get('STORAGE_BACKEND', 'firestore') == "firestore":
+            init_clients(app)
+        compress = args.gzip or args.out.endswith(".gz")
+        out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+        try:
+            written = 0
+            for chunk in stream_account_export(args.user_id, compress=compress, page_size=args.page_size):
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+    print(f"Exported user {args.user_id}: {written:,} bytes", file=sys.stderr)
@@ -0,0 +1,158 @@
+"""
+Synthetic and fixture datasets for the image classifiers.
+
+The synthetic generators extend the dummy images in services.classifiers' __main__ with
+randomized layouts: light/dark chat screenshots with alternating bubbles, headers and
+keyboards; profile cards with headings, prompts and photo tiles; and photo-like images
+built from gradients, blobs and noise, sometimes with a caption.
+
+Real screenshots can be added as fixtures laid out as <fixtures_dir>/<class>/*.png|jpg.
+"""
+from services.image_model import CLASSES
+import cv2
+import numpy as np
+import os
+
+WORDS = ["hey", "sounds", "good", "what", "are", "you", "up", "to", "tonight", "haha", "coffee",
+         "tomorrow", "love", "that", "place", "weekend", "hike", "dog", "movie", "sure", "lol"]
+PROFILE_HEADINGS = ["About me", "My self-summary", "Interests", "Looking for", "Occupation",
+                    "Education", "My simple pleasures", "Two truths and a lie"]
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def _sentence(rng, low=2, high=7) -> str:
+    return " ".join(rng.choice(WORDS, size=rng.integers(low, high)))
+
+
+def make_conversation_image(rng) -> np.ndarray:
+    """ Tall chat screenshot: header, alternating left/right bubbles, optional input bar/keyboard. """
+    width = int(rng.integers(280, 460))
+    height = int(width * rng.uniform(1.7, 2.2))
+    dark = rng.random() < 0.3
+    background = int(rng.integers(0, 30)) if dark else int(rng.integers(235, 256))
+    img = np.full((height, width, 3), background, np.uint8)
+    text_color = (235, 235, 235) if dark else (20, 20, 20)
+
+    header = int(height * rng.uniform(0.06, 0.1))
+    img[:header] = background + (12 if dark else -10)
+    cv2.putText(img, "< " + str(rng.choice(["Alex", "Sam", "Jordan", "Riley"])), (10, header - 12), FONT, 0.5, text_color, 1)
+
+    keyboard = int(height * rng.uniform(0.3, 0.4)) if rng.random() < 0.5 else int(height * 0.07)
+    y = header + 15
+    outgoing_color = tuple(int(c) for c in rng.integers(120, 255, size=3))
+    incoming_color = (60, 60, 60) if dark else (228, 228, 228)
+    while y < height - keyboard - 40:
+        outgoing = rng.random() < 0.5
+        lines = int(rng.integers(1, 3))
+        bubble_w = int(width * rng.uniform(0.35, 0.7))
+        bubble_h = 22 * lines + 10
+        x = width - bubble_w - 10 if outgoing else 10
+        cv2.rectangle(img, (x, y), (x + bubble_w, y + bubble_h), outgoing_color if outgoing else incoming_color, -1)
+        for line in range(lines):
+            cv2.putText(img, _sentence(rng, 2, 5), (x + 6, y + 20 + line * 22), FONT, 0.42, text_color, 1)
+        y += bubble_h + int(rng.integers(8, 22))
+
+    img[height - keyboard:] = background + (25 if dark else -35)
+    if keyboard > height * 0.2:
+        key_w = width // 10
+        for row in range(4):
+            for col in range(10):
+                top = height - keyboard + 10 + row * (keyboard // 4)
+                cv2.rectangle(img, (col * key_w + 3, top), ((col + 1) * key_w - 3, top + keyboard // 4 - 10),
+                              (90, 90, 90) if dark else (252, 252, 252), -1)
+    return img
+
+
+def make_profile_image(rng) -> np.ndarray:
+    """ Profile card: headings with short paragraphs, optionally a photo tile. """
+    width = int(rng.integers(320, 620))
+    height = int(width * rng.uniform(0.7, 1.9))
+    background = int(rng.integers(230, 256))
+    img = np.full((height, width, 3), background, np.uint8)
+    y = 20
+    if rng.random() < 0.5:
+        tile_h = int(height * rng.uniform(0.25, 0.4))
+        tile = _photo_texture(rng, tile_h, width - 40)
+        img[y:y + tile_h, 20:width - 20] = tile
+        y += tile_h + 20
+    while y < height - 60:
+        cv2.putText(img, str(rng.choice(PROFILE_HEADINGS)), (20, y + 20), FONT, 0.7, (30, 30, 30), 2)
+        y += 34
+        for _ in range(int(rng.integers(1, 4))):
+            if y > height - 20:
+                break
+            cv2.putText(img, _sentence(rng, 4, 9), (20, y + 16), FONT, 0.5, (70, 70, 70), 1)
+            y += 24
+        y += int(rng.integers(10, 30))
+    return img
+
+
+def _photo_texture(rng, height: int, width: int) -> np.ndarray:
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = rng.uniform(0, 255, size=3)
+    slope = rng.uniform(-1, 1, size=(2, 3))
+    img = base + xx[..., None] * slope[0] * 255 / max(width, 1) + yy[..., None] * slope[1] * 255 / max(height, 1)
+    img += rng.normal(0, rng.uniform(4, 20), size=img.shape)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    for _ in range(int(rng.integers(2, 8))):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(5, max(6, min(width, height) // 3)))
+        cv2.circle(img, center, radius, tuple(int(c) for c in rng.integers(0, 255, size=3)), -1)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def make_photo_image(rng) -> np.ndarray:
+    """ Photo-like image: gradients, blobs and sensor noise, sometimes with a caption. """
+    width = int(rng.integers(300, 640))
+    height = int(width * rng.uniform(0.6, 1.6))
+    img = _photo_texture(rng, height, width)
+    if rng.random() < 0.3:
+        cv2.putText(img, _sentence(rng, 1, 3), (10, height - 20), FONT, 0.6, (240, 240, 240), 1)
+    return img
+
+
+GENERATORS = {
+    "conversation": make_conversation_image,
+    "profile_snippet": make_profile_image,
+    "photo": make_photo_image,
+}
+
+
+def load_fixtures(fixtures_dir: str) -> tuple[list, list]:
+    """ Loads <fixtures_dir>/<class>/* images. Returns (images, class indices). """
+    images, labels = [], []
+    for label, name in enumerate(CLASSES):
+        class_dir = os.path.join(fixtures_dir, name)
+        if not os.path.isdir(class_dir):
+            continue
+        for filename in sorted(os.listdir(class_dir)):
+            img = cv2.imread(os.path.join(class_dir, filename), cv2.IMREAD_COLOR)
+            if img is not None:
+                images.append(img)
+                labels.append(label)
+    return images, labels
+
+
+def build_dataset(per_class: int, seed: int = 0, fixtures_dir: str | None = None) -> tuple[list, list]:
+    """
+    Builds a labelled dataset of synthetic images (plus fixtures, if given).
+
+    Args:
+        per_class (int): Synthetic images to generate per class.
+        seed (int): RNG seed.
+        fixtures_dir (str, optional): Directory of real labelled images.
+
+    Returns:
+        tuple[list, list]: (BGR images, class indices into CLASSES).
+    """
+    rng = np.random.default_rng(seed)
+    images, labels = [], []
+    for label, name in enumerate(CLASSES):
+        for _ in range(per_class):
+            images.append(GENERATORS[name](rng))
+            labels.append(label)
+    if fixtures_dir:
+        fixture_images, fixture_labels = load_fixtures(fixtures_dir)
+        images.extend(fixture_images)
+        labels.extend(fixture_labels)
+    return images, labels
@@ -1,10 +1,17 @@
 import cv2
 import numpy as np
 import logging
+import os
 import re
 
 logger = logging.getLogger(__name__)
 
+# Classifier selection: "heuristic" (hand-tuned thresholds) or "trained" (services.image_model).
+# Read from the environment so pool worker processes pick it up without a Flask app context.
+IMAGE_CLASSIFIER = os.environ.get("IMAGE_CLASSIFIER", "heuristic")
+IMAGE_CLASSIFIER_MODEL_PATH = os.environ.get("IMAGE_CLASSIFIER_MODEL_PATH", "resources/image_classifier.npz")
+_trained_model = None
+
 # Keywords that might indicate a profile snippet (requires OCR text to be effective)
 PROFILE_KEYWORDS = [
     r"bio", r"about me", r"interests", r"prompt", r"profile",
@@ -95,7 +102,89 @@ def has_significant_text_heuristics(image_cv2_gray, image_cv2_color) -> tuple[bo
     return is_text_heavy, confidence
 
 
-def classify_image(image_cv2) -> str:
+def score_screenshot_text(text: str) -> tuple[int, int]:
+    """
+    Counts profile and conversation keyword patterns found in OCR text.
+
+    Returns:
+        (profile_keyword_score, conversation_keyword_score)
+    """
+    if not text:
+        return 0, 0
+    profile_keyword_score = sum(1 for pattern in COMPILED_PROFILE_KEYWORDS if pattern.search(text))
+    conversation_keyword_score = sum(1 for pattern in COMPILED_CONVERSATION_KEYWORDS if pattern.search(text))
+    logger.debug(f"Keyword scores: profile={profile_keyword_score}, conversation={conversation_keyword_score}")
+    return profile_keyword_score, conversation_keyword_score
+
+
+def classify_screenshot_text(text: str) -> str | None:
+    """
+    Decides 'conversation' vs 'profile_snippet' for a screenshot from its OCR text.
+    Returns None when the keywords do not favour either category.
+    """
+    profile_keyword_score, conversation_keyword_score = score_screenshot_text(text)
+    if profile_keyword_score > conversation_keyword_score:
+        return "profile_snippet"
+    if conversation_keyword_score > profile_keyword_score:
+        return "conversation"
+    return None
+
+
+def set_image_classifier(method: str, model_path: str | None = None):
+    """
+    Selects the classifier used by classify_image ("heuristic" or "trained").
+    """
+    global IMAGE_CLASSIFIER, IMAGE_CLASSIFIER_MODEL_PATH, _trained_model
+    IMAGE_CLASSIFIER = method
+    if model_path and model_path != IMAGE_CLASSIFIER_MODEL_PATH:
+        IMAGE_CLASSIFIER_MODEL_PATH = model_path
+        _trained_model = None
+
+
+def get_trained_model():
+    """
+    Lazily loads the trained classifier weights. Returns None if they are unavailable.
+    """
+    global _trained_model
+    if _trained_model is None:
+        from services.image_model import ImageClassifierModel
+        try:
+            _trained_model = ImageClassifierModel.load(IMAGE_CLASSIFIER_MODEL_PATH)
+            logger.info(f"Loaded trained image classifier from {IMAGE_CLASSIFIER_MODEL_PATH}")
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Trained image classifier unavailable ({e}); using heuristics.")
+            return None
+    return _trained_model
+
+
+def classify_image_trained(image_cv2) -> str:
+    height, width = image_cv2.shape[:2]
+    if height == 0 or width == 0:
+        logger.error("Invalid image dimensions for classification.")
+        return "unknown"
+
+    model = get_trained_model()
+    if model is None:
+        return classify_image_heuristic(image_cv2)
+    category, probability = model.predict(image_cv2)
+    logger.info(f"Classified as '{category}' by trained model (p={probability:.2f}).")
+    return category
+
+
+def classify_image(image_cv2, method: str | None = None) -> str:
+    """
+    Classifies an image as 'conversation', 'profile_snippet', or 'photo'.
+
+    Args:
+        image_cv2: BGR image.
+        method (str, optional): "heuristic" or "trained". Defaults to IMAGE_CLASSIFIER.
+    """
+    if (method or IMAGE_CLASSIFIER) == "trained":
+        return classify_image_trained(image_cv2)
+    return classify_image_heuristic(image_cv2)
+
+
+def classify_image_heuristic(image_cv2) -> str:
     logger.info("Classifying image using enhanced heuristics...")
     height, width = image_cv2.shape[:2]
     
@@ -124,26 +213,8 @@ def classify_image(image_cv2) -> str:
 
     # --- Stage 2: If it's likely a screenshot, differentiate conversation vs. profile ---
     # This stage assumes `is_screenshot_candidate` is True or text_confidence is high enough.
-    # NOTE: The following keyword checks are placeholders.
-    # Effective keyword spotting requires actual OCR text from the image.
-    # Without OCR, we rely more on structural heuristics.
-    
-    ocr_text_available = False # This would be True if you had OCR text
-    detected_text_for_keywords = "" # Populate this if OCR is performed
-
-    profile_keyword_score = 0
-    if ocr_text_available:
-        for pattern in COMPILED_PROFILE_KEYWORDS:
-            if pattern.search(detected_text_for_keywords):
-                profile_keyword_score += 1
-        logger.debug(f"Profile keyword score: {profile_keyword_score}")
-
-    conversation_keyword_score = 0
-    if ocr_text_available:
-        for pattern in COMPILED_CONVERSATION_KEYWORDS:
-            if pattern.search(detected_text_for_keywords):
-                conversation_keyword_score += 1
-        logger.debug(f"Conversation keyword score: {conversation_keyword_score}")
+    # Only structural heuristics run here: keyword scoring needs OCR text, which is applied
+    # afterwards by services.ocr_service.process_screenshot via classify_screenshot_text.
 
     # Structural Heuristics for Conversation Screenshots:
     # Look for multiple, distinct horizontal bands of text, potentially aligned.
@@ -167,9 +238,6 @@ def classify_image(image_cv2) -> str:
         if num_potential_message_bands > 5: # Many distinct lines of text
              logger.info(f"Classified as 'conversation' (tall, many horizontal text bands). AR: {aspect_ratio:.2f}, Bands: {num_potential_message_bands}")
              return "conversation"
-        elif ocr_text_available and conversation_keyword_score > profile_keyword_score:
-             logger.info("Classified as 'conversation' (tall, keyword-based).")
-             return "conversation"
         else:
             # If it's tall but doesn't strongly look like a conversation, it might be a profile snippet or other.
             # Defaulting to profile for tall, texty images if not clearly conversation.
@@ -178,11 +246,8 @@ def classify_image(image_cv2) -> str:
             
     # Wider images or those with fewer distinct message bands might be profiles
     elif aspect_ratio >= 0.75 :
-        if ocr_text_available and profile_keyword_score > 0 and profile_keyword_score > conversation_keyword_score:
-            logger.info("Classified as 'profile_snippet' (keyword-based).")
-            return "profile_snippet"
         # If fewer message bands and wider, more likely a profile or other less structured text.
-        elif num_potential_message_bands < 5 and text_confidence > 0.6:
+        if num_potential_message_bands < 5 and text_confidence > 0.6:
              logger.info(f"Classified as 'profile_snippet' (wider/fewer bands, texty). AR: {aspect_ratio:.2f}, Bands: {num_potential_message_bands}")
              return "profile_snippet"
 
@@ -236,4 +301,10 @@ if __name__ == '__main__':
     photo_img = np.zeros((400, 500, 3), dtype=np.uint8)
     cv2.circle(photo_img, (250, 200), 100, (30, 80, 150), -1) # A "colored object"
     cv2.putText(photo_img, "Vacation 2024", (10,380), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (220,220,220),1) # Minimal text
-    print(f"Test 'dummy_photo_image' classified as: {classify_image(photo_img)}")
\ No newline at end of file
+    print(f"Test 'dummy_photo_image' classified as: {classify_image(photo_img)}")
+    # Test 4: Randomized synthetic samples (see services.classifier_dataset), heuristic vs trained
+    from services.classifier_dataset import GENERATORS
+    rng = np.random.default_rng(0)
+    for expected, generator in GENERATORS.items():
+        sample = generator(rng)
+        print(f"Synthetic '{expected}': heuristic={classify_image(sample, 'heuristic')}, trained={classify_image(sample, 'trained')}")
@@ -0,0 +1,181 @@
+"""
+Per-user connection index: one settings document holding what the connection list and the
+active-connection lookup need, so neither has to read the connection documents.
+
+    {
+        "format_version": 1,
+        "active_connection_id": "<connection id or the user's null connection id>",
+        "connections": {
+            "<connection_id>": {"connection_id": ..., "name": ..., "age": ..., "last_used_at": datetime},
+            ...
+        }
+    }
+
+connection_service keeps it current on create/update/delete and when the active connection
+changes; each change is a transactional read-modify-write of the document. The connection list
+reads it through the "connection_index" profile cache. The active connection is read from the
+document itself (get_active_connection_id), since a switch on one worker must be seen by the next
+request on any other; the request identity map still makes that one read per request. The index is
+derived data: when it is missing (accounts created before it existed) or a write to it fails,
+it is rebuilt from the connection documents on the next read.
+"""
+from datetime import datetime, timezone
+from infrastructure.cache import get_profile_cache
+from infrastructure.id_generator import get_null_connection_id
+from infrastructure.logger import get_logger
+from services.repository import get_repository
+
+logger = get_logger(__name__)
+
+CONNECTION_INDEX = "connection_index"  # Settings document name
+INDEX_FORMAT_VERSION = 1
+# Connection fields copied into each index entry
+INDEX_FIELDS = ["connection_id", "name", "age"]
+
+
+def _entry(connection_id: str, data: dict, previous: dict | None = None) -> dict:
+    entry = dict(previous or {})
+    entry.update({key: data[key] for key in INDEX_FIELDS if key in data})
+    entry["connection_id"] = connection_id
+    entry.setdefault("last_used_at", None)
+    return entry
+
+
+def _build_index(user_id: str) -> dict:
+    """ Builds the index from the connection documents (projected read) and the legacy active_connection setting. """
+    repository = get_repository()
+    connections = {}
+    for doc in repository.list_connections(user_id, fields=INDEX_FIELDS):
+        connections[doc.id] = _entry(doc.id, doc.data)
+    active_connection_id = (repository.get_setting(user_id, "active_connection") or {}).get("connection_id")
+    if active_connection_id not in connections:  # Unset, the null connection, or since deleted
+        active_connection_id = get_null_connection_id(user_id)
+    return {
+        "format_version": INDEX_FORMAT_VERSION,
+        "active_connection_id": active_connection_id,
+        "connections": connections,
+    }
+
+
+def _load_index(user_id: str) -> dict:
+    repository = get_repository()
+    index = repository.get_setting(user_id, CONNECTION_INDEX)
+    if index is not None and index.get("format_version") == INDEX_FORMAT_VERSION:
+        return index
+
+    logger.info("Building connection index for user %s", user_id)
+    built = _build_index(user_id)
+    # Keep an index another request wrote meanwhile
+    return repository.modify_setting(
+        user_id, CONNECTION_INDEX,
+        lambda current: built if current is None or current.get("format_version") != INDEX_FORMAT_VERSION else None
+    ) or repository.get_setting(user_id, CONNECTION_INDEX)
+
+
+def get_connection_index(user_id: str) -> dict:
+    """
+    Returns the user's connection index (one cached read).
+
+    Args
+        user_id: User ID
+            str
+    Return
+        the index document (see module docstring); datetimes are strings when served from the cache
+            dict
+    """
+    return get_profile_cache(CONNECTION_INDEX).get_or_load(user_id, lambda: _load_index(user_id))
+
+
+def get_active_connection_id(user_id: str) -> str:
+    """
+    Returns the user's active connection id, read from the index document rather than the cache.
+
+    Args
+        user_id: User ID
+            str
+    Return
+        the active connection id, or the user's null connection id when none was ever set
+            str
+    """
+    return _load_index(user_id).get("active_connection_id") or get_null_connection_id(user_id)
+
+
+def _modify_index(user_id: str, modify):
+    """ Applies modify(index) in a transaction. If that fails the index is dropped, to be rebuilt on the next read. """
+    repository = get_repository()
+
+    def apply(current):
+        index = current if current is not None and current.get("format_version") == INDEX_FORMAT_VERSION else None
+        if index is None:
+            index = _build_index(user_id)
+        modify(index)
+        return index
+
+    try:
+        repository.modify_setting(user_id, CONNECTION_INDEX, apply)
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: connection index update failed for user %s: %s", err_point, user_id, e)
+        try:
+            repository.delete_setting(user_id, CONNECTION_INDEX)
+        except Exception as delete_error:
+            logger.error("[%s] Error: could not drop stale connection index for user %s: %s", err_point, user_id, delete_error)
+    finally:
+        get_profile_cache(CONNECTION_INDEX).invalidate(user_id)
+
+
+def index_connection(user_id: str, connection_id: str, data: dict):
+    """
+    Adds a connection to the index, or refreshes its entry from the (possibly partial) fields in data.
+
+    Args
+        user_id: User ID
+            str
+        connection_id: Connection ID
+            str
+        data: connection fields that were written
+            dict
+    """
+    def modify(index):
+        connections = index.setdefault("connections", {})
+        connections[connection_id] = _entry(connection_id, data, connections.get(connection_id))
+
+    _modify_index(user_id, modify)
+
+
+def unindex_connection(user_id: str, connection_id: str):
+    """ Removes a connection from the index; if it was the active connection, the null connection becomes active. """
+    def modify(index):
+        index.setdefault("connections", {}).pop(connection_id, None)
+        if index.get("active_connection_id") == connection_id:
+            index["active_connection_id"] = get_null_connection_id(user_id)
+
+    _modify_index(user_id, modify)
+
+
+def set_indexed_active_connection(user_id: str, connection_id: str):
+    """ Records the active connection, and stamps it as last used. """
+    def modify(index):
+        index["active_connection_id"] = connection_id
+        entry = index.setdefault("connections", {}).get(connection_id)
+        if entry is not None:
+            entry["last_used_at"] = datetime.now(timezone.utc)
+
+    _modify_index(user_id, modify)
+
+
+def list_indexed_connections(user_id: str) -> list[dict]:
+    """
+    Returns the index entries, most recently used first (never used ones last, by name).
+
+    Args
+        user_id: User ID
+            str
+    Return
+        connection_id, name, age and last_used_at of each connection
+            List[dict]
+    """
+    entries = list((get_connection_index(user_id).get("connections") or {}).values())
+    entries.sort(key=lambda entry: str(entry.get("name") or "").lower())
+    entries.sort(key=lambda entry: str(entry.get("last_used_at") or ""), reverse=True)
+    return entries
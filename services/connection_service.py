@@ -1,21 +1,38 @@
 from class_defs.profile_def import ConnectionProfile
-from dataclasses import fields
 from flask import current_app, jsonify, g
-from infrastructure.clients import db
+from infrastructure.background import submit_background_task
+from infrastructure.cache import get_profile_cache
 from infrastructure.id_generator import generate_connection_id, get_null_connection_id
 from infrastructure.logger import get_logger
-from typing import List, Dict
-from utils.trait_manager import (
-    infer_personality_traits_from_pics,
-    infer_personality_traits_from_links
+from services.connection_index import (
+    INDEX_FIELDS,
+    get_active_connection_id,
+    index_connection,
+    list_indexed_connections,
+    set_indexed_active_connection,
+    unindex_connection,
 )
+from services.repository import get_repository
+from typing import List, Dict
+from utils.profile_format import render_profile_text
+from utils.trait_manager import infer_personality_traits, merge_trait_scores
 
 logger = get_logger(__name__)
 
+# traits_status values of a connection whose traits are inferred in the background
+TRAITS_PENDING = "pending"
+TRAITS_COMPLETE = "complete"
+TRAITS_FAILED = "failed"
+
 def create_connection_profile(data: Dict, images: List[bytes], links: List[str]) -> Dict:
     """
     Creates a ConnectionProfile with data received from the frontend.
 
+    The profile is saved right away. If images or links were sent, it is saved with
+    traits_status "pending" and the personality traits are inferred by a background task
+    (enrich_connection_traits), which writes them back and sets traits_status to "complete";
+    clients poll get_connection_traits_status for the result.
+
     Args:
         data: Dictionary representation of the connection information 
             dict
@@ -37,63 +54,113 @@ def create_connection_profile(data: Dict, images: List[bytes], links: List[str])
     
     profile_data = profile.to_dict()
     profile_data["connection_id"] = connection_id
-
-    pic_traits = infer_personality_traits_from_pics(images) if images else []
-    link_traits = infer_personality_traits_from_links(links) if links else []
-    # Select top 4 traits by confidence score
-    all_traits = pic_traits + link_traits
-    sorted_traits = sorted(all_traits, key=lambda t: t["confidence_score"], reverse=True)
-    combined_traits = sorted_traits[:4]
-    # Store only trait names
-    top_traits = [t["personality_trait"] for t in combined_traits]
-    profile_data["personality_traits"] = top_traits
+    enrich = bool(images or links)
+    profile_data["traits_status"] = TRAITS_PENDING if enrich else None
 
     try:
-        db.collection("users").document(user_id).collection("connections").document(connection_id).set(profile_data)
+        get_repository().set_connection(user_id, connection_id, profile_data)
+        index_connection(user_id, connection_id, profile_data)
+        if enrich:
+            # Uploads are memoryviews over request buffers that close with the request, so copy them
+            submit_background_task("enrich_connection_traits", enrich_connection_traits, user_id, connection_id,
+                                   [bytes(img) for img in images or []], list(links or []))
         return {
             "status": "connection profile created",
             "connection_id": connection_id,
+            "traits_status": profile_data["traits_status"],
             "connection_profile": format_connection_profile(profile)
         }
     except Exception as e:
         logger.error("[%s] Error: %s", "cannot create connection profile", e)
         return {"error": f"cannot create connection profile: {str(e)}"}
 
+def enrich_connection_traits(user_id: str, connection_id: str, images: List[bytes], links: List[str]) -> dict:
+    """
+    Background task: infers a new connection's personality traits and writes them back.
+
+    Skipped if the connection was deleted or its traits were set by an update in the meantime;
+    that check is repeated in the same transaction as the write, so an update landing during
+    inference is kept. If inference itself fails the connection is marked "failed"; a failed
+    write raises so the task is retried.
+
+    Args
+        user_id: User ID
+            str
+        connection_id: Connection ID
+            str
+        images: Image bytes for personality trait inference
+            List[bytes]
+        links: Links for personality trait inference
+            List[str]
+    Return
+        fields written to the connection, or {} if skipped
+            dict
+    """
+    repository = get_repository()
+    current = repository.get_connection(user_id, connection_id)
+    if current is None or current.get("traits_status") != TRAITS_PENDING:
+        logger.info("Trait enrichment for connection %s skipped (deleted or already updated).", connection_id)
+        return {}
+
+    try:
+        # Pictures and links are inferred concurrently; media seen before comes from the trait cache
+        all_traits = infer_personality_traits(user_id, images, links)
+        # Store only the names of the top 4 traits by confidence score
+        enriched = {"personality_traits": merge_trait_scores(all_traits, 4), "traits_status": TRAITS_COMPLETE}
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: trait inference for connection %s failed: %s", err_point, connection_id, e)
+        enriched = {"traits_status": TRAITS_FAILED}
+
+    written = repository.modify_connection(
+        user_id, connection_id,
+        lambda current: enriched if current.get("traits_status") == TRAITS_PENDING else None
+    )
+    if written is None:
+        logger.info("Trait enrichment for connection %s discarded (deleted or updated during inference).", connection_id)
+        return {}
+    get_profile_cache("connection").invalidate(f"{user_id}/{connection_id}")
+    return written
+
+def get_connection_traits_status(user_id: str, connection_id: str) -> dict:
+    """
+    Gets the trait enrichment status of a connection (see create_connection_profile). Read from
+    storage, not the profile cache, so a poll sees the background write as soon as it lands.
+
+    Args
+        user_id: User ID
+            str
+        connection_id: Connection ID
+            str
+    Return
+        connection_id, traits_status and personality_traits (final once traits_status is not "pending")
+            dict
+    """
+    if not user_id or not connection_id or connection_id.endswith(current_app.config['NULL_CONNECTION_ID']):
+        logger.error("Error: Cannot get traits status - missing user ID or connection ID")
+        raise TypeError("Error: Cannot get traits status - missing user ID or connection ID")
+    connection_data = get_repository().get_connection(user_id, connection_id)
+    if connection_data is None:
+        logger.error("Error: Cannot get traits status - connection %s not found", connection_id)
+        raise TypeError("Error: Cannot get traits status - connection not found")
+    return {
+        "connection_id": connection_id,
+        "traits_status": connection_data.get("traits_status"),
+        "personality_traits": connection_data.get("personality_traits") or [],
+    }
+
 def format_connection_profile(connection_profile: ConnectionProfile) -> str:
     """
-    Converts a ConnectionProfile object into a formatted string for human-readable display.
+    Converts a ConnectionProfile object into compact text for prompts and display.
 
     Args:
-        connection_id (str): The unique ID of the connection.
-        profile_data (dict): Dictionary representation of the ConnectionProfile.
+        connection_profile (ConnectionProfile): The profile to format.
 
     Returns:
-        str: A multiline formatted string summarizing the profile contents.
+        str: One "Label: value" line per non-empty field (see utils.profile_format); the
+            text is memoized per profile version.
     """
-    profile = connection_profile.to_dict()
-    connection_id = profile.get('connection_id')
-    lines = [f"connection_id: {connection_id}"]
-
-    for field in fields(ConnectionProfile):
-        key = field.name
-        value = getattr(profile, key)
-
-        if key == "user_id" or value is None:
-            continue
-        if key == "connection_id" or value is None:
-            continue
-
-        if isinstance(value, list):
-            if value:
-                label = "Greenlight Topics" if key == "greenlights" else (
-                        "Redlight Topics" if key == "redlights" else key.capitalize())
-                lines.append(f"{label}: {', '.join(value)}")
-                if key == "personality_traits":
-                    lines.append(f"Personality Traits: {', '.join(value)}")
-        else:
-            lines.append(f"{key.capitalize()}: {value}")
-
-    return "\n".join(lines)
+    return render_profile_text(connection_profile)
 
 def save_connection_profile(connection_profile: ConnectionProfile) -> dict:
     """
@@ -114,35 +181,41 @@ def save_connection_profile(connection_profile: ConnectionProfile) -> dict:
         raise TypeError("Error: Cannot save connection profile - missing user ID or connection ID")
 
     try:
-        db.collection("users").document(user_id).collection("connections").document(connection_id).set(connection_profile_dict)
+        get_repository().set_connection(user_id, connection_id, connection_profile_dict)
+        get_profile_cache("connection").invalidate(f"{user_id}/{connection_id}")
+        index_connection(user_id, connection_id, connection_profile_dict)
         return {"status": "connection profile saved"}
     except Exception as e:
         err_point = __package__ or __name__
         logger.error("[%s] Error saving connection profile:  %s", err_point, e)
         return {'error': f"[{err_point}] - Error: {str(e)}"}
 
-def get_user_connections(user_id:str) -> list:
+def get_user_connections(user_id:str, view: str = "full") -> list:
     """
     Gets the connections associated with the user_id
 
     Args
         user_id: User ID
             str
+        view: "full" for whole profiles, "summary" for the connection index entries (connection_id,
+            name, age, last_used_at; most recently used first), one cached read
+            str
 
     Return
         connections: List of connections associated with the user_id
-            List[ConnectionProfile]
+            List[ConnectionProfile] | List[dict]
     """
     if not user_id:
         logger.error("Error: Cannot get connections - missing user ID")
         raise TypeError("Error: Cannot get connections - missing user ID")
 
     try:
-        connections_ref = db.collection("users").document(user_id).collection("connections")
-        connections = connections_ref.stream()
+        if view == "summary":
+            return list_indexed_connections(user_id)
+
         connection_list = []
-        for connection in connections:
-            connection_data = connection.to_dict()
+        for connection in get_repository().list_connections(user_id):
+            connection_data = connection.data
             profile = ConnectionProfile.from_dict(connection_data)
             connection_list.append(profile)
 
@@ -172,9 +245,10 @@ def set_active_connection_firestore(user_id: str, connection_id: str) -> dict:
         logger.log(current_app.config['DEFAULT_LOG_LEVEL'], "Null connection active in context")
         connection_id = get_null_connection_id(user_id)
     try:
-        db.collection("users").document(user_id).collection("settings").document("active_connection").set({
+        get_repository().set_setting(user_id, "active_connection", {
             "connection_id": connection_id
         })
+        set_indexed_active_connection(user_id, connection_id)
         return {"status": "active connection set", "connection_id": connection_id}
     except Exception as e:
         logger.error(f"Error: Cannot set active connection - {e}")
@@ -198,14 +272,8 @@ def get_active_connection_firestore(user_id: str) -> str:
         raise TypeError("Error: Cannot get active connection - missing user ID")
     
     try:
-        doc_ref = db.collection("users").document(user_id).collection("settings").document("active_connection")
-        doc = doc_ref.get()
-        if doc.exists:
-            return doc.to_dict().get("connection_id")
-        else:
-            active_connection_id = get_null_connection_id(user_id)
-            set_active_connection_firestore(user_id, active_connection_id)
-            return active_connection_id
+        # The index falls back to the null connection when none was ever set
+        return get_active_connection_id(user_id)
     except Exception as e:
         err_point = __package__ or __name__
         logger.error("[%s] Error: %s", err_point, e)
@@ -227,7 +295,7 @@ def clear_active_connection_firestore(user_id: str) -> dict:
         raise TypeError("Error: Cannot clear active connection - missing user ID")
     
     try:
-        db.collection("users").document(user_id).collection("settings").document("active_connection").delete()
+        get_repository().delete_setting(user_id, "active_connection")
         
         active_connection_id = get_null_connection_id(user_id)
         set_active_connection_firestore(user_id, active_connection_id)
@@ -255,9 +323,9 @@ def get_connection_profile(user_id: str, connection_id: str) -> ConnectionProfil
         logger.error("Error: Cannot get connection profile - missing user ID or connection ID")
         raise TypeError("Error: Cannot get connection profile - missing user ID or connection ID")
     try:
-        doc = db.collection("users").document(user_id).collection("connections").document(connection_id).get()
-        if doc.exists:
-            connection_data = doc.to_dict()
+        connection_data = get_profile_cache("connection").get_or_load(
+            f"{user_id}/{connection_id}", lambda: get_repository().get_connection(user_id, connection_id))
+        if connection_data is not None:
             profile = ConnectionProfile.from_dict(connection_data)
             return profile
         else:
@@ -291,18 +359,18 @@ def update_connection_profile(user_id: str, connection_id: str, data: Dict, imag
         logger.error("Error: Cannot update connection profile - missing user ID or connection ID")
         raise TypeError("Error: Cannot update connection profile - missing user ID or connection ID")
     else:
-        pic_traits = infer_personality_traits_from_pics(images) if images else []
-        link_traits = infer_personality_traits_from_links(links) if links else []
-        # Select top 4 traits by confidence score
-        all_traits = pic_traits + link_traits
-        sorted_traits = sorted(all_traits, key=lambda t: t["confidence_score"], reverse=True)
-        combined_traits = sorted_traits[:4]
-        # Store only trait names
-        top_traits = [t["personality_trait"] for t in combined_traits]
-        data["personality_traits"] = top_traits
+        # Unchanged pictures and links hit the trait cache; only new media is sent to the model
+        all_traits = infer_personality_traits(user_id, images, links) if images or links else []
+        # Store only the names of the top 4 traits by confidence score
+        data["personality_traits"] = merge_trait_scores(all_traits, 4)
+        # Supersedes a pending background enrichment
+        data["traits_status"] = TRAITS_COMPLETE
 
         try:
-            db.collection("users").document(user_id).collection("connections").document(connection_id).update(data)
+            get_repository().update_connection(user_id, connection_id, data)
+            get_profile_cache("connection").invalidate(f"{user_id}/{connection_id}")
+            if any(key in data for key in INDEX_FIELDS):
+                index_connection(user_id, connection_id, data)
             return {"status": "connection profile updated"}
         except Exception as e:
             logger.error(f"Error: Cannot update connection profile - {e}")
@@ -325,7 +393,9 @@ def delete_connection_profile(user_id: str, connection_id:str) -> dict:
         logger.error("Error: Cannot delete connection profile - missing user ID or connection ID")
         raise TypeError("Error: Cannot delete connection profile - missing user ID or connection ID")
     try:
-        db.collection("users").document(user_id).collection("connections").document(connection_id).delete()
+        get_repository().delete_connection(user_id, connection_id)
+        get_profile_cache("connection").invalidate(f"{user_id}/{connection_id}")
+        unindex_connection(user_id, connection_id)
         return {"status": "connection profile deleted"}
     except Exception as e:
         logger.error(f"Error: Cannot delete connection profile - {e}")
@@ -0,0 +1,474 @@
+"""
+Similar-conversation retrieval for few-shot prompting.
+
+When a user gives a spur a thumbs-up, the conversation it answered is stored (speakers
+relabelled Party A / Party B, as in the prompt, and names, links and contact details scrubbed by
+the anonymizer) together with the spur as a few-shot example in training/few_shot_examples.
+generate_spurs embeds the current conversation and pulls the most similar examples into the
+prompt context. The ids of the examples a user contributed are kept in their
+"few_shot_examples" setting, so account deletion can purge them (purge_user_examples).
+
+Embeddings are local hashed n-gram TF-IDF vectors: word unigrams/bigrams and character
+n-grams are hashed into a large bucket space for document frequencies, then folded with a
+signed hash into a small dense vector and L2-normalized, so cosine similarity is a dot
+product. No external model or service is involved.
+
+VectorIndex searches exactly with NumPy brute force, and switches to an IVF index (k-means
+coarse quantizer, nprobe nearest lists scanned) once it holds RETRIEVAL_IVF_THRESHOLD items.
+See benchmarks/bench_retrieval.py for recall and latency from 10^4 to 10^6 items.
+
+The index is per process. It is loaded from storage by a background thread started at app
+startup (or by the first lookup); until it is ready, lookups return no examples rather than
+making a request wait for the load. An example recorded by one worker is added only to that
+worker's index; other workers pick it up when they restart.
+"""
+from datetime import datetime, timezone
+from flask import current_app
+from infrastructure.id_generator import generate_anonymous_spur_id, generate_anonymous_user_id
+from infrastructure.logger import get_logger
+from services.repository import TRAINING_FEW_SHOT_EXAMPLES, get_repository
+from utils.conversation_codec import expand_messages
+import numpy as np
+import re
+import threading
+import time
+import zlib
+
+logger = get_logger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+SPEAKER_LABELS = {"user": "Party A", "connection": "Party B"}
+EXAMPLE_SOURCES = "few_shot_examples"  # Settings document listing the example ids a user contributed
+
+_example_index = None
+_example_index_lock = threading.Lock()
+_loader_thread: threading.Thread | None = None
+_pending_examples: list[dict] = []  # Recorded while the index was loading
+_removed_example_ids: set[str] = set()  # Purged from storage; skipped by the loaded index until restart
+
+
+class HashedTfidfEmbedder:
+    """
+    TF-IDF over hashed word and character n-grams, projected to `dim` dimensions.
+
+    Args:
+        dim (int): Output dimensions.
+        buckets (int): Hash buckets used for document frequencies (power of two).
+        char_ngrams (tuple): Character n-gram lengths taken inside each word.
+    """
+
+    def __init__(self, dim: int = 256, buckets: int = 2 ** 20, char_ngrams: tuple = (3, 4, 5)):
+        self.dim = dim
+        self.buckets = buckets
+        self.char_ngrams = char_ngrams
+        self.doc_freq = np.zeros(buckets, dtype=np.int32)
+        self.doc_count = 0
+
+    def features(self, text: str) -> np.ndarray:
+        """ Returns the 32-bit hashes of the text's n-grams (with repeats). """
+        words = WORD_PATTERN.findall((text or "").lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            for n in self.char_ngrams:
+                grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        # crc32 is stable across processes, unlike hash()
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint32, count=len(grams))
+
+    def update_doc_freq(self, hashes: np.ndarray):
+        buckets = np.unique(hashes & (self.buckets - 1))
+        self.doc_freq[buckets] += 1
+        self.doc_count += 1
+
+    def embed_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if hashes.size == 0:
+            return vector
+        unique, counts = np.unique(hashes, return_counts=True)
+        idf = np.log((1.0 + self.doc_count) / (1.0 + self.doc_freq[unique & (self.buckets - 1)])) + 1.0
+        weights = (1.0 + np.log(counts)) * idf
+        signs = np.where(unique >> 31, -1.0, 1.0)
+        positions = ((unique.astype(np.uint64) * np.uint64(0x9E3779B1)) >> np.uint64(16)) % np.uint64(self.dim)
+        np.add.at(vector, positions.astype(np.int64), (signs * weights).astype(np.float32))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed(self, text: str) -> np.ndarray:
+        """ Embeds one text with the current document frequencies. """
+        return self.embed_hashes(self.features(text))
+
+    def fit_embed(self, texts: list[str]) -> np.ndarray:
+        """ Counts document frequencies over texts, then embeds them. Returns an (n, dim) matrix. """
+        hashes = [self.features(text) for text in texts]
+        for text_hashes in hashes:
+            self.update_doc_freq(text_hashes)
+        if not hashes:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed_hashes(text_hashes) for text_hashes in hashes])
+
+
+class VectorIndex:
+    """
+    Inner-product index over L2-normalized vectors.
+
+    Below ivf_threshold items every search is exact brute force. At the threshold a k-means
+    coarse quantizer with ~sqrt(n) lists is trained on a sample; searches then scan only the
+    nprobe lists nearest to the query. The quantizer is retrained when the index doubles.
+
+    Adds are serialized; searches take no lock. Each add (and retrain) publishes the vector
+    buffer, size and quantizer as one snapshot tuple, and the quantizer's (centroids, lists) are
+    replaced rather than mutated, so a search running during an add or retrain sees either the
+    old state or the new one, never a mix.
+
+    Args:
+        dim (int): Vector dimensions.
+        ivf_threshold (int): Size at which the IVF quantizer is trained.
+        nprobe (int): Lists scanned per IVF search.
+    """
+
+    def __init__(self, dim: int, ivf_threshold: int = 50000, nprobe: int = 8, seed: int = 0):
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.rng = np.random.default_rng(seed)
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self.size = 0
+        self._ivf = None  # (centroids, lists) once trained
+        self._trained_size = 0
+        self._snapshot = (self._vectors, 0, None)  # (buffer, size, ivf) read by search
+        self._lock = threading.Lock()
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.size]
+
+    @property
+    def centroids(self) -> np.ndarray | None:
+        return self._ivf[0] if self._ivf is not None else None
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """ Adds vectors (n, dim) and returns their row ids. """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            start = self.size
+            needed = start + len(vectors)
+            if needed > len(self._vectors):
+                grown = np.zeros((max(needed, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+                grown[:start] = self._vectors[:start]
+                self._vectors = grown
+            self._vectors[start:needed] = vectors
+            self.size = needed
+            ids = np.arange(start, needed)
+            if self._ivf is not None and needed < 2 * self._trained_size:
+                centroids, lists = self._ivf
+                lists = list(lists)
+                assignments = np.argmax(vectors @ centroids.T, axis=1)
+                for list_id in np.unique(assignments):
+                    lists[list_id] = np.concatenate([lists[list_id], ids[assignments == list_id]])
+                self._ivf = (centroids, lists)
+            elif needed >= self.ivf_threshold:
+                self.train_ivf()
+            self._snapshot = (self._vectors, self.size, self._ivf)
+            return ids
+
+    def train_ivf(self, iterations: int = 10, sample_size: int = 65536):
+        """ Spherical k-means on a sample, then assigns every vector to its nearest list. """
+        vectors = self.vectors
+        nlist = max(16, int(np.sqrt(self.size)))
+        sample = vectors[self.rng.choice(self.size, size=min(sample_size, self.size), replace=False)]
+        centroids = sample[self.rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            present, starts = np.unique(assignments[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            sums[empty] = sample[self.rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignments = np.empty(self.size, dtype=np.int64)
+        for start in range(0, self.size, 65536):  # Chunked to bound the (chunk, nlist) score matrix
+            assignments[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        boundaries = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        self._ivf = (centroids.astype(np.float32), [order[boundaries[i]:boundaries[i + 1]] for i in range(nlist)])
+        self._trained_size = self.size
+        self._snapshot = (self._vectors, self.size, self._ivf)
+        logger.info("Trained IVF quantizer: %d lists over %d vectors", nlist, self.size)
+
+    def search(self, query: np.ndarray, k: int = 5, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k most similar vectors.
+
+        Args:
+            query (np.ndarray): (dim,) L2-normalized query.
+            k (int): Number of results.
+            exact (bool): Force brute force even when the IVF index is trained.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (row ids, scores), best first.
+        """
+        buffer, size, ivf = self._snapshot
+        if size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        if exact or ivf is None:
+            candidates = None
+            scores = buffer[:size] @ query
+        else:
+            centroids, lists = ivf
+            probe = np.argpartition(-(centroids @ query), min(self.nprobe, len(centroids) - 1))[:self.nprobe]
+            candidates = np.concatenate([lists[list_id] for list_id in probe])
+            scores = buffer[candidates] @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = top if candidates is None else candidates[top]
+        return ids, scores[top]
+
+
+class ExampleIndex:
+    """ Few-shot examples with their embeddings. """
+
+    def __init__(self, embedder: HashedTfidfEmbedder, vector_index: VectorIndex):
+        self.embedder = embedder
+        self.vector_index = vector_index
+        self.examples: list[dict] = []  # Row i of vector_index is examples[i]
+        # Serializes adds (background tasks), which keeps examples and vector rows in the same order
+        self._add_lock = threading.Lock()
+        # Guards the embedder's document frequencies and the examples list; held briefly, never
+        # while vectors are added, so searches do not wait on an IVF retrain
+        self._lock = threading.Lock()
+        self._removed: set[str] = set()  # Example ids that search skips (rows stay in the vector index)
+
+    @staticmethod
+    def example_key(example: dict) -> str:
+        """ The text an example is matched on: situation, topic and the conversation. """
+        return " ".join(filter(None, [example.get("situation"), example.get("topic"), example.get("conversation_text")]))
+
+    def build(self, examples: list[dict]):
+        with self._add_lock:
+            with self._lock:
+                vectors = self.embedder.fit_embed([self.example_key(example) for example in examples])
+                # Examples go in before their rows, so a row a search can return always has its example
+                self.examples.extend(examples)
+            if len(vectors):
+                self.vector_index.add(vectors)
+
+    def add(self, example: dict):
+        with self._add_lock:
+            with self._lock:
+                hashes = self.embedder.features(self.example_key(example))
+                self.embedder.update_doc_freq(hashes)
+                vector = self.embedder.embed_hashes(hashes)
+                self.examples.append(example)
+            self.vector_index.add(vector)
+
+    def remove(self, example_ids: set[str]):
+        """ Stops returning these examples from search. """
+        with self._lock:
+            self._removed |= set(example_ids)
+
+    def search(self, query_example: dict, k: int, min_score: float = 0.0) -> list[dict]:
+        with self._lock:  # Document frequencies change with every add
+            query = self.embedder.embed(self.example_key(query_example))
+            removed = len(self._removed)
+        ids, scores = self.vector_index.search(query, k + removed)
+        with self._lock:
+            found = [{**self.examples[i], "score": float(score)} for i, score in zip(ids, scores)
+                     if score >= min_score and self.examples[i].get("example_id") not in self._removed]
+        return found[:k]
+
+
+def format_conversation_for_example(messages: list[dict]) -> str:
+    """ Renders conversation messages with the prompt's Party A / Party B speaker labels. """
+    lines = []
+    for message in messages or []:
+        speaker = SPEAKER_LABELS.get(str(message.get("speaker", "")).lower(), "Unknown")
+        lines.append(f"{speaker}: {message.get('text', '')}")
+    return "\n".join(lines)
+
+
+def _load_example_index(app):
+    """ Builds the index from the stored examples, then publishes it with any examples recorded meanwhile. """
+    global _example_index, _loader_thread
+    with app.app_context():
+        try:
+            config = current_app.config
+            embedder = HashedTfidfEmbedder(dim=int(config.get('RETRIEVAL_EMBEDDING_DIM', 256)))
+            vector_index = VectorIndex(embedder.dim, ivf_threshold=int(config.get('RETRIEVAL_IVF_THRESHOLD', 50000)),
+                                       nprobe=int(config.get('RETRIEVAL_IVF_NPROBE', 8)))
+            index = ExampleIndex(embedder, vector_index)
+            started = time.perf_counter()
+            examples = [doc.data for doc in get_repository().list_training_records(TRAINING_FEW_SHOT_EXAMPLES)]
+            index.build(examples)
+            logger.info("Loaded %d few-shot examples in %.1fms", len(examples), (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            err_point = __package__ or __name__
+            logger.error("[%s] Error: loading few-shot examples failed: %s", err_point, e)
+            with _example_index_lock:
+                _loader_thread = None  # The next lookup tries again
+            return
+    loaded_ids = {example.get("example_id") for example in examples}
+    with _example_index_lock:
+        for example in _pending_examples:
+            if example.get("example_id") not in loaded_ids:  # Stored before the load read it
+                index.add(example)
+        _pending_examples.clear()
+        index.remove(_removed_example_ids)
+        _example_index = index
+
+
+def start_example_index_load(app):
+    """
+    Starts loading the few-shot example index in a background thread, unless it is loaded or loading.
+
+    Args:
+        app: Flask app object providing configuration.
+    """
+    global _loader_thread
+    with _example_index_lock:
+        if _example_index is not None or _loader_thread is not None:
+            return
+        _loader_thread = threading.Thread(target=_load_example_index, args=(app,), name="example-index-loader", daemon=True)
+        _loader_thread.start()
+    logger.info("Few-shot example index loading started.")
+
+
+def get_example_index() -> ExampleIndex | None:
+    """ Returns the process-wide example index, or None while it is loading (the load is started if need be). """
+    if _example_index is None:
+        start_example_index_load(current_app._get_current_object())
+    return _example_index
+
+
+def _participant_names(user_id: str, connection_id: str | None) -> list[str]:
+    """ Names of the user and the connection, for scrubbing them from example text. """
+    repository = get_repository()
+    names = [(repository.get_user(user_id) or {}).get("name")]
+    if connection_id:
+        names.append((repository.get_connection(user_id, connection_id) or {}).get("name"))
+    return [name for name in names if name]
+
+
+def record_quality_example(user_id: str, spur) -> str | None:
+    """
+    Stores a thumbs-up spur with the (relabelled, scrubbed) conversation it answered as a
+    few-shot example, links it to the user for account deletion, and adds it to this
+    process's index. Runs as a background task.
+
+    Args
+        user_id: owner of the spur's conversation
+            str
+        spur: spur that received positive feedback
+            Spur
+    Return
+        id of the stored example, or None if the spur has no conversation
+            str | None
+    """
+    if not spur.conversation_id or not spur.text:
+        return None
+    # The anonymizer imports the profile services, which import account deletion, which imports this module
+    from gpt_training.anonymizer import scrub_text
+
+    repository = get_repository()
+    conversation = repository.get_conversation(user_id, spur.conversation_id)
+    if conversation is None:
+        return None
+    names = _participant_names(user_id, conversation.get("connection_id") or spur.connection_id)
+    messages = [{**message, "text": scrub_text(message.get("text", ""), names)}
+                for message in expand_messages(conversation.get("conversation"))]
+    conversation_text = format_conversation_for_example(messages)
+    if not conversation_text:
+        return None
+
+    example_id = generate_anonymous_spur_id(generate_anonymous_user_id())
+    example = {
+        "example_id": example_id,
+        "conversation_text": conversation_text,
+        "situation": spur.situation or "",
+        "topic": spur.topic or "",
+        "variant": spur.variant or "",
+        "spur_text": scrub_text(spur.text, names),
+        "created_at": datetime.now(timezone.utc),
+    }
+    # Linked before it is stored, so a stored example is always reachable from its account
+    repository.modify_setting(user_id, EXAMPLE_SOURCES, lambda current: {
+        "example_ids": (current or {}).get("example_ids", []) + [example_id]})
+    repository.set_training_record(TRAINING_FEW_SHOT_EXAMPLES, example_id, example)
+    with _example_index_lock:
+        index = _example_index
+        if index is None:
+            _pending_examples.append(example)
+    if index is not None:
+        index.add(example)
+    else:
+        start_example_index_load(current_app._get_current_object())
+    return example_id
+
+
+def purge_user_examples(user_id: str) -> int:
+    """
+    Deletes the few-shot examples a user contributed and stops this process's index from
+    returning them. Called by account deletion before the user's settings are deleted.
+
+    Args
+        user_id: account whose examples are purged
+            str
+    Return
+        number of examples deleted
+            int
+    """
+    repository = get_repository()
+    example_ids = (repository.get_setting(user_id, EXAMPLE_SOURCES) or {}).get("example_ids") or []
+    for example_id in example_ids:
+        repository.delete_training_record(TRAINING_FEW_SHOT_EXAMPLES, example_id)
+    with _example_index_lock:
+        _removed_example_ids.update(example_ids)
+        _pending_examples[:] = [example for example in _pending_examples if example.get("example_id") not in _removed_example_ids]
+        index = _example_index
+    if index is not None:
+        index.remove(set(example_ids))
+    return len(example_ids)
+
+
+def find_similar_examples(conversation_text: str, situation: str = "", topic: str = "", k: int | None = None) -> list[dict]:
+    """
+    Finds the stored few-shot examples most similar to the current conversation.
+
+    Args
+        conversation_text: conversation being answered
+            str
+        situation: situation of the conversation
+            str
+        topic: topic of the conversation
+            str
+        k: number of examples; defaults to FEW_SHOT_EXAMPLES_K
+            int
+    Return
+        examples (conversation_text, situation, topic, variant, spur_text, score), best first;
+        none while the index is still loading
+            list[dict]
+    """
+    k = k or int(current_app.config.get('FEW_SHOT_EXAMPLES_K', 3))
+    min_score = float(current_app.config.get('FEW_SHOT_MIN_SCORE', 0.2))
+    index = get_example_index()
+    if index is None:
+        return []
+    query = {"conversation_text": conversation_text, "situation": situation, "topic": topic}
+    return index.search(query, k, min_score)
+
+
+def format_examples_block(examples: list[dict]) -> str:
+    """ Formats few-shot examples for the prompt context block. """
+    if not examples:
+        return ""
+    block = "***Examples of Well-Received Spurs in Similar Conversations:***\n"
+    for number, example in enumerate(examples, start=1):
+        block += f"Example {number} (situation: {example.get('situation') or 'n/a'}, topic: {example.get('topic') or 'n/a'}):\n"
+        block += f"{example.get('conversation_text', '')}\n"
+        block += f"Spur ({example.get('variant') or 'spur'}): {example.get('spur_text', '')}\n\n"
+    return block
@@ -6,6 +6,7 @@ from flask import current_app
 from infrastructure.clients import get_openai_client
 from infrastructure.id_generator import generate_spur_id
 from infrastructure.logger import get_logger
+from services.example_retrieval import find_similar_examples, format_examples_block
 from services.connection_service import format_connection_profile, get_connection_profile, get_active_connection_firestore
 from services.storage_service import get_conversation
 from services.user_service import format_user_profile, get_user_profile
@@ -127,6 +128,13 @@ def generate_spurs(
             # You could add more structured data from photo_analysis if present
         context_block += "\n"
 
+    # Few-shot examples: past thumbs-up spurs for the most similar conversations
+    if conversation_text:
+        try:
+            context_block += format_examples_block(find_similar_examples(conversation_text, situation or "", topic or ""))
+        except Exception as e:
+            logger.warning(f"Few-shot example retrieval failed for user {user_id}: {e}")
+
     context_block += "***Conversation Between User and Connection:***\n"
     context_block += f"{conversation_text}\n\n"
 
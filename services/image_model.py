@@ -0,0 +1,161 @@
+"""
+Lightweight trained image classifier (conversation / profile_snippet / photo).
+
+A multinomial logistic regression over cheap features: downscaled edge magnitude and
+orientation histograms, a coarse edge-density grid, row-profile statistics, and color
+statistics. Inference is a handful of NumPy ops on a 64x64 thumbnail, so it costs far less
+than the contour/Hough heuristics and never calls an external service.
+
+Train and save weights:
+    python -m services.image_model --out resources/image_classifier.npz [--fixtures DIR]
+
+Select it at runtime with IMAGE_CLASSIFIER=trained (see services.classifiers).
+"""
+import cv2
+import numpy as np
+
+CLASSES = ("conversation", "profile_snippet", "photo")
+THUMB_SIZE = 64
+EDGE_BINS = 8
+ORIENTATION_BINS = 8
+GRID = 4
+
+
+def extract_features(image_cv2: np.ndarray) -> np.ndarray:
+    """
+    Computes the feature vector for one BGR image.
+
+    Args:
+        image_cv2 (np.ndarray): BGR image.
+
+    Returns:
+        np.ndarray: 1D float32 feature vector.
+    """
+    height, width = image_cv2.shape[:2]
+    thumb = cv2.resize(image_cv2, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+    gray = thumb.astype(np.float32).mean(axis=2)
+
+    # Edge magnitude / orientation (central differences)
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+    gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    edge_hist = np.histogram(magnitude, bins=EDGE_BINS, range=(0, 256))[0] / magnitude.size
+    orientation = np.mod(np.arctan2(gy, gx), np.pi)
+    orientation_hist = np.histogram(orientation, bins=ORIENTATION_BINS, range=(0, np.pi), weights=magnitude)[0]
+    orientation_hist = orientation_hist / (orientation_hist.sum() + 1e-6)
+
+    strong = magnitude > 40
+    cell = THUMB_SIZE // GRID
+    edge_grid = strong.reshape(GRID, cell, GRID, cell).mean(axis=(1, 3)).ravel()
+
+    # Row profile: text lines and bubbles give alternating busy/empty rows
+    row_activity = strong.mean(axis=1)
+    row_transitions = np.count_nonzero(np.diff(row_activity > 0.05)) / THUMB_SIZE
+    column_activity = strong.mean(axis=0)
+    left_right_balance = column_activity[:THUMB_SIZE // 2].sum() - column_activity[THUMB_SIZE // 2:].sum()
+
+    # Color statistics
+    hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV).astype(np.float32)
+    saturation = hsv[..., 1] / 255.0
+    value = hsv[..., 2] / 255.0
+    channel_mean = thumb.reshape(-1, 3).mean(axis=0) / 255.0
+    channel_std = thumb.reshape(-1, 3).std(axis=0) / 255.0
+    quantized = (thumb.reshape(-1, 3) // 32).astype(np.int32)
+    color_codes = quantized[:, 0] * 64 + quantized[:, 1] * 8 + quantized[:, 2]
+    color_counts = np.sort(np.bincount(color_codes, minlength=512))[::-1]
+    top_color_share = color_counts[:4].sum() / color_codes.size
+    distinct_colors = np.count_nonzero(color_counts) / 512.0
+
+    return np.concatenate([
+        edge_hist,
+        orientation_hist,
+        edge_grid,
+        [row_activity.std(), row_transitions, abs(left_right_balance) / THUMB_SIZE, strong.mean()],
+        channel_mean,
+        channel_std,
+        [saturation.mean(), saturation.std(), value.mean(), value.std()],
+        [top_color_share, distinct_colors],
+        [np.log(width / float(height))],
+    ]).astype(np.float32)
+
+
+class ImageClassifierModel:
+    """ Multinomial logistic regression with feature standardization. """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, mean: np.ndarray, scale: np.ndarray, classes=CLASSES):
+        self.weights = weights
+        self.bias = bias
+        self.mean = mean
+        self.scale = scale
+        self.classes = tuple(classes)
+
+    @classmethod
+    def train(cls, features: np.ndarray, labels: np.ndarray, epochs: int = 400, learning_rate: float = 0.5,
+              l2: float = 1e-3, classes=CLASSES) -> "ImageClassifierModel":
+        """
+        Fits the model with full-batch gradient descent.
+
+        Args:
+            features (np.ndarray): (n, d) feature matrix.
+            labels (np.ndarray): (n,) integer class indices into classes.
+        """
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0) + 1e-6
+        x = (features - mean) / scale
+        n, d = x.shape
+        k = len(classes)
+        onehot = np.eye(k, dtype=np.float32)[labels]
+        weights = np.zeros((d, k), dtype=np.float32)
+        bias = np.zeros(k, dtype=np.float32)
+        for _ in range(epochs):
+            probs = _softmax(x @ weights + bias)
+            grad = (probs - onehot) / n
+            weights -= learning_rate * (x.T @ grad + l2 * weights)
+            bias -= learning_rate * grad.sum(axis=0)
+        return cls(weights, bias, mean, scale, classes)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        x = (np.atleast_2d(features) - self.mean) / self.scale
+        return _softmax(x @ self.weights + self.bias)
+
+    def predict(self, image_cv2: np.ndarray) -> tuple[str, float]:
+        """ Returns (label, probability) for one BGR image. """
+        probs = self.predict_proba(extract_features(image_cv2))[0]
+        best = int(np.argmax(probs))
+        return self.classes[best], float(probs[best])
+
+    def save(self, path: str):
+        np.savez(path, weights=self.weights, bias=self.bias, mean=self.mean, scale=self.scale,
+                 classes=np.array(self.classes))
+
+    @classmethod
+    def load(cls, path: str) -> "ImageClassifierModel":
+        data = np.load(path)
+        return cls(data["weights"], data["bias"], data["mean"], data["scale"], [str(c) for c in data["classes"]])
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    from services.classifier_dataset import build_dataset
+
+    parser = argparse.ArgumentParser(description="Train the lightweight image classifier.")
+    parser.add_argument("--out", default="resources/image_classifier.npz")
+    parser.add_argument("--per-class", type=int, default=300, help="Synthetic images per class")
+    parser.add_argument("--fixtures", default=None, help="Directory with <class>/*.png|jpg fixture images")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    images, labels = build_dataset(args.per_class, seed=args.seed, fixtures_dir=args.fixtures)
+    features = np.stack([extract_features(img) for img in images])
+    model = ImageClassifierModel.train(features, np.array(labels))
+    accuracy = float((model.predict_proba(features).argmax(axis=1) == np.array(labels)).mean())
+    model.save(args.out)
+    print(f"Trained on {len(images)} images (train accuracy {accuracy:.3f}); saved to {args.out}")
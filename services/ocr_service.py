@@ -1,16 +1,83 @@
 from flask import jsonify
 from google.cloud import vision_v1
 from google.cloud.vision_v1 import ImageAnnotatorClient, Image, types
-from infrastructure.clients import vision_client
+from infrastructure.clients import get_vision_client
+from infrastructure.image_pool import run_image_task, ImagePoolBusyError
 from infrastructure.logger import get_logger
-from utils.ocr_utils import extract_conversation, crop_top_bottom_cv
-import cv2
-import numpy as np
+from services.classifiers import classify_screenshot_text
+from utils.extract_profile_snippet import extract_profile_snippet
+from utils.ocr_utils import extract_conversation
 
 
 logger = get_logger(__name__)
 
 
+def detect_text(content) -> types.AnnotateImageResponse:
+	"""
+	Runs a single Vision DOCUMENT_TEXT_DETECTION request on encoded image bytes.
+
+	Args
+		content: encoded image (PNG/JPEG)
+			bytes | memoryview
+	Return
+		Vision response; full_text_annotation holds the detected pages and text
+			AnnotateImageResponse
+	"""
+	response = get_vision_client().document_text_detection(image=Image(content=bytes(content)))
+	if response.error.message:
+		err_point = __package__ or __name__
+		logger.error(f"Error: {err_point}: {response.error.message}")
+		raise RuntimeError(f"[{err_point}] - Error - {response.error.message}")
+	return response
+
+
+def process_screenshot(user_id, image_bytes, category: str) -> tuple[str, list[dict] | dict]:
+	"""
+	Handles a screenshot candidate with at most one paid OCR call. The detected text settles
+	'conversation' vs 'profile_snippet' by keyword scoring and is then parsed by the matching
+	extractor, so the image is never sent to Vision twice.
+
+	Args
+		user_id: User ID
+			str
+		image_bytes: encoded image from the upload
+			bytes | memoryview
+		category: category from image-only classification ('conversation' or 'profile_snippet')
+			str
+	Return
+		(final category, extracted conversation messages or profile snippet)
+			tuple[str, list[dict] | dict]
+	"""
+	try:
+		if category == "conversation":
+			# Chat screenshots go to Vision cropped to the message area (image pool)
+			content = run_image_task("prepare_ocr", image_bytes)
+			if content is None:
+				raise RuntimeError("Image could not be decoded, cropped, or encoded")
+		else:
+			# Profile screenshots are sent as uploaded; no decode needed
+			content = image_bytes
+
+		response = detect_text(content)
+		annotation = response.full_text_annotation
+		text_category = classify_screenshot_text(annotation.text)
+		if text_category and text_category != category:
+			logger.info("OCR keywords reclassified screenshot from '%s' to '%s' for user_id: %s", category, text_category, user_id)
+			category = text_category
+
+		if category == "conversation":
+			if not annotation.pages:
+				raise RuntimeError("No text detected in conversation screenshot")
+			return category, extract_conversation(user_id, annotation.pages[0])
+		return category, extract_profile_snippet(annotation)
+	except ImagePoolBusyError:
+		raise
+	except Exception as e:
+		err_point = __package__ or __name__
+		logger.error("[%s] Error: %s", err_point, e)
+		raise Exception(f"error: [{err_point}] - Error: {str(e)}")
+
+
 def process_image(user_id, image_file) -> list[dict]:
 	"""""
 		Accepts a user_id and file_name as arg, file should be a screen shot of a messaging conversation. 
@@ -26,47 +93,20 @@ def process_image(user_id, image_file) -> list[dict]:
 		
 		Will need to import Flask and request to use this error check. 
 	"""""
-	client = vision_client
 	try:
-		# Save the file temporarily to process it
-		image_byte = image_file.read()
+		# Accept either an uploaded file object or the raw bytes already read by the route
+		image_byte = image_file.read() if hasattr(image_file, "read") else image_file
 
-		np_arr = np.frombuffer(image_byte, np.uint8)
-		image_array = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+		# Decode, crop to the chat region and re-encode in the image pool (off the request thread)
+		content = run_image_task("prepare_ocr", image_byte)
 
-		if image_array is None:
+		if content is None:
 			err_point = __package__ or __name__
-			logger.error(f"Error: {err_point}")
-			raise RuntimeError (f"[{err_point}] - Error:")
+			logger.error(f"Error: {err_point} - Image could not be decoded, cropped, or encoded")
+			raise RuntimeError(f"[{err_point}] - Error: Image could not be decoded, cropped, or encoded")
 
-		cropped_img = crop_top_bottom_cv(image_array)
+		response = detect_text(content)
 
-		if cropped_img is None:
-			err_point = __package__ or __name__
-			logger.error(f"Error: {err_point} - Cropped image is None")
-			raise RuntimeError(f"[{err_point}] - Error: Cropped image is None")
-		
-		success, encoded_image = cv2.imencode('.png', cropped_img)
-		if not success:
-			err_point = __package__ or __name__
-			logger.error(f"Error: {err_point}")
-			raise RuntimeError(f"[{err_point}] - Error:")
-		
-		content = encoded_image.tobytes()
-		image = Image(content=content)
-
-
-		response = client.annotate_image({'image': image})
-		## OR
-		## response = client.batch_document_text_detection(requests=[{"image": image}])
-		## OR (original)
-		## response = client.document_text_detection(image=image)
-
-		if response.error.message:
-			err_point = __package__ or __name__
-			logger.error(f"Error: {err_point}: {response.error.message}")
-			raise RuntimeError (f"[{err_point}] - Error - {response.error.messasge}")
-		
 		conversation_msgs = extract_conversation(user_id, response.full_text_annotation.pages[0])
 
 		if conversation_msgs:
@@ -75,6 +115,8 @@ def process_image(user_id, image_file) -> list[dict]:
 			err_point = __package__ or __name__
 			logger.error(f"Error: {err_point}")
 			raise RuntimeError(f"error: {err_point} - Error")
+	except ImagePoolBusyError:
+		raise
 	except Exception as e:
 				err_point = __package__ or __name__
 				logger.error("[%s] Error: %s", err_point, e)
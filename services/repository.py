@@ -0,0 +1,1160 @@
+"""
+Storage repository: typed access to users, connections, settings, conversations, spurs,
+training records and account deletion jobs, independent of where they are stored.
+
+    FirestoreRepository  Firestore (production). Reads go through the request identity map,
+                         conversation writes carry their search-outbox intent in the same batch.
+    InMemoryRepository   dicts in this process (tests, benchmarks)
+    SQLiteRepository     one local SQLite file (offline development, benchmarks at scale)
+
+All three have the same semantics: documents are dicts (datetimes stay datetimes), get_*
+returns None for a missing document, update_* raises DocumentNotFoundError for one, and list
+methods order by created_at then document id and page with start_after=(created_at, id).
+List and batch reads take an optional fields projection (Firestore select()/field masks) for
+summary views; projected documents omit fields that are missing or null.
+The local repositories apply search intents straight to the search backend after the write,
+since there is no remote outbox to drain.
+
+STORAGE_BACKEND selects one: "firestore", "memory" or "sqlite" (STORAGE_SQLITE_PATH).
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import current_app
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from infrastructure.clients import get_firestore_client
+from infrastructure.identity_map import forget_document, get_document, peek_document, record_documents
+from infrastructure.logger import get_logger
+from services.search_backend import get_search_backend
+from services.search_indexer import enqueue_append, enqueue_delete, enqueue_index, notify_search_indexer
+from typing import Callable, Iterator, NamedTuple
+import base64
+import copy
+import json
+import sqlite3
+import threading
+
+logger = get_logger(__name__)
+
+USERS = "users"
+CONNECTIONS = "connections"
+SETTINGS = "settings"
+CONVERSATIONS = "conversations"
+SPURS = "spurs"
+ITEM_TRAITS = "item_traits"  # Traits inferred from one image / profile URL of a connection, keyed by its hash
+TRAINING = "training"
+
+# Training record kinds, stored under training/{kind}/batch
+TRAINING_CONVERSATIONS = "conversations"
+TRAINING_QUALITY_SPURS = "quality_spurs"
+TRAINING_BAD_SPURS = "bad_spurs"
+TRAINING_FEW_SHOT_EXAMPLES = "few_shot_examples"
+DELETION_JOBS = "deletion_jobs"  # Firestore uses DELETION_JOBS_COLLECTION
+
+DATETIME_TAG = "$dt"
+BYTES_TAG = "$b"
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+class DocumentNotFoundError(LookupError):
+    """ Raised when updating a document that does not exist. """
+
+
+class Document(NamedTuple):
+    id: str
+    data: dict
+
+
+class SearchIntent(NamedTuple):
+    """ Search index change that must be applied together with a conversation write. """
+    index_name: str
+    object_id: str
+    record: dict | None  # None removes object_id from the index
+    append: bool = False  # record is {"objectID", "text"}: text added to the existing record
+
+
+def _timestamp(value) -> float | None:
+    """ created_at/filter value as a Unix timestamp; naive datetimes are taken as UTC. """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+class Repository(ABC):
+    """ Interface shared by the storage repositories. """
+
+    name = "base"
+
+    # --- Users ---
+    @abstractmethod
+    def get_user(self, user_id: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_user(self, user_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_user(self, user_id: str, fields: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_user(self, user_id: str):
+        raise NotImplementedError
+
+    # --- Connections ---
+    @abstractmethod
+    def get_connection(self, user_id: str, connection_id: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_connection(self, user_id: str, connection_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_connection(self, user_id: str, connection_id: str, fields: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_connection(self, user_id: str, connection_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def modify_connection(self, user_id: str, connection_id: str, modify: Callable[[dict], dict | None]) -> dict | None:
+        """
+        Atomic read-then-update of one connection. A missing connection is left missing.
+
+        Args
+            user_id: owner of the connection
+                str
+            connection_id: Connection ID
+                str
+            modify: gets the stored connection, returns the fields to update (as in
+                update_connection), or None to leave it unchanged; may be called more than once if
+                the write is retried
+                Callable[[dict], dict | None]
+        Return
+            the fields written, or None if nothing was written
+                dict | None
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_connections(self, user_id: str, fields: list[str] | None = None,
+                         start_after: tuple | None = None, limit: int | None = None) -> list[Document]:
+        """
+        Lists a user's connections in document id order (connections carry no created_at).
+
+        Args
+            fields: projection, as in list_conversations
+                list[str] | None
+            start_after: (created_at, id) of the last connection of the previous page; only the id is used
+                tuple | None
+            limit: page size; None lists every connection
+                int | None
+        """
+        raise NotImplementedError
+
+    # --- Per-user settings documents (e.g. "active_connection") ---
+    @abstractmethod
+    def get_setting(self, user_id: str, name: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_setting(self, user_id: str, name: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_setting(self, user_id: str, name: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def modify_setting(self, user_id: str, name: str, modify: Callable[[dict | None], dict | None]) -> dict | None:
+        """
+        Atomic read-modify-write of one settings document, which is created if missing.
+
+        Args
+            user_id: owner of the setting
+                str
+            name: settings document name
+                str
+            modify: gets the stored document (None if missing), returns the whole new document, or
+                None to leave it unchanged; may be called more than once if the write is retried
+                Callable[[dict | None], dict | None]
+        Return
+            the document written, or None if nothing was written
+                dict | None
+        """
+        raise NotImplementedError
+
+    # --- Conversations ---
+    @abstractmethod
+    def get_conversation(self, user_id: str, conversation_id: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_conversations(self, user_id: str, conversation_ids: list[str], fields: list[str] | None = None) -> dict[str, dict]:
+        """ Batch read; returns {conversation_id: data} for the conversations that exist. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_conversation(self, user_id: str, conversation_id: str, data: dict, search_intent: SearchIntent | None = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_conversation(self, user_id: str, conversation_id: str, search_intent: SearchIntent | None = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def modify_conversation(self, user_id: str, conversation_id: str,
+                            modify: Callable[[dict], tuple[dict, SearchIntent | None]]) -> dict:
+        """
+        Atomic read-modify-write of one conversation, committed together with its search intent.
+
+        Args
+            user_id: owner of the conversation
+                str
+            conversation_id: conversation to change
+                str
+            modify: gets the stored document, returns (fields to update, search intent); may be
+                called more than once if the write is retried, so it must not have side effects
+                Callable[[dict], tuple[dict, SearchIntent | None]]
+        Return
+            the fields written
+                dict
+        Raises
+            DocumentNotFoundError: the conversation does not exist
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_conversations(self, user_id: str, connection_id: str | None = None, date_from=None, date_to=None,
+                           descending: bool = True, start_after: tuple | None = None, limit: int = 20,
+                           fields: list[str] | None = None) -> list[Document]:
+        """
+        One page of a user's conversations ordered by (created_at, id).
+
+        Args
+            connection_id: only conversations with this connection_id
+                str | None
+            date_from / date_to: inclusive created_at bounds
+                datetime | None
+            descending: newest first
+                bool
+            start_after: (created_at, id) of the last document of the previous page
+                tuple | None
+            limit: maximum number of documents
+                int
+            fields: only read these fields (summary views); None reads whole documents
+                list[str] | None
+        Return
+            conversations
+                list[Document]
+        """
+        raise NotImplementedError
+
+    # --- Saved spurs ---
+    @abstractmethod
+    def get_spur(self, user_id: str, spur_id: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_spur(self, user_id: str, spur_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_spur(self, user_id: str, spur_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_spurs(self, user_id: str, variant: str | None = None, situation: str | None = None, date_from=None,
+                   date_to=None, descending: bool = True, start_after: tuple | None = None,
+                   limit: int | None = None, fields: list[str] | None = None) -> Iterator[Document]:
+        """ Saved spurs ordered by (created_at, id), read lazily so callers can filter and stop early. """
+        raise NotImplementedError
+
+    # --- Inferred traits per image / profile URL (utils.trait_manager) ---
+    @abstractmethod
+    def get_item_traits(self, user_id: str, record_ids: list[str]) -> dict[str, dict]:
+        """ Batch read; returns {record_id: data} for the records that exist. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_item_traits(self, user_id: str, record_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_item_traits(self, user_id: str, record_ids: list[str]):
+        raise NotImplementedError
+
+    # --- Training records (anonymized) ---
+    @abstractmethod
+    def set_training_record(self, kind: str, record_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_training_records(self, kind: str, record_ids: list[str]) -> dict[str, dict]:
+        """ Batch read; returns {record_id: data} for the records that exist. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_training_records(self, kind: str) -> list[Document]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_training_record(self, kind: str, record_id: str):
+        raise NotImplementedError
+
+    # --- Account deletion ---
+    @abstractmethod
+    def get_deletion_job(self, job_id: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_deletion_job(self, job_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_deletion_job(self, job_id: str, fields: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_deletion_jobs(self, user_id: str | None = None, statuses: list[str] | None = None) -> list[dict]:
+        """ Deletion jobs, optionally only those of one user and/or with one of the given statuses. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_user_collections(self, user_id: str) -> list[str]:
+        """ Names of the subcollections that hold documents of the user. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_user_documents(self, user_id: str, collection: str, limit: int, job_id: str,
+                              search_index: str | None = None) -> list[str]:
+        """
+        Deletes up to limit documents of one user subcollection and counts them on the deletion
+        job (phase, deleted.<collection>, total_deleted, updated_at) in the same write.
+
+        Args
+            user_id: owner of the documents
+                str
+            collection: subcollection name
+                str
+            limit: documents deleted per call
+                int
+            job_id: deletion job whose progress is updated
+                str
+            search_index: also remove each document from this search index (conversations)
+                str | None
+        Return
+            ids of the deleted documents; empty once the subcollection is empty
+                list[str]
+        """
+        raise NotImplementedError
+
+
+class FirestoreRepository(Repository):
+    name = "firestore"
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def db(self):
+        return self._client or get_firestore_client()
+
+    def _user_ref(self, user_id: str):
+        return self.db.collection(USERS).document(user_id)
+
+    def _sub_ref(self, user_id: str, collection: str, doc_id: str):
+        return self._user_ref(user_id).collection(collection).document(doc_id)
+
+    def _training_collection(self, kind: str):
+        return self.db.collection(TRAINING).document(kind).collection("batch")
+
+    @staticmethod
+    def _documents(snapshots, fields: list[str] | None) -> list[Document]:
+        # Projected snapshots are partial, so only whole documents go into the identity map
+        if fields:
+            return [Document(doc.id, _project(doc.to_dict(), fields)) for doc in snapshots]
+        return [Document(doc.id, doc.to_dict()) for doc in record_documents(snapshots)]
+
+    @staticmethod
+    def _read(doc_ref) -> dict | None:
+        doc = get_document(doc_ref)
+        return doc.to_dict() if doc.exists else None
+
+    @staticmethod
+    def _set(doc_ref, data: dict):
+        doc_ref.set(data)
+        forget_document(doc_ref)
+
+    @staticmethod
+    def _update(doc_ref, fields: dict):
+        try:
+            doc_ref.update(fields)
+        except NotFound as e:
+            raise DocumentNotFoundError(doc_ref.path) from e
+        finally:
+            forget_document(doc_ref)
+
+    @staticmethod
+    def _delete(doc_ref):
+        doc_ref.delete()
+        forget_document(doc_ref)
+
+    def get_user(self, user_id):
+        return self._read(self._user_ref(user_id))
+
+    def set_user(self, user_id, data):
+        self._set(self._user_ref(user_id), data)
+
+    def update_user(self, user_id, fields):
+        self._update(self._user_ref(user_id), fields)
+
+    def delete_user(self, user_id):
+        self._delete(self._user_ref(user_id))
+
+    def get_connection(self, user_id, connection_id):
+        return self._read(self._sub_ref(user_id, CONNECTIONS, connection_id))
+
+    def set_connection(self, user_id, connection_id, data):
+        self._set(self._sub_ref(user_id, CONNECTIONS, connection_id), data)
+
+    def update_connection(self, user_id, connection_id, fields):
+        self._update(self._sub_ref(user_id, CONNECTIONS, connection_id), fields)
+
+    def delete_connection(self, user_id, connection_id):
+        self._delete(self._sub_ref(user_id, CONNECTIONS, connection_id))
+
+    def modify_connection(self, user_id, connection_id, modify):
+        doc_ref = self._sub_ref(user_id, CONNECTIONS, connection_id)
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            fields = modify(snapshot.to_dict()) if snapshot.exists else None
+            if fields:
+                transaction.update(doc_ref, fields)
+            return fields or None
+
+        try:
+            return run(self.db.transaction())
+        finally:
+            forget_document(doc_ref)
+
+    def list_connections(self, user_id, fields=None, start_after=None, limit=None):
+        query = self._user_ref(user_id).collection(CONNECTIONS).order_by(FieldPath.document_id())
+        if start_after:
+            query = query.start_after({FieldPath.document_id(): start_after[1]})
+        if limit:
+            query = query.limit(limit)
+        if fields:
+            query = query.select(fields)
+        return self._documents(query.stream(), fields)
+
+    def get_setting(self, user_id, name):
+        return self._read(self._sub_ref(user_id, SETTINGS, name))
+
+    def set_setting(self, user_id, name, data):
+        self._set(self._sub_ref(user_id, SETTINGS, name), data)
+
+    def delete_setting(self, user_id, name):
+        self._delete(self._sub_ref(user_id, SETTINGS, name))
+
+    def modify_setting(self, user_id, name, modify):
+        doc_ref = self._sub_ref(user_id, SETTINGS, name)
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            data = modify(snapshot.to_dict() if snapshot.exists else None)
+            if data is not None:
+                transaction.set(doc_ref, data)
+            return data
+
+        try:
+            return run(self.db.transaction())
+        finally:
+            forget_document(doc_ref)
+
+    def get_conversation(self, user_id, conversation_id):
+        return self._read(self._sub_ref(user_id, CONVERSATIONS, conversation_id))
+
+    def get_conversations(self, user_id, conversation_ids, fields=None):
+        """
+        Conversation IDs are the document keys, so this is a direct get_all rather than a query.
+        Lists longer than FIRESTORE_GET_ALL_CHUNK_SIZE are split and the chunks fetched in parallel;
+        documents already loaded in this request (identity map) are not fetched again. With
+        fields, get_all sends a field mask.
+        """
+        if not conversation_ids:
+            return {}
+        conversations_ref = self._user_ref(user_id).collection(CONVERSATIONS)
+        unique_ids = list(dict.fromkeys(conversation_ids))
+        snapshots = [snapshot for snapshot in (peek_document(conversations_ref.document(cid)) for cid in unique_ids) if snapshot is not None]
+        loaded_ids = {snapshot.id for snapshot in snapshots}
+        ids_to_fetch = [cid for cid in unique_ids if cid not in loaded_ids]
+        chunk_size = int(current_app.config.get('FIRESTORE_GET_ALL_CHUNK_SIZE', 100))
+        chunks = [ids_to_fetch[i:i + chunk_size] for i in range(0, len(ids_to_fetch), chunk_size)]
+        db = self.db
+
+        def fetch_chunk(chunk: list[str]) -> list:
+            return list(db.get_all([conversations_ref.document(cid) for cid in chunk], field_paths=fields))
+
+        if len(chunks) == 1:
+            fetched = fetch_chunk(chunks[0])
+        elif chunks:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), 8)) as executor:
+                fetched = [snapshot for chunk_snapshots in executor.map(fetch_chunk, chunks) for snapshot in chunk_snapshots]
+        else:
+            fetched = []
+        if not fields:
+            record_documents(fetched)
+        documents = {snapshot.id: snapshot.to_dict() for snapshot in snapshots + fetched if snapshot.exists}
+        return {doc_id: _project(data, fields) for doc_id, data in documents.items()} if fields else documents
+
+    @staticmethod
+    def _enqueue(batch, search_intent: SearchIntent | None):
+        if search_intent is None:
+            return False
+        if search_intent.append:
+            # Appends fold into a pending intent, which needs a transactional read
+            enqueue_append(batch, search_intent.index_name, search_intent.object_id, search_intent.record["text"])
+        elif search_intent.record is not None:
+            enqueue_index(batch, search_intent.index_name, search_intent.record)
+        else:
+            enqueue_delete(batch, search_intent.index_name, search_intent.object_id)
+        return True
+
+    def save_conversation(self, user_id, conversation_id, data, search_intent=None):
+        # The search intent commits atomically with the conversation (see services.search_indexer)
+        doc_ref = self._sub_ref(user_id, CONVERSATIONS, conversation_id)
+        batch = self.db.batch()
+        batch.set(doc_ref, data)
+        queued = self._enqueue(batch, search_intent)
+        batch.commit()
+        forget_document(doc_ref)
+        if queued:
+            notify_search_indexer()
+
+    def delete_conversation(self, user_id, conversation_id, search_intent=None):
+        doc_ref = self._sub_ref(user_id, CONVERSATIONS, conversation_id)
+        batch = self.db.batch()
+        batch.delete(doc_ref)
+        queued = self._enqueue(batch, search_intent)
+        batch.commit()
+        forget_document(doc_ref)
+        if queued:
+            notify_search_indexer()
+
+    def modify_conversation(self, user_id, conversation_id, modify):
+        doc_ref = self._sub_ref(user_id, CONVERSATIONS, conversation_id)
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                raise DocumentNotFoundError(doc_ref.path)
+            fields, search_intent = modify(snapshot.to_dict())
+            queued = self._enqueue(transaction, search_intent)  # Reads the outbox, so before the update
+            transaction.update(doc_ref, fields)
+            return fields, queued
+
+        fields, queued = run(self.db.transaction())
+        forget_document(doc_ref)
+        if queued:
+            notify_search_indexer()
+        return fields
+
+    @staticmethod
+    def _ordered(query, descending: bool, start_after: tuple | None):
+        # Document id breaks created_at ties so a start_after position is exact
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = query.order_by("created_at", direction=direction).order_by(FieldPath.document_id(), direction=direction)
+        if start_after:
+            query = query.start_after({"created_at": start_after[0], FieldPath.document_id(): start_after[1]})
+        return query
+
+    def list_conversations(self, user_id, connection_id=None, date_from=None, date_to=None,
+                           descending=True, start_after=None, limit=20, fields=None):
+        query = self._user_ref(user_id).collection(CONVERSATIONS)
+        if connection_id:
+            query = query.where("connection_id", "==", connection_id)
+        if date_from is not None:
+            query = query.where("created_at", ">=", date_from)
+        if date_to is not None:
+            query = query.where("created_at", "<=", date_to)
+        query = self._ordered(query, descending, start_after)
+        if fields:
+            query = query.select(fields)
+        return self._documents(query.limit(limit).stream(), fields)
+
+    def get_spur(self, user_id, spur_id):
+        return self._read(self._sub_ref(user_id, SPURS, spur_id))
+
+    def set_spur(self, user_id, spur_id, data):
+        self._set(self._sub_ref(user_id, SPURS, spur_id), data)
+
+    def delete_spur(self, user_id, spur_id):
+        self._delete(self._sub_ref(user_id, SPURS, spur_id))
+
+    def iter_spurs(self, user_id, variant=None, situation=None, date_from=None, date_to=None,
+                   descending=True, start_after=None, limit=None, fields=None):
+        query = self._user_ref(user_id).collection(SPURS)
+        if variant:
+            query = query.where("variant", "==", variant)
+        if situation:
+            query = query.where("situation", "==", situation)
+        if date_from is not None:
+            query = query.where("created_at", ">=", date_from)
+        if date_to is not None:
+            query = query.where("created_at", "<=", date_to)
+        query = self._ordered(query, descending, start_after)
+        if limit:
+            query = query.limit(limit)
+        if fields:
+            query = query.select(fields)
+        for doc in query.stream():
+            yield self._documents([doc], fields)[0]
+
+    def get_item_traits(self, user_id, record_ids):
+        if not record_ids:
+            return {}
+        snapshots = self.db.get_all([self._sub_ref(user_id, ITEM_TRAITS, record_id) for record_id in dict.fromkeys(record_ids)])
+        return {snapshot.id: snapshot.to_dict() for snapshot in snapshots if snapshot.exists}
+
+    def set_item_traits(self, user_id, record_id, data):
+        self._sub_ref(user_id, ITEM_TRAITS, record_id).set(data)
+
+    def delete_item_traits(self, user_id, record_ids):
+        if not record_ids:
+            return
+        batch = self.db.batch()
+        for record_id in record_ids:
+            batch.delete(self._sub_ref(user_id, ITEM_TRAITS, record_id))
+        batch.commit()
+
+    def set_training_record(self, kind, record_id, data):
+        self._training_collection(kind).document(record_id).set(data)
+
+    def get_training_records(self, kind, record_ids):
+        if not record_ids:
+            return {}
+        collection = self._training_collection(kind)
+        snapshots = self.db.get_all([collection.document(record_id) for record_id in dict.fromkeys(record_ids)])
+        return {snapshot.id: snapshot.to_dict() for snapshot in snapshots if snapshot.exists}
+
+    def list_training_records(self, kind):
+        return [Document(doc.id, doc.to_dict()) for doc in self._training_collection(kind).stream()]
+
+    def delete_training_record(self, kind, record_id):
+        self._training_collection(kind).document(record_id).delete()
+
+    def _jobs_collection(self):
+        return self.db.collection(current_app.config.get('DELETION_JOBS_COLLECTION', DELETION_JOBS))
+
+    def get_deletion_job(self, job_id):
+        snapshot = self._jobs_collection().document(job_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def set_deletion_job(self, job_id, data):
+        self._jobs_collection().document(job_id).set(data)
+
+    def update_deletion_job(self, job_id, fields):
+        self._update(self._jobs_collection().document(job_id), fields)
+
+    def list_deletion_jobs(self, user_id=None, statuses=None):
+        query = self._jobs_collection()
+        if user_id:
+            query = query.where("user_id", "==", user_id)
+        if statuses:
+            query = query.where("status", "in", statuses)
+        return [doc.to_dict() for doc in query.stream()]
+
+    def list_user_collections(self, user_id):
+        return [collection.id for collection in self._user_ref(user_id).collections()]
+
+    def delete_user_documents(self, user_id, collection, limit, job_id, search_index=None):
+        query = self._user_ref(user_id).collection(collection).order_by(FieldPath.document_id()).limit(limit).select([])
+        docs = list(query.stream())
+        if not docs:
+            return []
+        batch = self.db.batch()
+        for doc in docs:
+            batch.delete(doc.reference)
+            if search_index:
+                enqueue_delete(batch, search_index, doc.id)
+        batch.update(self._jobs_collection().document(job_id), {
+            "phase": collection,
+            f"deleted.{collection}": firestore.Increment(len(docs)),
+            "total_deleted": firestore.Increment(len(docs)),
+            "updated_at": datetime.now(timezone.utc),
+        })
+        batch.commit()
+        for doc in docs:
+            forget_document(doc.reference)
+        if search_index:
+            notify_search_indexer()
+        return [doc.id for doc in docs]
+
+
+class _LocalRepository(Repository):
+    """
+    Typed methods on top of four storage primitives keyed by (collection, owner, doc_id):
+    users use (USERS, user_id, ""), user subcollections (name, user_id, doc_id) and training
+    records (training/{kind}, "", record_id).
+    """
+
+    @abstractmethod
+    def _get(self, collection: str, owner: str, doc_id: str) -> dict | None:
+        raise NotImplementedError
+
+    def _get_many(self, collection: str, owner: str, doc_ids: list[str], fields: list[str] | None = None) -> dict[str, dict]:
+        found = {doc_id: data for doc_id in doc_ids if (data := self._get(collection, owner, doc_id)) is not None}
+        return {doc_id: _project(data, fields) for doc_id, data in found.items()} if fields else found
+
+    @abstractmethod
+    def _put(self, collection: str, owner: str, doc_id: str, data: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _remove(self, collection: str, owner: str, doc_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _collections(self, owner: str) -> list[str]:
+        """ Collections holding at least one document of owner. """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _query(self, collection: str, owner: str, equals: dict, date_from, date_to, descending: bool,
+               start_after: tuple | None, limit: int | None, fields: list[str] | None = None) -> Iterator[Document]:
+        raise NotImplementedError
+
+    def _modify(self, collection: str, owner: str, doc_id: str, fields: dict):
+        data = self._get(collection, owner, doc_id)
+        if data is None:
+            raise DocumentNotFoundError(f"{collection}/{owner}/{doc_id}")
+        for path, value in fields.items():
+            # Dotted keys update nested fields, as in Firestore
+            target = data
+            *parents, leaf = path.split(".")
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = value
+        self._put(collection, owner, doc_id, data)
+
+    @staticmethod
+    def _apply_search_intent(search_intent: SearchIntent | None):
+        if search_intent is None:
+            return
+        backend = get_search_backend()
+        if search_intent.append:
+            backend.append_text(search_intent.index_name, [search_intent.record])
+        elif search_intent.record is not None:
+            backend.save_objects(search_intent.index_name, [search_intent.record])
+        else:
+            backend.delete_objects(search_intent.index_name, [search_intent.object_id])
+
+    def get_user(self, user_id):
+        return self._get(USERS, user_id, "")
+
+    def set_user(self, user_id, data):
+        self._put(USERS, user_id, "", data)
+
+    def update_user(self, user_id, fields):
+        self._modify(USERS, user_id, "", fields)
+
+    def delete_user(self, user_id):
+        self._remove(USERS, user_id, "")
+
+    def get_connection(self, user_id, connection_id):
+        return self._get(CONNECTIONS, user_id, connection_id)
+
+    def set_connection(self, user_id, connection_id, data):
+        self._put(CONNECTIONS, user_id, connection_id, data)
+
+    def update_connection(self, user_id, connection_id, fields):
+        self._modify(CONNECTIONS, user_id, connection_id, fields)
+
+    def delete_connection(self, user_id, connection_id):
+        self._remove(CONNECTIONS, user_id, connection_id)
+
+    def modify_connection(self, user_id, connection_id, modify):
+        with self._lock:
+            data = self._get(CONNECTIONS, user_id, connection_id)
+            fields = modify(data) if data is not None else None
+            if fields:
+                self._modify(CONNECTIONS, user_id, connection_id, fields)
+        return fields or None
+
+    def list_connections(self, user_id, fields=None, start_after=None, limit=None):
+        return list(self._query(CONNECTIONS, user_id, {}, None, None, False, start_after, limit, fields))
+
+    def get_setting(self, user_id, name):
+        return self._get(SETTINGS, user_id, name)
+
+    def set_setting(self, user_id, name, data):
+        self._put(SETTINGS, user_id, name, data)
+
+    def delete_setting(self, user_id, name):
+        self._remove(SETTINGS, user_id, name)
+
+    def modify_setting(self, user_id, name, modify):
+        with self._lock:
+            data = modify(self._get(SETTINGS, user_id, name))
+            if data is not None:
+                self._put(SETTINGS, user_id, name, data)
+        return data
+
+    def get_conversation(self, user_id, conversation_id):
+        return self._get(CONVERSATIONS, user_id, conversation_id)
+
+    def get_conversations(self, user_id, conversation_ids, fields=None):
+        return self._get_many(CONVERSATIONS, user_id, list(dict.fromkeys(conversation_ids)), fields)
+
+    def save_conversation(self, user_id, conversation_id, data, search_intent=None):
+        self._put(CONVERSATIONS, user_id, conversation_id, data)
+        self._apply_search_intent(search_intent)
+
+    def delete_conversation(self, user_id, conversation_id, search_intent=None):
+        self._remove(CONVERSATIONS, user_id, conversation_id)
+        self._apply_search_intent(search_intent)
+
+    def modify_conversation(self, user_id, conversation_id, modify):
+        with self._lock:
+            data = self._get(CONVERSATIONS, user_id, conversation_id)
+            if data is None:
+                raise DocumentNotFoundError(f"{CONVERSATIONS}/{user_id}/{conversation_id}")
+            fields, search_intent = modify(data)
+            self._modify(CONVERSATIONS, user_id, conversation_id, fields)
+        self._apply_search_intent(search_intent)
+        return fields
+
+    def list_conversations(self, user_id, connection_id=None, date_from=None, date_to=None,
+                           descending=True, start_after=None, limit=20, fields=None):
+        equals = {"connection_id": connection_id} if connection_id else {}
+        return list(self._query(CONVERSATIONS, user_id, equals, date_from, date_to, descending, start_after, limit, fields))
+
+    def get_spur(self, user_id, spur_id):
+        return self._get(SPURS, user_id, spur_id)
+
+    def set_spur(self, user_id, spur_id, data):
+        self._put(SPURS, user_id, spur_id, data)
+
+    def delete_spur(self, user_id, spur_id):
+        self._remove(SPURS, user_id, spur_id)
+
+    def iter_spurs(self, user_id, variant=None, situation=None, date_from=None, date_to=None,
+                   descending=True, start_after=None, limit=None, fields=None):
+        equals = {key: value for key, value in (("variant", variant), ("situation", situation)) if value}
+        return self._query(SPURS, user_id, equals, date_from, date_to, descending, start_after, limit, fields)
+
+    def get_item_traits(self, user_id, record_ids):
+        return self._get_many(ITEM_TRAITS, user_id, record_ids)
+
+    def set_item_traits(self, user_id, record_id, data):
+        self._put(ITEM_TRAITS, user_id, record_id, data)
+
+    def delete_item_traits(self, user_id, record_ids):
+        for record_id in record_ids:
+            self._remove(ITEM_TRAITS, user_id, record_id)
+
+    def set_training_record(self, kind, record_id, data):
+        self._put(f"{TRAINING}/{kind}", "", record_id, data)
+
+    def get_training_records(self, kind, record_ids):
+        return self._get_many(f"{TRAINING}/{kind}", "", record_ids)
+
+    def list_training_records(self, kind):
+        return list(self._query(f"{TRAINING}/{kind}", "", {}, None, None, False, None, None))
+
+    def delete_training_record(self, kind, record_id):
+        self._remove(f"{TRAINING}/{kind}", "", record_id)
+
+    def get_deletion_job(self, job_id):
+        return self._get(DELETION_JOBS, "", job_id)
+
+    def set_deletion_job(self, job_id, data):
+        self._put(DELETION_JOBS, "", job_id, data)
+
+    def update_deletion_job(self, job_id, fields):
+        self._modify(DELETION_JOBS, "", job_id, fields)
+
+    def list_deletion_jobs(self, user_id=None, statuses=None):
+        jobs = [doc.data for doc in self._query(DELETION_JOBS, "", {}, None, None, False, None, None)]
+        return [job for job in jobs if (not user_id or job.get("user_id") == user_id)
+                and (not statuses or job.get("status") in statuses)]
+
+    def list_user_collections(self, user_id):
+        return [collection for collection in self._collections(user_id) if collection != USERS]
+
+    def delete_user_documents(self, user_id, collection, limit, job_id, search_index=None):
+        with self._lock:
+            ids = [doc.id for doc in self._query(collection, user_id, {}, None, None, False, None, limit)]
+            if not ids:
+                return []
+            job = self._get(DELETION_JOBS, "", job_id)
+            if job is None:
+                raise DocumentNotFoundError(f"{DELETION_JOBS}//{job_id}")
+            for doc_id in ids:
+                self._remove(collection, user_id, doc_id)
+            deleted = dict(job.get("deleted") or {})
+            deleted[collection] = deleted.get(collection, 0) + len(ids)
+            self._modify(DELETION_JOBS, "", job_id, {
+                "phase": collection,
+                "deleted": deleted,
+                "total_deleted": (job.get("total_deleted") or 0) + len(ids),
+                "updated_at": datetime.now(timezone.utc),
+            })
+        if search_index:
+            for doc_id in ids:
+                self._apply_search_intent(SearchIntent(search_index, doc_id, None))
+        return ids
+
+
+def _project(data: dict, fields: list[str]) -> dict:
+    return {field: data[field] for field in fields if data.get(field) is not None}
+
+
+def _order_key(doc_id: str, data: dict) -> tuple:
+    return (_timestamp(data.get("created_at")) or 0.0, doc_id)
+
+
+class InMemoryRepository(_LocalRepository):
+    """ Dict-backed repository. Values are copied in and out, like a real store. """
+
+    name = "memory"
+
+    def __init__(self):
+        self._documents: dict[tuple[str, str], dict[str, dict]] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, collection, owner, doc_id):
+        with self._lock:
+            data = self._documents.get((collection, owner), {}).get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def _put(self, collection, owner, doc_id, data):
+        with self._lock:
+            self._documents.setdefault((collection, owner), {})[doc_id] = copy.deepcopy(data)
+
+    def _remove(self, collection, owner, doc_id):
+        with self._lock:
+            self._documents.get((collection, owner), {}).pop(doc_id, None)
+
+    def _collections(self, owner):
+        with self._lock:
+            return sorted(collection for (collection, doc_owner), documents in self._documents.items()
+                          if doc_owner == owner and documents)
+
+    def _query(self, collection, owner, equals, date_from, date_to, descending, start_after, limit, fields=None):
+        low, high = _timestamp(date_from), _timestamp(date_to)
+        with self._lock:
+            items = list(self._documents.get((collection, owner), {}).items())
+        matches = []
+        for doc_id, data in items:
+            if any(data.get(key) != value for key, value in equals.items()):
+                continue
+            created = _timestamp(data.get("created_at"))
+            if (low is not None or high is not None) and created is None:
+                continue
+            if (low is not None and created < low) or (high is not None and created > high):
+                continue
+            matches.append((_order_key(doc_id, data), doc_id, data))
+        matches.sort(key=lambda match: match[0], reverse=descending)
+        if start_after:
+            position = (_timestamp(start_after[0]) or 0.0, start_after[1])
+            matches = [m for m in matches if (m[0] < position if descending else m[0] > position)]
+        if limit:
+            matches = matches[:limit]
+        return iter([Document(doc_id, copy.deepcopy(_project(data, fields) if fields else data)) for _, doc_id, data in matches])
+
+
+def _encode(data: dict) -> str:
+    def default(value):
+        if isinstance(value, datetime):
+            return {DATETIME_TAG: value.isoformat()}
+        if isinstance(value, (bytes, bytearray)):
+            return {BYTES_TAG: base64.b64encode(value).decode("ascii")}
+        return str(value)
+    return json.dumps(data, default=default)
+
+
+def _decode_hook(value: dict):
+    if len(value) == 1 and DATETIME_TAG in value:
+        return datetime.fromisoformat(value[DATETIME_TAG])
+    if len(value) == 1 and BYTES_TAG in value:
+        return base64.b64decode(value[BYTES_TAG])
+    return value
+
+
+class SQLiteRepository(_LocalRepository):
+    """
+    Single-table SQLite repository. Documents are stored as JSON (datetimes and bytes tagged so
+    they round trip); created_at is also kept as a Unix timestamp column (0 when missing) so lists are ordered and ranged by
+    the (collection, owner, created_at, doc_id) index.
+    """
+
+    name = "sqlite"
+    FILTER_COLUMNS = ("connection_id", "variant", "situation")
+
+    def __init__(self, path: str = ":memory:"):
+        # A shared-cache URI lets every thread see the same in-memory database
+        self.uri = "file:spurly_repository?mode=memory&cache=shared" if path == ":memory:" else f"file:{path}"
+        self._local = threading.local()
+        self._lock = threading.RLock()  # Serializes read-modify-write sequences
+        self._keepalive = self._connect()  # Keeps a shared in-memory database alive
+        self._keepalive.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                connection_id TEXT,
+                variant TEXT,
+                situation TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (collection, owner, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS documents_created ON documents (collection, owner, created_at, doc_id);
+        """)
+        self._keepalive.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False, timeout=10)
+        if "mode=memory" not in self.uri:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _get(self, collection, owner, doc_id):
+        row = self._conn().execute("SELECT data FROM documents WHERE collection = ? AND owner = ? AND doc_id = ?",
+                                   (collection, owner, doc_id)).fetchone()
+        return json.loads(row[0], object_hook=_decode_hook) if row else None
+
+    @staticmethod
+    def _data_column(fields: list[str] | None) -> tuple[str, list]:
+        """ SQL for the data column: the whole document, or a JSON object of just the projected fields. """
+        if not fields:
+            return "data", []
+        params = []
+        for field in fields:
+            params.extend([field, f'$."{field}"'])
+        return f"json_object({', '.join(['?, json_extract(data, ?)'] * len(fields))})", params
+
+    def _load(self, data: str, fields: list[str] | None) -> dict:
+        document = json.loads(data, object_hook=_decode_hook)
+        return _project(document, fields) if fields else document
+
+    def _get_many(self, collection, owner, doc_ids, fields=None):
+        found = {}
+        column, column_params = self._data_column(fields)
+        for i in range(0, len(doc_ids), 400):  # Stay under SQLite's bound-parameter limit
+            chunk = doc_ids[i:i + 400]
+            rows = self._conn().execute(
+                f"SELECT doc_id, {column} FROM documents WHERE collection = ? AND owner = ? AND doc_id IN ({','.join('?' * len(chunk))})",
+                (*column_params, collection, owner, *chunk)).fetchall()
+            found.update({doc_id: self._load(data, fields) for doc_id, data in rows})
+        return found
+
+    def _put(self, collection, owner, doc_id, data):
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO documents (collection, owner, doc_id, created_at, connection_id, variant, situation, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (collection, owner, doc_id, _timestamp(data.get("created_at")) or 0.0,
+                  *(data.get(column) if isinstance(data.get(column), str) else None for column in self.FILTER_COLUMNS),
+                  _encode(data)))
+
+    def _remove(self, collection, owner, doc_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM documents WHERE collection = ? AND owner = ? AND doc_id = ?", (collection, owner, doc_id))
+
+    def _collections(self, owner):
+        rows = self._conn().execute("SELECT DISTINCT collection FROM documents WHERE owner = ? ORDER BY collection", (owner,)).fetchall()
+        return [row[0] for row in rows]
+
+    def _query(self, collection, owner, equals, date_from, date_to, descending, start_after, limit, fields=None):
+        column, params = self._data_column(fields)
+        clauses = ["collection = ?", "owner = ?"]
+        params += [collection, owner]
+        for key, value in equals.items():
+            if key not in self.FILTER_COLUMNS:
+                raise ValueError(f"Unsupported filter: {key}")
+            clauses.append(f"{key} = ?")
+            params.append(value)
+        if date_from is not None:
+            clauses.append("created_at >= ?")
+            params.append(_timestamp(date_from))
+        if date_to is not None:
+            clauses.append("created_at <= ?")
+            params.append(_timestamp(date_to))
+        if start_after:
+            clauses.append(f"(created_at, doc_id) {'<' if descending else '>'} (?, ?)")
+            params.extend([_timestamp(start_after[0]) or 0.0, start_after[1]])
+        direction = "DESC" if descending else "ASC"
+        sql = (f"SELECT doc_id, {column} FROM documents WHERE {' AND '.join(clauses)} "
+               f"ORDER BY created_at {direction}, doc_id {direction}")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        for doc_id, data in self._conn().execute(sql, params):
+            yield Document(doc_id, self._load(data, fields))
+
+
+def get_repository() -> Repository:
+    """
+    Returns the configured storage repository (STORAGE_BACKEND), creating it on first use.
+
+    Return
+        repository instance
+            Repository
+    """
+    global _repository
+    if _repository is not None:
+        return _repository
+    with _repository_lock:
+        if _repository is None:
+            choice = current_app.config.get('STORAGE_BACKEND', 'firestore')
+            if choice == "firestore":
+                _repository = FirestoreRepository()
+            elif choice == "memory":
+                _repository = InMemoryRepository()
+            elif choice == "sqlite":
+                _repository = SQLiteRepository(current_app.config.get('STORAGE_SQLITE_PATH', 'spurly_storage.db'))
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {choice}")
+            logger.info("Storage repository: %s", _repository.name)
+    return _repository
+
+
+def set_repository(repository: Repository | None):
+    """ Replaces the process-wide repository (scripts, benchmarks, local runs). None resets it. """
+    global _repository
+    with _repository_lock:
+        _repository = repository
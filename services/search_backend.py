@@ -0,0 +1,339 @@
+"""
+Pluggable keyword search backends for conversations.
+
+Both backends index the record built by storage_service.conversation_search_record
+(objectID, user_id, text, created_at_timestamp, connection_id, situation, topic) and answer
+the same search: a keyword query scoped to one user, optionally filtered by connection_id and
+a created_at_timestamp range, ranked by relevance (newest first on ties), one page at a time.
+Messages appended to a conversation are added with append_text, which sends only the new text
+(Algolia keeps it in the appended_text array until the next full save replaces the record).
+
+    AlgoliaSearchBackend  hosted Algolia index (production)
+    SQLiteSearchBackend   embedded SQLite FTS5 index (offline/local, and fallback when
+                          Algolia is not configured)
+
+SEARCH_BACKEND selects one: "algolia", "sqlite", or "auto" (Algolia if its client is
+initialized, SQLite otherwise).
+"""
+from abc import ABC, abstractmethod
+from flask import current_app
+from infrastructure.clients import get_algolia_client
+from infrastructure.logger import get_logger
+import math
+import re
+import sqlite3
+import threading
+
+logger = get_logger(__name__)
+
+PREFIX_INDEX_LENGTHS = (2, 3, 4)  # FTS5 prefix indexes; longer prefixes are matched by scanning the term index
+APPENDED_TEXT_ATTRIBUTE = "appended_text"  # Must be searchable if the Algolia index restricts searchableAttributes
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class SearchBackend(ABC):
+    """ Interface shared by the search backends. """
+
+    name = "base"
+
+    @abstractmethod
+    def save_objects(self, index_name: str, records: list[dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_objects(self, index_name: str, object_ids: list[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_text(self, index_name: str, records: list[dict]):
+        """
+        Adds text to existing records without resending what is already indexed. Records that
+        do not exist are skipped.
+
+        Args
+            index_name: index to update
+                str
+            records: {"objectID": str, "text": str} per record
+                list[dict]
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, index_name: str, query: str, user_id: str, filters: dict | None = None,
+               page: int = 0, hits_per_page: int = 20) -> dict:
+        """
+        Keyword search scoped to one user.
+
+        Args
+            index_name: index to search
+                str
+            query: keyword query
+                str
+            user_id: only records with this user_id match
+                str
+            filters: connection_id, created_at_from, created_at_to (Unix timestamps, inclusive)
+                dict
+            page: zero-based page number
+                int
+            hits_per_page: page size
+                int
+        Return
+            {"hits": [objectID, ...], "page": int, "nbPages": int, "nbHits": int}
+                dict
+        """
+        raise NotImplementedError
+
+
+class AlgoliaSearchBackend(SearchBackend):
+    name = "algolia"
+
+    def __init__(self, client):
+        self.client = client
+
+    def save_objects(self, index_name: str, records: list[dict]):
+        self.client.save_objects(index_name, records)
+
+    def delete_objects(self, index_name: str, object_ids: list[str]):
+        self.client.delete_objects(index_name, object_ids)
+
+    def append_text(self, index_name: str, records: list[dict]):
+        # Built-in "Add" operation: appends to the searchable appended_text array server-side
+        self.client.partial_update_objects(index_name, [
+            {"objectID": r["objectID"], APPENDED_TEXT_ATTRIBUTE: {"_operation": "Add", "value": r["text"]}} for r in records
+        ], create_if_not_exists=False)
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    def search(self, index_name: str, query: str, user_id: str, filters: dict | None = None,
+               page: int = 0, hits_per_page: int = 20) -> dict:
+        filters = filters or {}
+        filter_parts = [f"user_id:{self._quote(user_id)}"]
+        if filters.get("connection_id"):
+            filter_parts.append(f"connection_id:{self._quote(filters['connection_id'])}")
+        if filters.get("created_at_from") is not None:
+            filter_parts.append(f"created_at_timestamp >= {int(filters['created_at_from'])}")
+        if filters.get("created_at_to") is not None:
+            filter_parts.append(f"created_at_timestamp <= {int(filters['created_at_to'])}")
+
+        res = self.client.search({
+            "requests": [{
+                "indexName": index_name,
+                "query": query,
+                "filters": " AND ".join(filter_parts),
+                "hitsPerPage": hits_per_page,
+                "page": page,
+                "attributesToRetrieve": ["objectID"], # Only need the IDs from Algolia
+            }]
+        })
+        result = res.to_dict()["results"][0]
+        return {
+            "hits": [hit["objectID"] for hit in result.get("hits", [])],
+            "page": result.get("page", page),
+            "nbPages": result.get("nbPages", 0),
+            "nbHits": result.get("nbHits", 0),
+        }
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 index. Each index is a records table (filterable attributes, indexed by user)
+    plus an external-content FTS5 table over text/situation/topic (and user_id, for scoping)
+    kept in sync by triggers.
+    Queries match every term, with prefix matching on the last one (like Algolia's default
+    prefixLast), and rank by bm25 then created_at_timestamp descending.
+    """
+
+    name = "sqlite"
+    TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+    TABLE_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+
+    def __init__(self, path: str = ":memory:"):
+        # A shared-cache URI lets every thread see the same in-memory database
+        self.uri = "file:spurly_search?mode=memory&cache=shared" if path == ":memory:" else f"file:{path}"
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._tables = set()
+        self._keepalive = self._connect()  # Keeps a shared in-memory database alive
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False, timeout=10)
+        if "mode=memory" not in self.uri:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _table(self, index_name: str) -> str:
+        table = f"search_{index_name}"
+        if not self.TABLE_PATTERN.match(table):
+            raise ValueError(f"Invalid index name: {index_name}")
+        if table in self._tables:
+            return table
+        with self._schema_lock:
+            conn = self._conn()
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    rowid INTEGER PRIMARY KEY,
+                    object_id TEXT NOT NULL UNIQUE,
+                    user_id TEXT NOT NULL,
+                    connection_id TEXT,
+                    created_at_timestamp INTEGER,
+                    situation TEXT,
+                    topic TEXT,
+                    text TEXT
+                );
+                CREATE INDEX IF NOT EXISTS {table}_user ON {table} (user_id, created_at_timestamp);
+                CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                    text, situation, topic, user_id, content='{table}', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2', prefix='{" ".join(map(str, PREFIX_INDEX_LENGTHS))}'
+                );
+                CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts (rowid, text, situation, topic, user_id) VALUES (new.rowid, new.text, new.situation, new.topic, new.user_id);
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, text, situation, topic, user_id) VALUES ('delete', old.rowid, old.text, old.situation, old.topic, old.user_id);
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, text, situation, topic, user_id) VALUES ('delete', old.rowid, old.text, old.situation, old.topic, old.user_id);
+                    INSERT INTO {table}_fts (rowid, text, situation, topic, user_id) VALUES (new.rowid, new.text, new.situation, new.topic, new.user_id);
+                END;
+            """)
+            self._tables.add(table)
+        return table
+
+    def save_objects(self, index_name: str, records: list[dict]):
+        table = self._table(index_name)
+        rows = [(r["objectID"], r.get("user_id"), r.get("connection_id"), r.get("created_at_timestamp"),
+                 r.get("situation"), r.get("topic"), r.get("text")) for r in records]
+        conn = self._conn()
+        with conn:
+            conn.executemany(f"""
+                INSERT INTO {table} (object_id, user_id, connection_id, created_at_timestamp, situation, topic, text)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(object_id) DO UPDATE SET
+                    user_id=excluded.user_id, connection_id=excluded.connection_id,
+                    created_at_timestamp=excluded.created_at_timestamp, situation=excluded.situation,
+                    topic=excluded.topic, text=excluded.text
+            """, rows)
+
+    def delete_objects(self, index_name: str, object_ids: list[str]):
+        table = self._table(index_name)
+        conn = self._conn()
+        with conn:
+            conn.executemany(f"DELETE FROM {table} WHERE object_id = ?", [(object_id,) for object_id in object_ids])
+
+    def append_text(self, index_name: str, records: list[dict]):
+        table = self._table(index_name)
+        conn = self._conn()
+        with conn:
+            conn.executemany(f"UPDATE {table} SET text = COALESCE(text || char(10), '') || ? WHERE object_id = ?",
+                             [(r["text"], r["objectID"]) for r in records])
+
+    @staticmethod
+    def _prefix_expression(term: str) -> str:
+        """
+        Prefix match for the last query term. Prefixes up to PREFIX_INDEX_LENGTHS[-1] characters
+        are answered from the FTS prefix index; longer ones by FTS5 itself from the term index.
+        Either way every completion is matched and then intersected with the user_id term, so
+        other users' vocabulary cannot crowd out the caller's own matches.
+        """
+        if len(term) < PREFIX_INDEX_LENGTHS[0]:
+            return f'"{term}"'
+        return f'"{term}"*'
+
+    def match_expression(self, query: str, user_id: str) -> str | None:
+        """
+        Turns a free-text query into an FTS5 expression: all terms in the searchable columns,
+        prefix match on the last, AND the user's id anchored at the start of the user_id column.
+        The user_id term makes FTS intersect with that user's postings instead of matching the
+        whole corpus and filtering afterwards.
+        """
+        terms = [term.lower() for term in self.TOKEN_PATTERN.findall(query or "")]
+        if not terms:
+            return None
+        parts = [f'"{term}"' for term in terms[:-1]] + [self._prefix_expression(terms[-1])]
+        user_phrase = '"' + user_id.replace('"', '""') + '"'
+        return f"{{text situation topic}} : ({' AND '.join(parts)}) AND user_id : ^{user_phrase}"
+
+    def search(self, index_name: str, query: str, user_id: str, filters: dict | None = None,
+               page: int = 0, hits_per_page: int = 20) -> dict:
+        table = self._table(index_name)
+        match = self.match_expression(query, user_id)
+        if not match:
+            return {"hits": [], "page": page, "nbPages": 0, "nbHits": 0}
+
+        filters = filters or {}
+        where = [f"{table}_fts MATCH ?", "r.user_id = ?"]
+        params = [match, user_id]
+        if filters.get("connection_id"):
+            where.append("r.connection_id = ?")
+            params.append(filters["connection_id"])
+        if filters.get("created_at_from") is not None:
+            where.append("r.created_at_timestamp >= ?")
+            params.append(int(filters["created_at_from"]))
+        if filters.get("created_at_to") is not None:
+            where.append("r.created_at_timestamp <= ?")
+            params.append(int(filters["created_at_to"]))
+        where_sql = " AND ".join(where)
+        from_sql = f"{table}_fts JOIN {table} r ON r.rowid = {table}_fts.rowid"
+
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT r.object_id FROM {from_sql} WHERE {where_sql} "
+            f"ORDER BY bm25({table}_fts, 1.0, 1.0, 1.0, 0.0), r.created_at_timestamp DESC LIMIT ? OFFSET ?",
+            params + [hits_per_page, page * hits_per_page],
+        ).fetchall()
+        if page == 0 and len(rows) < hits_per_page:
+            total = len(rows)  # Everything fit on the first page; skip the count
+        else:
+            total = conn.execute(f"SELECT COUNT(*) FROM {from_sql} WHERE {where_sql}", params).fetchone()[0]
+        return {
+            "hits": [row[0] for row in rows],
+            "page": page,
+            "nbPages": math.ceil(total / hits_per_page) if hits_per_page else 0,
+            "nbHits": total,
+        }
+
+
+def get_search_backend() -> SearchBackend:
+    """
+    Returns the configured search backend (SEARCH_BACKEND), creating it on first use.
+
+    Return
+        search backend instance
+            SearchBackend
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            choice = current_app.config.get('SEARCH_BACKEND', 'auto')
+            algolia_client = get_algolia_client()
+            if choice == "algolia" or (choice == "auto" and algolia_client):
+                if not algolia_client:
+                    raise RuntimeError("SEARCH_BACKEND is 'algolia' but the Algolia client is not initialized.")
+                _backend = AlgoliaSearchBackend(algolia_client)
+            elif choice in ("sqlite", "auto"):
+                _backend = SQLiteSearchBackend(current_app.config.get('SEARCH_SQLITE_PATH', 'search_index.db'))
+            else:
+                raise ValueError(f"Unknown SEARCH_BACKEND: {choice}")
+            logger.info("Search backend: %s", _backend.name)
+    return _backend
+
+
+def set_search_backend(backend: SearchBackend | None):
+    """ Replaces the process-wide search backend (scripts, benchmarks, local runs). None resets it. """
+    global _backend
+    with _backend_lock:
+        _backend = backend
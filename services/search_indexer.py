@@ -0,0 +1,263 @@
+"""
+Transactional outbox for the search index.
+
+Writes that change searchable data add an index/delete intent to the search outbox in the
+same Firestore batch as the data itself, so a committed write always has a pending intent
+and a failed write never has one. Outbox documents are keyed by objectID: saving the same
+conversation again before the indexer runs overwrites the pending intent instead of
+queueing another API call.
+
+Appending messages adds an append intent carrying only the new text. It is written inside the
+append's transaction, which folds it into an intent already pending for the same objectID
+(appending to a pending record, or to pending appended text) so coalescing still holds.
+
+A background indexer thread drains the outbox with batched save_objects/delete_objects
+calls (one per index and action) on the configured search backend, deletes the intents it applied, and reschedules failed
+ones with exponential backoff.
+"""
+from datetime import datetime, timezone, timedelta
+from flask import current_app
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from infrastructure.clients import get_firestore_client
+from infrastructure.logger import get_logger
+from services.search_backend import get_search_backend
+import threading
+
+logger = get_logger(__name__)
+
+INDEX_ACTION = "index"
+DELETE_ACTION = "delete"
+APPEND_ACTION = "append"
+
+_indexer_thread: threading.Thread | None = None
+_wake_event = threading.Event()
+_stop_event = threading.Event()
+_stats_lock = threading.Lock()
+_stats = {
+    "drains": 0,
+    "indexed": 0,
+    "deleted": 0,
+    "appended": 0,
+    "failed": 0,
+    "api_calls": 0,
+}
+
+
+def outbox_collection():
+    return get_firestore_client().collection(current_app.config.get('SEARCH_OUTBOX_COLLECTION', 'search_outbox'))
+
+
+def _intent(index_name: str, object_id: str, action: str, record: dict | None) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "index_name": index_name,
+        "object_id": object_id,
+        "action": action,
+        "record": record,
+        "attempts": 0,
+        "updated_at": now,
+        "next_attempt_at": now,
+    }
+
+
+def enqueue_index(batch, index_name: str, record: dict):
+    """
+    Adds an index intent for record (which must contain objectID) to a Firestore write batch.
+
+    Args
+        batch: batch that also carries the write being indexed
+            firestore.WriteBatch
+        index_name: search index to write to
+            str
+        record: search record
+            dict
+    """
+    object_id = record["objectID"]
+    batch.set(outbox_collection().document(object_id), _intent(index_name, object_id, INDEX_ACTION, record))
+
+
+def enqueue_delete(batch, index_name: str, object_id: str):
+    """
+    Adds a de-index intent for object_id to a Firestore write batch.
+
+    Args
+        batch: batch that also carries the delete being de-indexed
+            firestore.WriteBatch
+        index_name: search index to delete from
+            str
+        object_id: objectID of the search record
+            str
+    """
+    batch.set(outbox_collection().document(object_id), _intent(index_name, object_id, DELETE_ACTION, None))
+
+
+def enqueue_append(transaction, index_name: str, object_id: str, text: str):
+    """
+    Adds newly appended text for object_id inside a Firestore transaction. Reads the pending
+    intent, so call it before the transaction's writes.
+
+    Args
+        transaction: transaction that also carries the append being indexed
+            firestore.Transaction
+        index_name: search index to update
+            str
+        object_id: objectID of the search record
+            str
+        text: text of the appended messages
+            str
+    """
+    intent_ref = outbox_collection().document(object_id)
+    pending = intent_ref.get(transaction=transaction)
+    pending = pending.to_dict() if pending.exists else None
+    if pending and pending.get("index_name") == index_name and pending.get("action") in (INDEX_ACTION, APPEND_ACTION):
+        # The pending record (full or appended) has not been sent yet: extend it instead of queueing another call.
+        # If a drain is applying it right now, the extended intent is sent again later; repeated text is harmless
+        record = dict(pending["record"])
+        record["text"] = f"{record['text']}\n{text}" if record.get("text") else text
+        intent = _intent(index_name, object_id, pending["action"], record)
+    else:
+        intent = _intent(index_name, object_id, APPEND_ACTION, {"objectID": object_id, "text": text})
+    transaction.set(intent_ref, intent)
+
+
+def notify_search_indexer():
+    """ Wakes the indexer thread so new intents are applied without waiting a full interval. """
+    _wake_event.set()
+
+
+def _record(key: str, count: int = 1):
+    with _stats_lock:
+        _stats[key] += count
+
+
+def _remove_applied(snapshots: list):
+    """ Deletes applied intents unless they were overwritten (coalesced) since they were read. """
+    db = get_firestore_client()
+    for snapshot in snapshots:
+        try:
+            snapshot.reference.delete(option=db.write_option(last_update_time=snapshot.update_time))
+        except (FailedPrecondition, NotFound):
+            pass  # A newer intent replaced this one; it will be applied on a later drain
+
+
+def _reschedule(snapshots: list, error: Exception):
+    db = get_firestore_client()
+    base_backoff = float(current_app.config.get('SEARCH_INDEXER_RETRY_BACKOFF', 2.0))
+    max_backoff = float(current_app.config.get('SEARCH_INDEXER_MAX_BACKOFF', 300.0))
+    now = datetime.now(timezone.utc)
+    for snapshot in snapshots:
+        attempts = int(snapshot.get("attempts") or 0) + 1
+        delay = min(base_backoff * (2 ** (attempts - 1)), max_backoff)
+        try:
+            snapshot.reference.update({
+                "attempts": attempts,
+                "last_error": str(error)[:500],
+                "next_attempt_at": now + timedelta(seconds=delay),
+            }, option=db.write_option(last_update_time=snapshot.update_time))
+        except (FailedPrecondition, NotFound):
+            pass
+
+
+def drain_outbox(limit: int | None = None) -> dict:
+    """
+    Applies due outbox intents with one batched search API call per index and action.
+
+    Args
+        limit: maximum number of intents to read; defaults to SEARCH_INDEXER_BATCH_SIZE
+            int
+    Return
+        counts of intents read, indexed, deleted, appended and failed
+            dict
+    """
+    search_backend = get_search_backend()
+    limit = limit or int(current_app.config.get('SEARCH_INDEXER_BATCH_SIZE', 500))
+    now = datetime.now(timezone.utc)
+    query = outbox_collection().where("next_attempt_at", "<=", now).order_by("next_attempt_at").limit(limit)
+    snapshots = list(query.stream())
+
+    groups = {}
+    for snapshot in snapshots:
+        intent = snapshot.to_dict()
+        groups.setdefault((intent["index_name"], intent["action"]), []).append((snapshot, intent))
+
+    result = {"read": len(snapshots), "indexed": 0, "deleted": 0, "appended": 0, "failed": 0}
+    for (index_name, action), items in groups.items():
+        group_snapshots = [snapshot for snapshot, _ in items]
+        try:
+            if action == INDEX_ACTION:
+                search_backend.save_objects(index_name, [intent["record"] for _, intent in items])
+                result["indexed"] += len(items)
+            elif action == APPEND_ACTION:
+                search_backend.append_text(index_name, [intent["record"] for _, intent in items])
+                result["appended"] += len(items)
+            else:
+                search_backend.delete_objects(index_name, [intent["object_id"] for _, intent in items])
+                result["deleted"] += len(items)
+            _record("api_calls")
+            _remove_applied(group_snapshots)
+        except Exception as e:
+            err_point = __package__ or __name__
+            logger.error("[%s] Error: %s Search %s of %d objects in '%s' failed; rescheduling",
+                         err_point, e, action, len(items), index_name)
+            result["failed"] += len(items)
+            _reschedule(group_snapshots, e)
+
+    _record("drains")
+    _record("indexed", result["indexed"])
+    _record("deleted", result["deleted"])
+    _record("appended", result["appended"])
+    _record("failed", result["failed"])
+    if snapshots:
+        logger.info("Search outbox drained: %s", result)
+    return result
+
+
+def _indexer_loop(app):
+    interval = float(app.config.get('SEARCH_INDEXER_INTERVAL', 5.0))
+    coalesce_delay = float(app.config.get('SEARCH_INDEXER_COALESCE_DELAY', 0.5))
+    batch_size = int(app.config.get('SEARCH_INDEXER_BATCH_SIZE', 500))
+    while not _stop_event.is_set():
+        if _wake_event.wait(timeout=interval):
+            _wake_event.clear()
+            _stop_event.wait(coalesce_delay)  # Let a burst of writes land in one drain
+        try:
+            with app.app_context():
+                while not _stop_event.is_set() and drain_outbox(batch_size)["read"] >= batch_size:
+                    pass  # Full batch: there is probably more due
+        except Exception as e:
+            logger.error("[%s] Error: %s Search indexer drain failed", __name__, e, exc_info=True)
+
+
+def start_search_indexer(app):
+    """
+    Starts the background thread that drains the search outbox.
+
+    Args:
+        app: Flask app object providing configuration.
+    """
+    global _indexer_thread
+    if _indexer_thread is not None and _indexer_thread.is_alive():
+        logger.info("Search indexer already running.")
+        return
+    _stop_event.clear()
+    _indexer_thread = threading.Thread(target=_indexer_loop, args=(app,), name="search-indexer", daemon=True)
+    _indexer_thread.start()
+    logger.info("Search indexer started.")
+
+
+def stop_search_indexer(timeout: float = 10.0):
+    """ Stops the indexer thread. Pending intents stay in the outbox for the next start. """
+    global _indexer_thread
+    _stop_event.set()
+    _wake_event.set()
+    if _indexer_thread is not None:
+        _indexer_thread.join(timeout)
+    _indexer_thread = None
+
+
+def get_search_indexer_stats() -> dict:
+    """ Returns counters for drains, applied/failed intents and search API calls. """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["running"] = _indexer_thread is not None and _indexer_thread.is_alive()
+    return stats
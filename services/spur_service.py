@@ -1,13 +1,17 @@
 import firebase_admin
 from class_defs.spur_def import Spur
-from flask import g
-from google.cloud import firestore
-from infrastructure.clients import db
+from flask import current_app, g
 from infrastructure.id_generator import extract_user_id_from_other_id
 from infrastructure.logger import get_logger
+from services.repository import get_repository
+from utils.pagination import decode_cursor, encode_cursor
 
 logger = get_logger(__name__)
 
+SAVED_SPURS_CURSOR_SCOPE = "saved_spurs"
+# The saved spurs list only shows these fields, so only these are read
+SAVED_SPUR_LIST_FIELDS = ["variant", "text", "situation", "created_at"]
+
 def save_spur(user_id, spur):
     try:
         if not user_id:
@@ -25,7 +29,7 @@ def save_spur(user_id, spur):
         connection_id = spur_dict.get("connection_id", "")
         situation = spur_dict.get("situation", "")
         topic = spur_dict.get("topic","")
-        variant = spur_dict.get("varint", "")
+        variant = spur_dict.get("variant", "")
         tone = spur_dict.get("tone", "")
         text = spur_dict.get("text", "")
         created_at = spur_dict.get("created_at", None)
@@ -33,10 +37,9 @@ def save_spur(user_id, spur):
         
         
 
-        doc_ref = db.collection("users").document(user_id).collection("spurs").document(spur_id)
         doc_data = {
             "user_id": user_id,
-            "spur_id": spur,
+            "spur_id": spur_id,
             "conversation_id": conversation_id,
             "connection_id": connection_id,
             "situation": situation,
@@ -47,54 +50,78 @@ def save_spur(user_id, spur):
             "created_at": created_at
             }
 
-        doc_ref.set(doc_data)
+        get_repository().set_spur(user_id, spur_id, doc_data)
         
-        return {"status": "spur saved", "spur_id": doc_ref.id}
+        return {"status": "spur saved", "spur_id": spur_id}
     except Exception as e:
         err_point = __package__ or __name__
         logger.error("[%s] Error: %s", err_point, e)
         return f"error: {err_point} - Error: {str(e)}", 500
 
-def get_saved_spurs(user_id, filters=None):
+def get_saved_spurs(user_id, filters=None, cursor=None, page_size=None):
+    """
+    Lists saved spurs one page at a time, newest first unless filters["sort"] is "asc".
+
+    Args
+        user_id: owner of the spurs
+            str
+        filters: variant, situation, date_from, date_to, keyword, sort
+            dict
+        cursor: next_cursor from the previous page
+            str
+        page_size: maximum number of spurs to return; defaults to DEFAULT_PAGE_SIZE
+            int
+    Return
+        {"items": [spur summaries], "next_cursor": str | None}
+            dict
+    Raises
+        InvalidCursorError: if the cursor is invalid or belongs to another query
+    """
     if not user_id:
         err_point = __package__ or __name__
         logger.error(f"Error: {err_point}")
         return f"error - {err_point} - Error:", 400
+    filters = filters or {}
+    page_size = page_size or int(current_app.config.get('DEFAULT_PAGE_SIZE', 20))
+    position = decode_cursor(SAVED_SPURS_CURSOR_SCOPE, cursor, user_id, filters) if cursor else {}
     try:
-        ref = db.collection("users").document(user_id).collection("spurs")
-        query = ref
-
-        if filters:
-            if "variant" in filters:
-                query = query.where("variant", "==", filters["variant"])
-            if "situation" in filters:
-                query = query.where("situation", "==", filters["situation"])
-            if "date_from" in filters:
-                query = query.where("date_saved", ">=", filters["date_from"])
-            if "date_to" in filters:
-                query = query.where("date_saved", "<=", filters["date_to"])
-            sort_order = filters.get("sort", "desc")
-            direct = firestore.Query.ASCENDING if sort_order == "asc" else firestore.Query.DESCENDING
-            query = query.order_by("date_saved", direction=direct)
-
-        keyword = filters.get("keyword", "").lower() if filters else ""
-
-        docs = query.stream()
-        result = []
-        for doc in docs:
-            data = doc.to_dict()
+        keyword = filters.get("keyword", "").lower()
+        spurs = get_repository().iter_spurs(
+            user_id,
+            variant=filters.get("variant"),
+            situation=filters.get("situation"),
+            date_from=filters.get("date_from"),
+            date_to=filters.get("date_to"),
+            descending=filters.get("sort", "desc") != "asc",
+            start_after=(position["created_at"], position["id"]) if position else None,
+            limit=None if keyword else page_size + 1,
+            fields=SAVED_SPUR_LIST_FIELDS,
+        )
+
+        # With a keyword, matches are filtered here, so keep reading until the page (+1) is full
+        matches = []
+        for doc in spurs:
+            data = doc.data
             if keyword and keyword not in data.get("text", "").lower():
                 continue  # Skip if keyword not in text
-
-            result.append({
-                "spur_id": doc.id,
-                "variant": data.get("variant"),
-                "text": data.get("text"),
-                "situation": data.get("situation"),
-                "date_saved": data.get("date_saved")
-            })
-
-        return result
+            matches.append((doc, data))
+            if len(matches) > page_size:
+                break
+
+        result = [{
+            "spur_id": doc.id,
+            "variant": data.get("variant"),
+            "text": data.get("text"),
+            "situation": data.get("situation"),
+            "date_saved": data.get("created_at")
+        } for doc, data in matches[:page_size]]
+
+        next_cursor = None
+        if len(matches) > page_size:
+            last_doc, last_data = matches[page_size - 1]
+            next_cursor = encode_cursor(SAVED_SPURS_CURSOR_SCOPE, user_id, filters, {"created_at": last_data.get("created_at"), "id": last_doc.id})
+
+        return {"items": result, "next_cursor": next_cursor}
     except Exception as e:
         err_point = __package__ or __name__
         logger.error("[%s] Error: %s", err_point, e)
@@ -108,8 +135,7 @@ def delete_saved_spur(user_id, spur_id):
         return f"error - {err_point} - Error:", 400
 
     try:
-        doc_ref = db.collection("users").document(user_id).collection("spurs").document(spur_id)
-        doc_ref.delete()
+        get_repository().delete_spur(user_id, spur_id)
         return {"status": "spur deleted"}
     except Exception as e:
         err_point = __package__ or __name__
@@ -124,10 +150,9 @@ def get_spur(spur_id: str) -> Spur:
         logger.error(f"Error: {err_point} - Missing user_id or spur_id")
         raise ValueError("Error: Missing user_id or spur_id")
 
-    doc_ref = db.collection("users").document(user_id).collection("spurs").document(spur_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        spur = Spur.from_dict(doc)
+    data = get_repository().get_spur(user_id, spur_id)
+    if data is not None:
+        spur = Spur.from_dict(data)
         return spur
     else:
         err_point = __package__ or __name__
@@ -3,20 +3,77 @@ from datetime import datetime, timezone, timedelta
 from flask import g, current_app
 from google.cloud import firestore
 from gpt_training.anonymizer import anonymize_conversation
-from infrastructure.clients import db, get_algolia_client
+from infrastructure.background import submit_background_task
 from infrastructure.id_generator import generate_conversation_id
 from infrastructure.logger import get_logger
+from services.connection_index import list_indexed_connections
+from services.repository import DocumentNotFoundError, SearchIntent, get_repository
+from services.search_backend import get_search_backend
+from utils.conversation_codec import append_encoded_messages, encode_for_storage, encoded_message_count, expand_messages, is_encoded
+from utils.pagination import decode_cursor, encode_cursor
 import openai
 
 
 
 logger = get_logger(__name__)
 
+CONVERSATIONS_CURSOR_SCOPE = "conversations"
+# Fields read for summary list views; created_at is also the listing cursor field
+CONVERSATION_SUMMARY_FIELDS = ["conversation_id", "connection_id", "situation", "topic", "preview", "message_count", "created_at"]
+
+
+def build_conversation_preview(messages: list, max_chars: int | None = None) -> dict:
+    """
+    Builds the display fields stored with a conversation so list views never read the messages.
+
+    Args
+        messages: conversation messages
+            list[dict]
+        max_chars: preview length; defaults to CONVERSATION_PREVIEW_CHARS
+            int
+    Return
+        {"preview": last message text or None, "message_count": int}
+            dict
+    """
+    max_chars = max_chars or int(current_app.config.get('CONVERSATION_PREVIEW_CHARS', 120))
+    preview = None
+    for message in reversed(messages):
+        text = message.get("text") if isinstance(message, dict) else None
+        if text:
+            text = " ".join(str(text).split())
+            preview = text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+            break
+    return {"preview": preview, "message_count": len(messages)}
+
+
+def conversation_summary(conversation_id: str, data: dict, connection_names: dict | None = None) -> dict:
+    """ List-view item for a conversation document read with CONVERSATION_SUMMARY_FIELDS. """
+    connection_id = data.get("connection_id")
+    return {
+        "conversation_id": data.get("conversation_id") or conversation_id,
+        "connection_id": connection_id,
+        "connection_name": (connection_names or {}).get(connection_id),
+        "situation": data.get("situation"),
+        "topic": data.get("topic"),
+        "preview": data.get("preview"),
+        "message_count": data.get("message_count"),
+        "created_at": data.get("created_at"),
+    }
+
+
+def _connection_names(user_id: str) -> dict:
+    """ {connection_id: name} for a user, from the cached connection index (no connection reads). """
+    return {entry["connection_id"]: entry.get("name") for entry in list_indexed_connections(user_id)}
+
 def save_conversation(data: Conversation) -> dict:
     
     """
     Saves a conversation with the conversation_id.
 
+    The request path is a single Firestore batch: the conversation plus its search outbox
+    intent. Indexing is applied by the search indexer and anonymization for training data
+    runs as a background task, so save latency includes neither.
+
     Args
         data: the conversation data associated with the active user to be saved
             Conversation 
@@ -28,13 +85,26 @@ def save_conversation(data: Conversation) -> dict:
     """
 
     user_id = g.user['user_id']
-    conversation_id = data.conversation_id
-    connection_id = data.connection_id
     
     if not user_id:
         logger.error("Error: Failed to save conversation - missing user_id", __name__)
         return {"error": "Missing user_ids"}
 
+    if isinstance(data, dict):
+        data = Conversation(
+            user_id=user_id,
+            conversation_id=data.get("conversation_id", ""),
+            created_at=data.get("created_at"),
+            conversation=data.get("conversation", []),
+            connection_id=data.get("connection_id"),
+            situation=data.get("situation"),
+            topic=data.get("topic"),
+            spurs=data.get("spurs", {}),
+        )
+
+    conversation_id = data.conversation_id
+    connection_id = data.connection_id
+
     if not conversation_id:
         conversation_id = generate_conversation_id(user_id)
     elif conversation_id.startswith(":"):
@@ -45,65 +115,38 @@ def save_conversation(data: Conversation) -> dict:
     # Ensure created_at is a datetime object before conversion
     if isinstance(created_time, str):
         try:
-            created_time = datetime.fromisoformat(created_time)
+            created_time = datetime.fromisoformat(created_time.replace("Z", "+00:00"))
         except ValueError:
             logger.error(f"Invalid created_at format for {conversation_id}. Using current time.", exc_info=True)
             created_time = datetime.now(timezone.utc)
 
-    spurs = data.spurs
-    situation = data.situation
-    topic = data.topic
-    conversation = get_conversation(conversation_id)
-    conversation_text = Conversation.conversation_as_string(conversation)
-    
     try:
-        doc_ref = db.collection("users").document(user_id).collection("conversations").document(conversation_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            conversation = Conversation.from_dict(doc.to_dict())
-
-
         doc_data = {
             "user_id": user_id,
             "conversation_id": conversation_id,
-            "conversation": conversation,
+            "conversation": list(data.conversation or []),
             "connection_id": connection_id,
-            "situation": situation,
-            "topic": topic,
-            "spurs": spurs,
+            "situation": data.situation,
+            "topic": data.topic,
+            "spurs": data.spurs,
             "created_at": created_time
         }
 
-        anonymize_conversation(Conversation.from_dict(doc_data))
+        saved_conversation = Conversation(**doc_data)
+        doc_data.update(build_conversation_preview(doc_data["conversation"]))
+        search_record = conversation_search_record(saved_conversation)
+        # Long conversations are stored in the compact encoding (see utils.conversation_codec)
+        doc_data["conversation"] = encode_for_storage(doc_data["conversation"],
+                                                      int(current_app.config.get('CONVERSATION_COMPACT_MIN_MESSAGES', 100)),
+                                                      int(current_app.config.get('CONVERSATION_COMPRESS_MIN_BYTES', 2048)))
+        aloglia_conversations_index = current_app.config['ALGOLIA_CONVERSATIONS_INDEX']
 
-        doc_ref.set(doc_data)
+        # The search intent commits together with the conversation (see services.repository)
+        get_repository().save_conversation(user_id, conversation_id, doc_data,
+                                           SearchIntent(aloglia_conversations_index, conversation_id, search_record or None))
+
+        submit_background_task("anonymize_conversation", anonymize_conversation, saved_conversation)
 
-        # --- Index in Algolia ---
-        algolia_client = get_algolia_client()
-        aloglia_conversations_index = current_app.config['ALGOLIA_CONVERSATIONS_INDEX']
-        if algolia_client and conversation_text: # Only index if Algolia is available and text exists
-            try:
-                algolia_payload = {
-                    "objectID": conversation_id,
-                    "user_id": user_id,
-                    "text": conversation_text,
-                    # Ensure 'created_at' is a Unix timestamp for Algolia filtering/sorting
-                    "created_at_timestamp": int(created_time.timestamp()),
-                    # Include other filterable attributes if needed
-                    "connection_id": connection_id,
-                    "situation": situation,
-                    "topic": topic,
-                }
-                # Remove None values if Algolia doesn't handle them well
-                algolia_payload = {k: v for k, v in algolia_payload.items() if v is not None}
-
-                res = algolia_client.save_object(aloglia_conversations_index, algolia_payload)
-                algolia_client.wait_for_task(index_name=aloglia_conversations_index, task_id=res.task_id)
-                logger.info(f"Successfully indexed conversation {conversation_id} in Algolia.")
-            except Exception as algolia_error:
-                logger.error(f"Failed to index conversation {conversation_id} in Algolia: {algolia_error}", exc_info=True)
-                # Continue even if Algolia indexing fails
-        
         return {"status": "conversation saved", "conversation_id": conversation_id}
     except firestore.ReadAfterWriteError as e:
         logger.error("[%s] Error: %s Save conversation failed", __name__, e)
@@ -111,8 +154,121 @@ def save_conversation(data: Conversation) -> dict:
     except Exception as e:
         logger.error("[%s] Error: %s Save conversation failed", __name__, e)
         raise ValueError(f"Save conversation failed: {e}") from e
+
+
+def conversation_search_record(conversation: Conversation) -> dict | None:
+    """
+    Builds the search record for a conversation.
+
+    Args
+        conversation: the saved conversation
+            Conversation
+    Return
+        search record, or None if the conversation has no text to index
+            dict | None
+    """
+    conversation_text = conversation.conversation_as_string()
+    if not conversation_text:
+        return None
+
+    algolia_payload = {
+        "objectID": conversation.conversation_id,
+        "user_id": conversation.user_id,
+        "text": conversation_text,
+        # Ensure 'created_at' is a Unix timestamp for Algolia filtering/sorting
+        "created_at_timestamp": int(conversation.created_at.timestamp()),
+        # Include other filterable attributes if needed
+        "connection_id": conversation.connection_id,
+        "situation": conversation.situation,
+        "topic": conversation.topic,
+    }
+    # Remove None values if Algolia doesn't handle them well
+    return {k: v for k, v in algolia_payload.items() if v is not None}
         
 
+def append_messages(user_id: str, conversation_id: str, messages: list[dict]) -> dict:
+    """
+    Appends messages to a stored conversation in one atomic read-modify-write.
+
+    Only the new messages are processed: a compact (encoded) conversation gets them as a new
+    tail segment without decoding its history (see append_encoded_messages), the preview and
+    message count are updated from them, and the search index receives just their text (an
+    append intent, see services.search_indexer). Anonymization for training data is not re-run;
+    the training copy is refreshed by the next full save_conversation.
+
+    Args
+        user_id: owner of the conversation
+            str
+        conversation_id: conversation to append to
+            str
+        messages: new messages, in order
+            list[dict]
+    Return
+        status, conversation_id and the new message_count
+            dict
+    Raises
+        DocumentNotFoundError: the conversation does not exist
+        ValueError: messages is empty, too long or not a list of message dicts (input errors only)
+        RuntimeError: the stored conversation could not be decoded or updated
+        Storage errors (e.g. a failed transaction) propagate unchanged.
+    """
+    if not user_id or not conversation_id:
+        logger.error("Error: Failed to append messages - missing user_id or conversation_id")
+        raise ValueError("Missing user_id or conversation_id")
+    if not isinstance(messages, list) or not messages or not all(isinstance(message, dict) for message in messages):
+        raise ValueError("messages must be a non-empty list of message objects")
+    max_messages = int(current_app.config.get('CONVERSATION_APPEND_MAX_MESSAGES', 500))
+    if len(messages) > max_messages:
+        raise ValueError(f"At most {max_messages} messages can be appended at once")
+
+    aloglia_conversations_index = current_app.config['ALGOLIA_CONVERSATIONS_INDEX']
+    min_messages = int(current_app.config.get('CONVERSATION_COMPACT_MIN_MESSAGES', 100))
+    compress_min_bytes = int(current_app.config.get('CONVERSATION_COMPRESS_MIN_BYTES', 2048))
+    segment_max_messages = int(current_app.config.get('CONVERSATION_SEGMENT_MAX_MESSAGES', 256))
+    new_text = Conversation.messages_as_string(messages)
+
+    def append(stored: dict) -> tuple[dict, SearchIntent | None]:
+        stored_messages = stored.get("conversation")
+        if is_encoded(stored_messages):
+            existing_count = encoded_message_count(bytes(stored_messages))
+            conversation = append_encoded_messages(bytes(stored_messages), messages, compress_min_bytes, segment_max_messages)
+            message_count = existing_count + len(messages)
+            combined = list(messages)  # Only read below when the conversation was empty
+        else:
+            # Short conversations are plain arrays (below CONVERSATION_COMPACT_MIN_MESSAGES)
+            combined = expand_messages(stored_messages) + messages
+            existing_count = len(combined) - len(messages)
+            conversation = encode_for_storage(combined, min_messages, compress_min_bytes)
+            message_count = len(combined)
+        new_preview = build_conversation_preview(messages)["preview"]
+        fields = {
+            "conversation": conversation,
+            "preview": new_preview or stored.get("preview"),
+            "message_count": message_count,
+        }
+        if existing_count:
+            search_intent = SearchIntent(aloglia_conversations_index, conversation_id, {"objectID": conversation_id, "text": new_text}, append=True)
+        else:
+            # Nothing was indexed for an empty conversation, so index the full (short) record
+            record = conversation_search_record(Conversation.from_dict({**stored, "conversation_id": conversation_id, "conversation": combined}))
+            search_intent = SearchIntent(aloglia_conversations_index, conversation_id, record) if record else None
+        return fields, search_intent
+
+    try:
+        fields = get_repository().modify_conversation(user_id, conversation_id, append)
+    except DocumentNotFoundError:
+        logger.error("Error: no conversation exists with conversation_id %s", conversation_id)
+        raise
+    except ValueError as e:
+        # The input was validated above, so this is stored data that could not be decoded
+        logger.error("[%s] Error: %s Append messages failed", __name__, e)
+        raise RuntimeError(f"Append messages failed: {e}") from e
+    except Exception as e:
+        logger.error("[%s] Error: %s Append messages failed", __name__, e)
+        raise
+    return {"status": "messages appended", "conversation_id": conversation_id, "message_count": fields["message_count"]}
+
+
 def get_conversation(conversation_id: str) -> Conversation:
     """
     Gets a conversation by the conversation_id.
@@ -132,17 +288,17 @@ def get_conversation(conversation_id: str) -> Conversation:
         logger.error("Error: Failed to get conversation - missing user_id or conversation_id ", __name__)
         raise RuntimeError("Error Missing user_id or conversation_id")
 
-    doc_ref = db.collection("users").document(user_id).collection("conversations").document(conversation_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        return doc.to_dict()
+    data = get_repository().get_conversation(user_id, conversation_id)
+    if data is not None:
+        data["conversation"] = expand_messages(data.get("conversation"))
+        return data
     else:
         logger.error(f"Error: no conversation exists with conversation_id {conversation_id}", __name__)
         raise RuntimeError("Error Missing user_id or conversation_id")
 
 def delete_conversation(conversation_id: str) -> dict:
     """
-    Deletes a conversation by the conversation_id from Firestore and Algolia.
+    Deletes a conversation by the conversation_id from Firestore and queues its removal from the search index.
 
     Args
         conversation_id: the unique id for the conversation requested to be deleted
@@ -163,21 +319,11 @@ def delete_conversation(conversation_id: str) -> dict:
         return {"error": "Missing conversation_id"}
 
     try:
-        # --- Delete from Firestore ---
-        db.collection("users").document(user_id).collection("conversations").document(conversation_id).delete()
-        logger.info(f"Deleted conversation {conversation_id} from Firestore for user {user_id}.")
-
-        # --- Delete from Algolia ---
-        algolia_client = get_algolia_client()
+        # --- Delete from Firestore, with the matching de-index intent in the same batch ---
         aloglia_conversations_index = current_app.config['ALGOLIA_CONVERSATIONS_INDEX']
-        if algolia_client:
-            try:
-                res = algolia_client.delete_object(index_name=aloglia_conversations_index, object_id=conversation_id)
-                algolia_client.wait_for_task(index_name=aloglia_conversations_index, task_id=res.task_id)
-                logger.info(f"Deleted conversation {conversation_id} from Algolia index.")
-            except Exception as algolia_error:
-                # Log error but don't fail the whole operation if Algolia deletion fails
-                logger.error(f"Failed to delete conversation {conversation_id} from Algolia: {algolia_error}", exc_info=True)
+        get_repository().delete_conversation(user_id, conversation_id,
+                                             SearchIntent(aloglia_conversations_index, conversation_id, None))
+        logger.info(f"Deleted conversation {conversation_id} from Firestore for user {user_id}.")
 
         return {"status": f"conversation_id {conversation_id} deleted"}
 
@@ -186,144 +332,153 @@ def delete_conversation(conversation_id: str) -> dict:
          raise ValueError(f"Failed to delete conversation {conversation_id}: {e}") from e
 
 
+def get_conversations_by_ids(user_id: str, conversation_ids: list[str]) -> list[Conversation]:
+    """
+    Fetches conversations by ID with one batched repository read, preserving the order of conversation_ids.
+
+    Conversation IDs are the document keys, so the fetch is a direct batch read rather than a
+    query (on Firestore: chunked, parallel get_all calls; see FirestoreRepository.get_conversations).
+
+    Args
+        user_id: owner of the conversations
+            str
+        conversation_ids: IDs in the desired result order (e.g. search ranking)
+            list[str]
+    Return
+        conversations that exist, in the order of conversation_ids
+            list[Conversation]
+    """
+    if not conversation_ids:
+        return []
+
+    unique_ids = list(dict.fromkeys(conversation_ids))
+    documents = get_repository().get_conversations(user_id, unique_ids)
+    return [Conversation.from_dict(documents[cid]) for cid in unique_ids if cid in documents]
+
+
 ## TODO: Need to refactor the keyword search using Firebase, Vertex AI, Firestore.
-def get_conversations(user_id: str, filters: dict) -> list[Conversation]:
+def get_conversations(user_id: str, filters: dict, cursor: str | None = None, page_size: int | None = None,
+                      view: str = "full") -> dict:
     """
-    Searches for conversations based on filters. Uses Algolia for keyword search
-    and Firestore for retrieval and other filtering.
+    Searches for conversations based on filters, one page at a time. Uses the search backend
+    (Algolia or embedded SQLite FTS, see services.search_backend) for keyword search and
+    Firestore for retrieval and other filtering.
+
+    The "summary" view reads only CONVERSATION_SUMMARY_FIELDS (a Firestore field mask, so the
+    messages are never transferred) and adds each conversation's connection name.
+
+    Pages continue from an opaque signed cursor: a Firestore start_after position
+    (created_at + document id) for listings, or the search page number for keyword search.
 
     Args:
         user_id (str): User ID associated with the conversations.
         filters (dict, optional): Search/sort criteria (keyword, date_from, date_to, connection_id, sort). Defaults to None.
-        limit (int, optional): Maximum number of conversations to return. Defaults to 20.
+        cursor (str, optional): next_cursor from the previous page.
+        page_size (int, optional): Maximum number of conversations to return. Defaults to ALGOLIA_SEARCH_RESULTS_LIMIT.
+        view (str, optional): "full" (Conversation objects) or "summary" (display fields only). Defaults to "full".
 
     Returns:
-        list[Conversation]: A list of Conversation objects matching the criteria.
+        dict: {"items": list[Conversation] | list[dict], "next_cursor": str | None}
+
+    Raises:
+        InvalidCursorError: if the cursor is invalid or belongs to another query.
     """
     if not user_id:
         logger.error("Error: Failed to get conversations - missing user_id", __name__)
-        return [] # Return empty list on error
+        return {"items": [], "next_cursor": None} # Return empty page on error
 
     if filters is None:
         filters = {}
 
     keyword = filters.get("keyword")
-    algolia_client = get_algolia_client()
     aloglia_conversations_index = current_app.config['ALGOLIA_CONVERSATIONS_INDEX']
-    aloglia_search_results_limit = current_app.config['ALGOLIA_SEARCH_RESULTS_LIMIT']
+    page_size = page_size or int(current_app.config['ALGOLIA_SEARCH_RESULTS_LIMIT'])
+    position = decode_cursor(CONVERSATIONS_CURSOR_SCOPE, cursor, user_id, filters) if cursor else {}
+    summary = view == "summary"
+    fields = CONVERSATION_SUMMARY_FIELDS if summary else None
 
     try:
-        # --- Use Algolia if keyword is present and client is available ---
-        if keyword and algolia_client:
-            logger.info(f"Performing Algolia keyword search for user '{user_id}' with keyword: '{keyword}'")
-
-            # Define Algolia search parameters
-            search_params = {
-                "query": keyword,
-                "filters": f"user_id:{user_id}", # Filter by user_id in Algolia
-                "hitsPerPage": aloglia_search_results_limit * 5, # Fetch more IDs initially in case some are filtered out later
-                "attributesToRetrieve": ["objectID"], # Only need the IDs from Algolia
-            }
-
-            # Add connection_id filter if provided
-            connection_id_filter = filters.get("connection_id")
-            if connection_id_filter:
-                search_params["filters"] += f" AND connection_id:{connection_id_filter}"
-
-            # Add date filters (requires timestamp attribute in Algolia)
-            # Assuming 'created_at_timestamp' exists in your Algolia records
-            date_filter_parts = []
+        # --- Keyword search through the configured search backend (Algolia or embedded SQLite FTS) ---
+        if keyword:
+            search_backend = get_search_backend()
+            logger.info(f"Performing {search_backend.name} keyword search for user '{user_id}' with keyword: '{keyword}'")
+
+            search_filters = {"connection_id": filters.get("connection_id")}
+            # Date filters use the 'created_at_timestamp' attribute of the search records
             if "date_from" in filters and isinstance(filters["date_from"], datetime):
-                date_filter_parts.append(f"created_at_timestamp >= {int(filters['date_from'].timestamp())}")
+                search_filters["created_at_from"] = int(filters["date_from"].timestamp())
             if "date_to" in filters and isinstance(filters["date_to"], datetime):
                  # Adjust to_date to include the full day
                  to_date = filters["date_to"]
                  if to_date.time() == datetime.min.time(): # If time is midnight, include the whole day
                      to_date = to_date + timedelta(days=1) - timedelta(microseconds=1)
-                 date_filter_parts.append(f"created_at_timestamp <= {int(to_date.timestamp())}")
-
-            if date_filter_parts:
-                 search_params["filters"] += " AND " + " AND ".join(date_filter_parts)
-
-
-            # Perform the search
-            res = algolia_client.search(
-                        {
-                            "requests": [
-                                {
-                                    "indexName": aloglia_conversations_index,
-                                    "query": search_params
-                                }
-                            ]
-                        })
-            conversation_ids = []
-            for key, convo_id in res.to_dict():
-                conversation_ids.append(convo_id)
+                 search_filters["created_at_to"] = int(to_date.timestamp())
+
+            search_result = search_backend.search(aloglia_conversations_index, keyword, user_id, search_filters,
+                                                  page=int(position.get("page", 0)), hits_per_page=page_size)
+            conversation_ids = search_result["hits"]
             
             if not conversation_ids:
-                logger.info(f"No Algolia hits found for keyword '{keyword}' for user '{user_id}'.")
-                return []
-
-            logger.info(f"Found {len(res.results)} potential matches in Algolia for keyword '{keyword}'. Fetching from Firestore.")
-
-            # Fetch conversations from Firestore using the IDs from Algolia
-            # Firestore 'in' queries support up to 30 elements per query part. Split if necessary.
-            # Note: Firestore 'in' query doesn't preserve order from the list. We re-sort later.
-            conversation_docs = []
-            # Split IDs into chunks for Firestore 'in' query limit (typically 30, but use 10 for safety)
-            id_chunks = [conversation_ids[i:i + 10] for i in range(0, len(conversation_ids), 10)]
+                logger.info(f"No search hits found for keyword '{keyword}' for user '{user_id}'.")
+                return {"items": [], "next_cursor": None}
 
-            for chunk in id_chunks:
-                if not chunk: continue
-                query = db.collection("users").document(user_id).collection("conversations").where("conversation_id", "in", chunk)
-                docs = query.stream()
-                conversation_docs.extend([doc.to_dict() for doc in docs])
+            logger.info(f"Found {len(conversation_ids)} potential matches for keyword '{keyword}'. Fetching from Firestore.")
 
+            # Hydrate from Firestore in search ranking order; IDs missing in Firestore are dropped
+            if summary:
+                unique_ids = list(dict.fromkeys(conversation_ids))
+                documents = get_repository().get_conversations(user_id, unique_ids, fields=fields)
+                names = _connection_names(user_id)
+                ordered_convos = [conversation_summary(cid, documents[cid], names) for cid in unique_ids if cid in documents]
+            else:
+                ordered_convos = get_conversations_by_ids(user_id, conversation_ids)
 
-            # Convert to Conversation objects and filter out potential misses
-            convos_map = {convo_data['conversation_id']: Conversation.from_dict(convo_data)
-                          for convo_data in conversation_docs if convo_data}
-
-            # Re-order based on Algolia's ranking and apply limit
-            ordered_convos = [convos_map[cid] for cid in conversation_ids if cid in convos_map][:aloglia_search_results_limit]
+            next_page = search_result["page"] + 1
+            next_cursor = None
+            if next_page < search_result["nbPages"]:
+                next_cursor = encode_cursor(CONVERSATIONS_CURSOR_SCOPE, user_id, filters, {"page": next_page})
 
             logger.info(f"Returning {len(ordered_convos)} conversations after keyword search and Firestore fetch.")
-            return ordered_convos
+            return {"items": ordered_convos, "next_cursor": next_cursor}
 
-        # --- Fallback: No keyword or Algolia unavailable - Use Firestore query ---
+        # --- No keyword - Use Firestore query ---
         else:
-            logger.info(f"No keyword provided or Algolia unavailable. Performing Firestore query for user '{user_id}'.")
-            query = db.collection("users").document(user_id).collection("conversations")
-
-            # Apply Firestore filters
-            connection_id_filter = filters.get("connection_id")
-            if connection_id_filter:
-                query = query.where("connection_id", "==", connection_id_filter)
-
+            logger.info(f"No keyword provided. Performing Firestore query for user '{user_id}'.")
             # Date filtering requires ordering by date first
             sort_field = "created_at" # Assuming you want to sort/filter by creation date
-            sort_order_str = filters.get("sort", "desc")
-            sort_direction = firestore.Query.DESCENDING if sort_order_str == "desc" else firestore.Query.ASCENDING
-
-            # Apply date range filters
-            if "date_from" in filters and isinstance(filters["date_from"], datetime):
-                 query = query.where(sort_field, ">=", filters["date_from"])
-            if "date_to" in filters and isinstance(filters["date_to"], datetime):
+            date_from = filters["date_from"] if isinstance(filters.get("date_from"), datetime) else None
+            date_to = None
+            if isinstance(filters.get("date_to"), datetime):
                  # Adjust to_date to include the full day
-                 to_date = filters["date_to"]
-                 if to_date.time() == datetime.min.time():
-                      to_date = to_date + timedelta(days=1) - timedelta(microseconds=1)
-                 query = query.where(sort_field, "<=", to_date)
-
-
-            # Apply sorting and limit
-            query = query.order_by(sort_field, direction=sort_direction).limit(aloglia_search_results_limit)
-
-            docs = query.stream()
-            firestore_convos = [Conversation.from_dict(doc.to_dict()) for doc in docs]
+                 date_to = filters["date_to"]
+                 if date_to.time() == datetime.min.time():
+                      date_to = date_to + timedelta(days=1) - timedelta(microseconds=1)
+
+            # Ordered by created_at then document id, so the cursor position is exact.
+            # One extra document tells us whether there is a next page
+            docs = get_repository().list_conversations(
+                user_id,
+                connection_id=filters.get("connection_id"),
+                date_from=date_from,
+                date_to=date_to,
+                descending=filters.get("sort", "desc") == "desc",
+                start_after=(position["created_at"], position["id"]) if position else None,
+                limit=page_size + 1,
+                fields=fields,
+            )
+            if summary:
+                names = _connection_names(user_id) if docs else {}
+                firestore_convos = [conversation_summary(doc.id, doc.data, names) for doc in docs[:page_size]]
+            else:
+                firestore_convos = [Conversation.from_dict(doc.data) for doc in docs[:page_size]]
+
+            next_cursor = None
+            if len(docs) > page_size:
+                last = docs[page_size - 1]
+                next_cursor = encode_cursor(CONVERSATIONS_CURSOR_SCOPE, user_id, filters, {"created_at": last.data.get(sort_field), "id": last.id})
 
             logger.info(f"Returning {len(firestore_convos)} conversations from Firestore query.")
-            return firestore_convos
+            return {"items": firestore_convos, "next_cursor": next_cursor}
 
     except Exception as e:
         logger.error(f"[%s] Error: {e} Failed to get conversations for user_id {user_id}", __name__, exc_info=True)
@@ -332,4 +487,4 @@ def get_conversations(user_id: str, filters: dict) -> list[Conversation]:
              logger.error("Underlying error likely related to Algolia call.")
         elif "firestore" in str(e).lower():
              logger.error("Underlying error likely related to Firestore call.")
-        return [] # Return empty list on error
\ No newline at end of file
+        return {"items": [], "next_cursor": None} # Return empty page on error
\ No newline at end of file
@@ -1,9 +1,11 @@
 from class_defs.profile_def import BaseProfile, UserProfile
 from dataclasses import fields
-from firebase_admin import auth
 from flask import jsonify, current_app, g
-from infrastructure.clients import db
+from infrastructure.cache import get_profile_cache
 from infrastructure.logger import get_logger
+from services.account_deletion import start_account_deletion
+from services.repository import get_repository
+from utils.profile_format import render_profile_text
 
 logger = get_logger(__name__)
 
@@ -29,25 +31,8 @@ def format_user_profile(profile: UserProfile) -> str:
         logger.error("Error: Type mismatch - format user profile failed")
         raise TypeError("Format user profile failed: Type mismatch")
   
-    lines = [f"user_id: {user_id}"]
-
-    for field in fields(UserProfile):
-        key = field.name
-        value = getattr(profile, key)
-
-        if key == "user_id" or value is None:
-            continue
-
-        if isinstance(value, list):
-            if value:
-                label = "Greenlight Topics" if key == "greenlights" else (
-                        "Redlight Topics" if key == "redlights" else key.capitalize())
-                lines.append(f"{label}: {', '.join(value)}")
-        else:
-            lines.append(f"{key.capitalize()}: {value}")
-    default_log_level = current_app.config['DEFAULT_LOG_LEVEL']      
-    logger.log(default_log_level, "Formatting user profile as text for UX/UI use.")
-    return "\n".join(lines)
+    # Compiled once for UserProfile; unchanged profiles reuse their rendered text
+    return render_profile_text(profile)
 
 def save_user_profile(user_id: str, data: UserProfile) -> dict:
     """
@@ -94,12 +79,12 @@ def save_user_profile(user_id: str, data: UserProfile) -> dict:
         profile = UserProfile.from_dict(data) # Create object from dict
         profile_doc_string = format_user_profile(profile) # Format the object for Firestore string field
 
-        user_ref = db.collection("users").document(user_id)
-        user_ref.set({
+        get_repository().set_user(user_id, {
             "user_id": user_id,
             "profile_entries": profile_doc_string, # Save the formatted string
             "fields": profile.to_dict() # Save the structured data
         })
+        get_profile_cache("user").invalidate(user_id)
         logger.log(current_app.config['DEFAULT_LOG_LEVEL'], "User profile successfully saved.")
         # Return a success dictionary, matching what the route might expect
         return {"status": "user profile successfully saved"}
@@ -126,14 +111,12 @@ def get_user_profile(user_id) -> UserProfile:
         raise ValueError("Error: Missing user ID - get user profile failed")
 
     try:
-        user_ref = db.collection("users").document(user_id)
-        doc = user_ref.get()
+        data = get_profile_cache("user").get_or_load(user_id, lambda: get_repository().get_user(user_id))
 
-        if not doc.exists:
+        if data is None:
             logger.error("Error: No user profile - get user profile failed")
             raise ValueError("Error: No user profile - get user profile failed")
 
-        data = doc.to_dict()
         user_profile = UserProfile.from_dict(data)
         return user_profile
     except Exception as e:
@@ -159,13 +142,12 @@ def update_user_profile(user_id: str, profile_data: UserProfile):
     try:
         data = profile_data.to_dict()
         profile = UserProfile.from_dict({"user_id": user_id, **data})
-        user_ref = db.collection("users").document(user_id)
-        user_ref.set({
+        get_repository().set_user(user_id, {
             "user_id": user_id,
             "profile_entries": format_user_profile(profile),
             "fields": profile.to_dict()
         })
-        logger.log
+        get_profile_cache("user").invalidate(user_id)
         return jsonify({
             "user_id": user_id,
             "user_profile": profile.to_dict()
@@ -177,41 +159,21 @@ def update_user_profile(user_id: str, profile_data: UserProfile):
 def delete_user_profile(user_id):
     """
     
-    Deletes a user's profile and all related information (e.g., connections, spurs, conversations, etc.)
-        from persistant memory. 
+    Starts deletion of a user's profile and all related information (e.g., connections, spurs, conversations, etc.)
+        from persistant memory. The deletion runs as a background job (see services.account_deletion).
     
     Args:
         user_id: The user id corresponding to the data to be deleted. 
     
     Return:
-        str:    String indicating user's profile and other information has been deleted.
+        dict:    Deletion job summary, including job_id and status.
     
     """
     if not user_id:
         logger.error("Error: Missing user ID - delete user profile failed")
         raise ValueError("Error: Missing user ID - delete user profile failed")
     try:
-        user_ref = db.collection("users").document(user_id)
-
-        # Optional: Load and log profile before deletion
-        doc = user_ref.get()
-        if doc.exists:
-            profile_data = doc.to_dict().get("fields", {})
-            profile = UserProfile.from_dict(profile_data)
-            logger.info(f"Deleting user profile: {profile.to_dict()}")
-
-        def delete_subcollections(parent_ref, subcollection_names):
-            for name in subcollection_names:
-                sub_ref = parent_ref.collection(name)
-                docs = sub_ref.stream()
-                for doc in docs:
-                    doc.reference.delete()
-
-        delete_subcollections(user_ref, ["connections", "messages", "conversations"])
-
-        user_ref.delete()
-        auth.delete_user(user_id)
-        return {f"status" : "user profile successfully deleted"}
+        return start_account_deletion(user_id)
     except Exception as e:
         logger.error("[%s] Error: %s Delete user profile failed", __name__, e)
         raise ValueError(f"Delete user profile failed: {e}") from e
@@ -240,7 +202,8 @@ def update_spur_preferences(user_id: str, selected_spurs: list[str]) -> None:
         raise ValueError("Error: Missing spur preferences - update user spur preferences failed")
     
     try:
-        db.collection("users").document(user_id).update({ "selected_spurs": selected_spurs})
+        get_repository().update_user(user_id, { "selected_spurs": selected_spurs})
+        get_profile_cache("user").invalidate(user_id)
     except Exception as e:
         logger.error("[%s] Error: %s Update user spur preferences failed", __name__, e)
         raise ValueError(f"Update user spur preferences failed: {e}") from e
@@ -269,7 +232,7 @@ def get_selected_spurs(user_id: str) -> list:
 
     
     try:
-        return db.collection("users").document(user_id).update({ "selected_spurs": selected_spurs})
+        return get_repository().update_user(user_id, { "selected_spurs": selected_spurs})
     except Exception as e:
         logger.error("[%s] Error: %s Update user spur preferences failed", __name__, e)
         raise ValueError(f"Update user spur preferences failed: {e}") from e
\ No newline at end of file
@@ -25,7 +25,10 @@ setup(
             "pydeps>=1.10",       # for dep‑graph generation
             "pytest>=7.0",
             "flake8>=5.0",
-        ]
+        ],
+        "redis": [
+            "redis>=4.0",         # PROFILE_CACHE_SHARED="redis"
+        ],
     },
     entry_points={
         "console_scripts": [
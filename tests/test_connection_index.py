@@ -0,0 +1,84 @@
+"""
+Per-user connection index: kept current by index/unindex/set-active writes, and rebuilt from the
+connection documents when it is missing or in an old format.
+"""
+from flask import Flask
+from infrastructure.cache import set_shared_cache_backend
+from infrastructure.id_generator import get_null_connection_id
+from services import connection_index
+from services.connection_index import CONNECTION_INDEX, INDEX_FORMAT_VERSION
+from services.repository import InMemoryRepository, set_repository
+import pytest
+
+USER_ID = "u1"
+
+
+@pytest.fixture
+def repo():
+    app = Flask(__name__)
+    app.config.from_object("config.Config")
+    app.config["PROFILE_CACHE_UNSHARED_TTL"] = 300  # Cache the index, so stale reads would show
+    repository = InMemoryRepository()
+    set_repository(repository)
+    set_shared_cache_backend(None)
+    with app.app_context():
+        yield repository
+    set_repository(None)
+    set_shared_cache_backend(None)
+
+
+def _names(user_id: str = USER_ID) -> list:
+    return [entry["name"] for entry in connection_index.list_indexed_connections(user_id)]
+
+
+def test_missing_index_is_built_from_connection_documents(repo):
+    repo.set_connection(USER_ID, "p1", {"connection_id": "p1", "name": "Al", "age": 30, "bio": "not indexed"})
+    repo.set_connection(USER_ID, "p2", {"connection_id": "p2", "name": "Bo"})
+    repo.set_setting(USER_ID, "active_connection", {"connection_id": "p2"})
+
+    assert _names() == ["Al", "Bo"]
+    assert connection_index.get_active_connection_id(USER_ID) == "p2"
+    stored = repo.get_setting(USER_ID, CONNECTION_INDEX)
+    assert stored["format_version"] == INDEX_FORMAT_VERSION
+    assert stored["connections"]["p1"] == {"connection_id": "p1", "name": "Al", "age": 30, "last_used_at": None}
+
+
+def test_old_format_index_is_rebuilt(repo):
+    repo.set_connection(USER_ID, "p1", {"connection_id": "p1", "name": "Al"})
+    repo.set_setting(USER_ID, CONNECTION_INDEX, {"format_version": 0, "connections": {"gone": {"name": "Old"}}})
+
+    assert _names() == ["Al"]
+    assert connection_index.get_active_connection_id(USER_ID) == get_null_connection_id(USER_ID)
+
+
+def test_writes_update_the_cached_index(repo):
+    connection_index.index_connection(USER_ID, "p1", {"name": "Al", "age": 30})
+    connection_index.index_connection(USER_ID, "p2", {"name": "Bo"})
+    assert _names() == ["Al", "Bo"]
+
+    connection_index.index_connection(USER_ID, "p1", {"name": "Alan"})  # Partial update keeps the other fields
+    assert connection_index.list_indexed_connections(USER_ID)[0] == {"connection_id": "p1", "name": "Alan", "age": 30,
+                                                                     "last_used_at": None}
+
+    connection_index.set_indexed_active_connection(USER_ID, "p2")
+    assert connection_index.get_active_connection_id(USER_ID) == "p2"
+    assert _names() == ["Bo", "Alan"]  # Most recently used first
+
+    connection_index.unindex_connection(USER_ID, "p2")
+    assert _names() == ["Alan"]
+    assert connection_index.get_active_connection_id(USER_ID) == get_null_connection_id(USER_ID)
+
+
+def test_failed_update_drops_the_index_for_a_rebuild(repo, monkeypatch):
+    repo.set_connection(USER_ID, "p1", {"connection_id": "p1", "name": "Al"})
+    connection_index.index_connection(USER_ID, "p1", {"name": "Al"})
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(repo, "modify_setting", fail)
+    connection_index.index_connection(USER_ID, "p2", {"name": "Bo"})
+    monkeypatch.undo()
+
+    assert repo.get_setting(USER_ID, CONNECTION_INDEX) is None
+    assert _names() == ["Al"]
@@ -0,0 +1,82 @@
+from class_defs.conversation_def import Conversation
+from dataclasses import asdict
+from datetime import datetime, timezone
+from utils.conversation_codec import (
+    LazyMessages,
+    _segments,
+    append_encoded_messages,
+    decode_messages,
+    encode_for_storage,
+    encode_messages,
+    encoded_message_count,
+    expand_messages,
+)
+import json
+import pytest
+
+SENT_AT = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+MESSAGES = [
+    {"speaker": "user", "text": "hey", "sent_at": SENT_AT},
+    {"speaker": "connection", "text": "hi! 🙂"},
+    {"speaker": "user", "text": "", "edited": True},
+]
+
+
+@pytest.mark.parametrize("compress_min_bytes", [0, 1 << 20])
+def test_round_trip_keeps_missing_keys_and_datetimes(compress_min_bytes):
+    blob = encode_messages(MESSAGES, compress_min_bytes)
+
+    assert encoded_message_count(blob) == 3
+    assert decode_messages(blob) == MESSAGES
+
+
+def test_round_trip_of_empty_and_keyless_messages():
+    assert decode_messages(encode_messages([])) == []
+    assert decode_messages(encode_messages([{}, {}])) == [{}, {}]
+
+
+def test_naive_datetimes_are_stored_as_text():
+    naive = datetime(2024, 5, 1, 12, 30)
+    assert decode_messages(encode_messages([{"sent_at": naive}])) == [{"sent_at": naive.isoformat()}]
+
+
+def test_encode_for_storage_uses_the_blob_from_min_messages():
+    assert encode_for_storage(MESSAGES, 4, 2048) == MESSAGES
+    assert expand_messages(encode_for_storage(MESSAGES, 3, 2048)) == MESSAGES
+    assert encode_for_storage(MESSAGES, -1, 2048) == MESSAGES
+    assert expand_messages(None) == []
+
+
+def test_lazy_messages_decode_on_first_access():
+    lazy = LazyMessages(encode_messages(MESSAGES))
+
+    assert len(lazy) == 3 and lazy and not lazy.decoded
+    assert lazy[1]["text"] == "hi! 🙂" and lazy.decoded
+    assert lazy == MESSAGES
+
+
+def test_conversation_with_lazy_messages_serializes_to_json():
+    conversation = Conversation.from_dict({"user_id": "u1", "conversation_id": "u1:c1", "created_at": SENT_AT,
+                                           "conversation": encode_messages(MESSAGES[1:])})
+
+    assert isinstance(conversation.conversation, LazyMessages)
+    assert json.loads(json.dumps(asdict(conversation), default=str))["conversation"] == MESSAGES[1:]
+
+
+def test_appends_extend_the_last_segment_then_start_new_ones():
+    history = [{"speaker": "user", "text": f"m{i}"} for i in range(10)]
+    blob = encode_messages(history[:4])
+    for start in range(4, 10, 2):
+        blob = append_encoded_messages(blob, history[start:start + 2], compress_min_bytes=64, segment_max_messages=5)
+
+    assert encoded_message_count(blob) == 10
+    assert decode_messages(blob) == history
+    assert [encoded_message_count(segment) for segment in _segments(blob)] == [4, 4, 2]
+    assert expand_messages(blob) == list(LazyMessages(blob)) == history
+
+
+def test_append_within_one_segment_keeps_the_plain_columnar_format():
+    blob = append_encoded_messages(encode_messages(MESSAGES[:1]), MESSAGES[1:])
+
+    assert len(_segments(blob)) == 1
+    assert decode_messages(blob) == MESSAGES
@@ -0,0 +1,68 @@
+"""
+Signed pagination cursors: a cursor round-trips its position and is rejected when forged,
+tampered with, or replayed by another user, for other filters or in another scope.
+"""
+from datetime import datetime, timezone
+from flask import Flask
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, parse_page_size
+import pytest
+
+USER_ID = "u1"
+FILTERS = {"connection_id": "u1:p1", "date_from": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY="test-secret", DEFAULT_PAGE_SIZE=20, MAX_PAGE_SIZE=100)
+    with app.app_context():
+        yield app
+
+
+def test_position_round_trips_including_datetimes():
+    position = {"created_at": datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc), "id": "c9", "page": 2}
+    token = encode_cursor("conversations", USER_ID, FILTERS, position)
+
+    decoded = decode_cursor("conversations", token, USER_ID, dict(FILTERS))
+    assert decoded == position
+    assert isinstance(decoded["created_at"], datetime)
+
+
+def test_tampered_cursor_is_rejected():
+    token = encode_cursor("conversations", USER_ID, FILTERS, {"page": 1})
+    payload, signature = token.rsplit(".", 1)
+    tampered = payload[:-1] + ("A" if payload[-1] != "A" else "B") + "." + signature
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("conversations", tampered, USER_ID, FILTERS)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("conversations", "not-a-cursor", USER_ID, FILTERS)
+
+
+def test_cursor_signed_with_another_key_is_rejected(app_context):
+    token = encode_cursor("conversations", USER_ID, FILTERS, {"page": 1})
+    app_context.config["SECRET_KEY"] = "another-secret"
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("conversations", token, USER_ID, FILTERS)
+
+
+def test_cursor_is_bound_to_user_filters_and_scope():
+    token = encode_cursor("conversations", USER_ID, FILTERS, {"page": 1})
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("conversations", token, "u2", FILTERS)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("conversations", token, USER_ID, {**FILTERS, "connection_id": "u1:p2"})
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("conversations", token, USER_ID, None)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("spurs", token, USER_ID, FILTERS)
+
+
+def test_page_size_is_clamped():
+    assert parse_page_size(None) == 20
+    assert parse_page_size("500") == 100
+    assert parse_page_size("0") == 1
+    with pytest.raises(ValueError):
+        parse_page_size("many")
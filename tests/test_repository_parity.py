@@ -0,0 +1,187 @@
+"""
+InMemoryRepository and SQLiteRepository claim the same semantics; these tests run both through
+the same operations and expect the same results.
+"""
+from datetime import datetime, timedelta, timezone
+from services.repository import DocumentNotFoundError, InMemoryRepository, SQLiteRepository, _LocalRepository
+from utils.conversation_codec import decode_messages, encode_messages
+import pytest
+
+USER_ID = "u1"
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repo(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryRepository()
+    return SQLiteRepository(str(tmp_path / "repo.db"))
+
+
+def _conversation(i: int, **extra) -> dict:
+    return {
+        "user_id": USER_ID,
+        "conversation_id": f"{USER_ID}:c{i}",
+        "connection_id": f"{USER_ID}:p{i % 2}",
+        "conversation": [{"speaker": "user", "text": f"message {i}"}],
+        "created_at": START + timedelta(minutes=i),
+        **extra,
+    }
+
+
+def test_get_returns_a_copy_with_types_intact(repo):
+    data = {"name": "Al", "age": 30, "created_at": START, "blob": b"\x00\x01", "tags": ["a", "b"]}
+    repo.set_connection(USER_ID, "p1", data)
+
+    stored = repo.get_connection(USER_ID, "p1")
+    assert stored == data
+    stored["tags"].append("c")
+    assert repo.get_connection(USER_ID, "p1")["tags"] == ["a", "b"]
+    assert repo.get_connection(USER_ID, "missing") is None
+
+
+def test_update_merges_fields_and_rejects_missing_documents(repo):
+    repo.set_user(USER_ID, {"user_id": USER_ID, "fields": {"name": "Sam", "age": 29}})
+    repo.update_user(USER_ID, {"fields.age": 30, "plan": "free"})
+
+    assert repo.get_user(USER_ID) == {"user_id": USER_ID, "fields": {"name": "Sam", "age": 30}, "plan": "free"}
+    with pytest.raises(DocumentNotFoundError):
+        repo.update_connection(USER_ID, "missing", {"name": "x"})
+
+
+def test_list_conversations_pages_by_created_at_then_id(repo):
+    for i in range(7):
+        repo.save_conversation(USER_ID, f"{USER_ID}:c{i}", _conversation(i))
+    # Same created_at as c3: ordered by id after it
+    repo.save_conversation(USER_ID, f"{USER_ID}:c3b", _conversation(3, conversation_id=f"{USER_ID}:c3b"))
+
+    seen, start_after = [], None
+    while True:
+        page = repo.list_conversations(USER_ID, descending=False, start_after=start_after, limit=3)
+        seen += [doc.id for doc in page]
+        if len(page) < 3:
+            break
+        start_after = (page[-1].data["created_at"], page[-1].id)
+    assert seen == [f"{USER_ID}:c{i}" for i in ["0", "1", "2", "3", "3b", "4", "5", "6"]]
+
+    newest = repo.list_conversations(USER_ID, limit=2)
+    assert [doc.id for doc in newest] == [f"{USER_ID}:c6", f"{USER_ID}:c5"]
+    filtered = repo.list_conversations(USER_ID, connection_id=f"{USER_ID}:p1", descending=False,
+                                       date_from=START + timedelta(minutes=2), limit=10)
+    assert [doc.id for doc in filtered] == [f"{USER_ID}:c3", f"{USER_ID}:c3b", f"{USER_ID}:c5"]
+
+
+def test_list_connections_pages_by_id(repo):
+    for name in ["p3", "p1", "p4", "p2", "p0"]:
+        repo.set_connection(USER_ID, name, {"name": name})
+
+    seen, start_after = [], None
+    while True:
+        page = repo.list_connections(USER_ID, start_after=start_after, limit=2)
+        seen += [doc.id for doc in page]
+        if len(page) < 2:
+            break
+        start_after = (page[-1].data.get("created_at"), page[-1].id)
+    assert seen == ["p0", "p1", "p2", "p3", "p4"]
+    assert [doc.id for doc in repo.list_connections(USER_ID)] == seen
+
+
+def test_projection_omits_missing_and_null_fields(repo):
+    repo.save_conversation(USER_ID, "c1", _conversation(1, preview="hi", situation=None))
+    repo.save_conversation(USER_ID, "c2", _conversation(2))
+
+    docs = repo.list_conversations(USER_ID, descending=False, fields=["preview", "situation", "created_at"])
+    assert [doc.data for doc in docs] == [{"preview": "hi", "created_at": START + timedelta(minutes=1)},
+                                          {"created_at": START + timedelta(minutes=2)}]
+    batch = repo.get_conversations(USER_ID, ["c2", "missing", "c1"], fields=["preview"])
+    assert batch == {"c1": {"preview": "hi"}, "c2": {}}
+
+
+def test_modify_conversation_reads_and_writes_atomically(repo):
+    repo.save_conversation(USER_ID, "c1", _conversation(1, message_count=1))
+
+    written = repo.modify_conversation(USER_ID, "c1", lambda data: ({"message_count": data["message_count"] + 2}, None))
+    assert written == {"message_count": 3}
+    assert repo.get_conversation(USER_ID, "c1")["message_count"] == 3
+    with pytest.raises(DocumentNotFoundError):
+        repo.modify_conversation(USER_ID, "missing", lambda data: ({}, None))
+
+
+def test_modify_setting_creates_and_skips(repo):
+    assert repo.modify_setting(USER_ID, "s", lambda current: {"n": 1} if current is None else None) == {"n": 1}
+    assert repo.modify_setting(USER_ID, "s", lambda current: None) is None
+    assert repo.get_setting(USER_ID, "s") == {"n": 1}
+
+
+def test_get_training_records_returns_existing_records(repo):
+    repo.set_training_record("few_shot_examples", "e1", {"text": "hi", "created_at": START})
+    repo.set_training_record("few_shot_examples", "e2", {"text": "hey"})
+
+    records = repo.get_training_records("few_shot_examples", ["e1", "missing", "e1"])
+    assert records == {"e1": {"text": "hi", "created_at": START}}
+    assert repo.get_training_records("few_shot_examples", []) == {}
+
+
+def test_item_traits_are_stored_under_the_user(repo):
+    repo.set_item_traits(USER_ID, "img_a", {"personality_traits": [{"personality_trait": "calm"}], "created_at": START})
+    repo.set_item_traits(USER_ID, "img_b", {"personality_traits": []})
+    repo.set_item_traits("u2", "img_a", {"personality_traits": []})
+
+    records = repo.get_item_traits(USER_ID, ["img_a", "missing", "img_a"])
+    assert records == {"img_a": {"personality_traits": [{"personality_trait": "calm"}], "created_at": START}}
+    assert repo.get_item_traits(USER_ID, []) == {}
+    assert repo.list_user_collections(USER_ID) == ["item_traits"]
+
+    repo.delete_item_traits(USER_ID, ["img_a", "missing"])
+    assert list(repo.get_item_traits(USER_ID, ["img_a", "img_b"])) == ["img_b"]
+    assert list(repo.get_item_traits("u2", ["img_a"])) == ["img_a"]
+
+
+def test_modify_connection_updates_only_existing_connections(repo):
+    repo.set_connection(USER_ID, "p1", {"name": "Al", "traits_status": "pending"})
+
+    written = repo.modify_connection(USER_ID, "p1", lambda current: {"traits_status": "complete"}
+                                     if current["traits_status"] == "pending" else None)
+    assert written == {"traits_status": "complete"}
+    assert repo.get_connection(USER_ID, "p1") == {"name": "Al", "traits_status": "complete"}
+    assert repo.modify_connection(USER_ID, "p1", lambda current: {"traits_status": "failed"}
+                                  if current["traits_status"] == "pending" else None) is None
+    assert repo.modify_connection(USER_ID, "missing", lambda current: {"name": "x"}) is None
+    assert repo.get_connection(USER_ID, "missing") is None
+
+
+def test_delete_user_documents_counts_progress_on_the_job(repo):
+    repo.set_deletion_job("j1", {"job_id": "j1", "user_id": USER_ID, "status": "running", "deleted": {}, "total_deleted": 0})
+    for i in range(5):
+        repo.set_connection(USER_ID, f"p{i}", {"name": f"p{i}"})
+    repo.set_setting(USER_ID, "active_connection", {"connection_id": "p1"})
+    repo.set_connection("u2", "p0", {"name": "other"})
+
+    assert repo.list_user_collections(USER_ID) == ["connections", "settings"]
+    assert len(repo.delete_user_documents(USER_ID, "connections", 3, "j1")) == 3
+    assert len(repo.delete_user_documents(USER_ID, "connections", 3, "j1")) == 2
+    assert repo.delete_user_documents(USER_ID, "connections", 3, "j1") == []
+    job = repo.get_deletion_job("j1")
+    assert (job["phase"], job["deleted"], job["total_deleted"]) == ("connections", {"connections": 5}, 5)
+    assert repo.list_user_collections(USER_ID) == ["settings"]
+    assert [doc.id for doc in repo.list_connections("u2")] == ["p0"]
+
+    repo.update_deletion_job("j1", {"status": "completed"})
+    assert repo.list_deletion_jobs(user_id=USER_ID, statuses=["queued", "running"]) == []
+    assert [job["job_id"] for job in repo.list_deletion_jobs(statuses=["completed"])] == ["j1"]
+
+
+def test_encoded_messages_survive_storage(repo):
+    messages = [{"speaker": "user", "text": "hi " * 50, "sent_at": START}] * 40
+    repo.save_conversation(USER_ID, "c1", _conversation(1, conversation=encode_messages(messages, 256)))
+
+    assert decode_messages(bytes(repo.get_conversation(USER_ID, "c1")["conversation"])) == messages
+
+
+def test_backend_missing_a_primitive_fails_at_instantiation():
+    class Partial(_LocalRepository):
+        def _get(self, collection, owner, doc_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,45 @@
+"""
+SQLiteSearchBackend: keyword search scoped to one user, with prefix matching on the last term.
+"""
+from services.search_backend import SQLiteSearchBackend
+import pytest
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteSearchBackend(str(tmp_path / "search.db"))
+
+
+def _record(object_id: str, user_id: str, text: str, created_at: int = 0, **extra) -> dict:
+    return {"objectID": object_id, "user_id": user_id, "text": text, "created_at_timestamp": created_at, **extra}
+
+
+def test_long_prefix_is_not_crowded_out_by_other_users_words(backend):
+    backend.save_objects("conv", [_record(f"theirs{i}", "other", f"restaurant{i}") for i in range(20)])
+    backend.save_objects("conv", [_record("mine", "me", "restaurantzz tonight")])
+
+    for prefix in ["res", "rest", "restau", "restaurant", "restaurantz"]:
+        assert backend.search("conv", prefix, "me")["hits"] == ["mine"], prefix
+    assert backend.search("conv", "restaurantx", "me")["hits"] == []
+
+
+def test_search_is_scoped_to_the_user_and_filters(backend):
+    backend.save_objects("conv", [
+        _record("a", "me", "dinner plans", 100, connection_id="p1"),
+        _record("b", "me", "dinner again", 200, connection_id="p2"),
+        _record("c", "other", "dinner for them", 300, connection_id="p1"),
+    ])
+
+    assert sorted(backend.search("conv", "dinner", "me")["hits"]) == ["a", "b"]
+    assert backend.search("conv", "dinner", "me", {"connection_id": "p1"})["hits"] == ["a"]
+    assert backend.search("conv", "dinner", "me", {"created_at_from": 150})["hits"] == ["b"]
+    assert backend.search("conv", "", "me")["hits"] == []
+
+
+def test_append_and_delete_update_the_index(backend):
+    backend.save_objects("conv", [_record("a", "me", "hello")])
+    backend.append_text("conv", [{"objectID": "a", "text": "see you at the museum"}])
+    assert backend.search("conv", "museum", "me")["hits"] == ["a"]
+
+    backend.delete_objects("conv", ["a"])
+    assert backend.search("conv", "hello", "me")["hits"] == []
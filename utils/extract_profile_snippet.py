@@ -1,5 +1,102 @@
-import numpy as np
+from infrastructure.logger import get_logger
+from typing import Any, Union
+import re
 
-def extract_profile_snippet(image: np.ndarray) -> dict:
-    # TODO: implement snippet parsing
-    return {}
\ No newline at end of file
+logger = get_logger(__name__)
+
+# Profile labels that map onto BaseProfile fields
+PROFILE_FIELD_LABELS = {
+    "job": "job", "occupation": "job", "work": "job", "works at": "job",
+    "school": "school", "education": "school", "studied at": "school",
+    "hometown": "hometown", "from": "hometown",
+    "location": "current_city", "lives in": "current_city", "current city": "current_city",
+    "looking for": "looking_for", "what i'm looking for": "looking_for",
+    "drinking": "drinking", "drinks": "drinking",
+    "pronouns": "pronouns",
+    "gender": "gender",
+    "ethnicity": "ethnicity",
+    "age": "age",
+}
+
+# Section headings/prompts that carry free text
+SECTION_HEADINGS = [
+    r"about me", r"bio", r"my self-summary", r"interests", r"my interests", r"prompt",
+    r"my simple pleasures", r"two truths and a lie", r"i'm looking for", r"ideal first date",
+    r"a perfect day", r"my most irrational fear", r"together we could", r"i geek out on",
+]
+COMPILED_SECTION_HEADINGS = [re.compile(rf"^\s*{p}\s*:?\s*$", re.IGNORECASE) for p in SECTION_HEADINGS]
+LABEL_VALUE_PATTERN = re.compile(
+    r"^\s*(" + "|".join(re.escape(label) for label in sorted(PROFILE_FIELD_LABELS, key=len, reverse=True)) + r")\s*[:\-]\s*(.+)$",
+    re.IGNORECASE,
+)
+NOISE_PATTERN = re.compile(r"^\s*(\W{0,2}|\d{1,2}:\d{2}\s*(AM|PM)?|Like|Pass|Send|Message|Report|Block)\s*$", re.IGNORECASE)
+
+
+def extract_profile_snippet(annotation: Union[Any, str]) -> dict:
+    """
+    Parses OCR text from a dating-profile screenshot into sections and profile fields.
+
+    Args:
+        annotation: Vision full_text_annotation (anything with a .text attribute) or plain text.
+
+    Returns:
+        dict: {
+            "text": cleaned text of the snippet,
+            "sections": [{"heading": str, "text": str}, ...],
+            "fields": {BaseProfile field name: value, ...}
+        }
+    """
+    try:
+        raw_text = annotation if isinstance(annotation, str) else getattr(annotation, "text", "") or ""
+        lines = [line.strip() for line in raw_text.splitlines()]
+        lines = [line for line in lines if line and not NOISE_PATTERN.fullmatch(line)]
+
+        sections = []
+        fields = {}
+        current = None
+        for line in lines:
+            label_match = LABEL_VALUE_PATTERN.match(line)
+            if label_match:
+                field_name = PROFILE_FIELD_LABELS[label_match.group(1).lower()]
+                value = label_match.group(2).strip()
+                if field_name == "age":
+                    age_digits = re.search(r"\d{2}", value)
+                    if not age_digits:
+                        continue
+                    value = int(age_digits.group())
+                fields.setdefault(field_name, value)
+                current = None
+                continue
+
+            heading = line.rstrip(":").strip()
+            is_heading = any(p.fullmatch(line) for p in COMPILED_SECTION_HEADINGS) or (
+                len(heading.split()) <= 8 and (line.endswith(":") or line.endswith("?"))
+            )
+            if is_heading:
+                current = {"heading": heading, "text": ""}
+                sections.append(current)
+                field_name = PROFILE_FIELD_LABELS.get(heading.lower())
+                if field_name:
+                    current["field"] = field_name
+                continue
+
+            if current is None:
+                current = {"heading": "", "text": ""}
+                sections.append(current)
+            current["text"] = f"{current['text']} {line}".strip()
+
+        for section in sections:
+            field_name = section.pop("field", None)
+            if field_name and section["text"] and field_name != "age":
+                fields.setdefault(field_name, section["text"])
+
+        sections = [section for section in sections if section["text"]]
+        return {
+            "text": "\n".join(lines),
+            "sections": sections,
+            "fields": fields,
+        }
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: %s", err_point, e)
+        raise e
@@ -1,4 +1,4 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from functools import wraps
 from infrastructure.logger import get_logger
 from .moderation import moderate_topic
@@ -83,4 +83,22 @@ def enrich_context(f):
         
         return f(*args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def limit_upload_size(config_key: str):
+    """
+    Rejects requests whose body exceeds current_app.config[config_key] before the body is
+    read. The declared Content-Length is checked up front; request.max_content_length also
+    stops bodies without a declared length (chunked uploads) while they are being parsed.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            max_bytes = current_app.config[config_key]
+            request.max_content_length = max_bytes
+            if request.content_length is not None and request.content_length > max_bytes:
+                logger.error("Request body too large: %d bytes. Limit is %d bytes.", request.content_length, max_bytes)
+                return jsonify({"error": f"Upload exceeds limit of {max_bytes // (1024*1024)}MB"}), 413
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
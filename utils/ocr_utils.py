@@ -81,6 +81,114 @@ def crop_top_bottom_cv(img: np.ndarray) -> Union[np.ndarray, None]:
 
     return cropped_image
 
+# Tuning values for crop_chat_region_cv. Screenshots are normalized to grayscale 0-255.
+CHAT_BG_TOLERANCE = 12              # Max intensity difference for a pixel to count as background
+CHAT_MIN_BG_FRACTION = 0.08         # Rows with less background than this are UI chrome (bars, keyboard)
+CHAT_DIVIDER_UNIFORMITY = 0.92      # Fraction of a row that must share one intensity to be a divider line
+CHAT_MAX_TOP_CHROME = 0.25          # Header/status bar search region (fraction of height)
+CHAT_MAX_BOTTOM_CHROME = 0.50       # Input bar/keyboard search region (fraction of height)
+CHAT_MIN_CONTENT_FRACTION = 0.30    # Fall back to the fixed crop if less than this much height remains
+CHAT_EDGE_THRESHOLD = 24            # Horizontal gradient needed for a pixel to count as an edge
+CHAT_CROP_PADDING = 4               # Pixels kept around the detected region
+
+def find_chat_region_bounds(gray: np.ndarray) -> Union[tuple[int, int, int, int], None]:
+    """
+    Locates the message area of a messaging screenshot from row/column projection profiles.
+
+    The background intensity is sampled from the middle band of the screenshot. Rows whose
+    background fraction collapses (status bar, header, input bar, keyboard) or which are
+    full-width divider lines mark the UI chrome above and below the messages. Columns are
+    trimmed symmetrically so the horizontal center, used for speaker assignment in
+    extract_conversation, does not move.
+
+    Args:
+        gray (np.ndarray): Grayscale image as a 2D uint8 array.
+
+    Returns:
+        Union[tuple[int, int, int, int], None]: (top, bottom, left, right) bounds, with bottom
+            and right exclusive, or None if no plausible message region was found.
+    """
+    height, width = gray.shape[:2]
+    if height < 32 or width < 32:
+        return None
+
+    pixels = gray.astype(np.int16)
+
+    # Background is the most common intensity in the middle band, where messages live.
+    middle_band = pixels[int(height * 0.35):int(height * 0.65)]
+    background = int(np.argmax(np.bincount(middle_band.ravel(), minlength=256)))
+    is_background = np.abs(pixels - background) <= CHAT_BG_TOLERANCE
+
+    # Row profiles
+    row_bg_fraction = is_background.mean(axis=1)
+    row_median = np.median(pixels, axis=1)
+    row_uniformity = (np.abs(pixels - row_median[:, None]) <= CHAT_BG_TOLERANCE // 2).mean(axis=1)
+    is_divider = (row_uniformity >= CHAT_DIVIDER_UNIFORMITY) & (np.abs(row_median - background) > CHAT_BG_TOLERANCE)
+    is_chrome = (row_bg_fraction < CHAT_MIN_BG_FRACTION) | is_divider
+
+    # --- Top: header and status bar ---
+    top_limit = int(height * CHAT_MAX_TOP_CHROME)
+    top_content = np.flatnonzero(~is_chrome[:top_limit])
+    top = int(top_content[0]) if top_content.size else top_limit  # End of the contiguous chrome prefix
+    top_dividers = np.flatnonzero(is_divider[:top_limit])
+    if top_dividers.size:
+        top = max(top, int(top_dividers[-1]) + 1)
+
+    # --- Bottom: input bar and keyboard ---
+    bottom_start = int(height * (1 - CHAT_MAX_BOTTOM_CHROME))
+    bottom_content = np.flatnonzero(~is_chrome[bottom_start:])
+    bottom = bottom_start + (int(bottom_content[-1]) + 1 if bottom_content.size else 0)  # Start of the contiguous chrome suffix
+    bottom_dividers = np.flatnonzero(is_divider[bottom_start:])
+    if bottom_dividers.size:
+        bottom = min(bottom, bottom_start + int(bottom_dividers[0]))
+
+    if bottom - top < height * CHAT_MIN_CONTENT_FRACTION:
+        return None
+
+    # --- Columns: trim empty side margins by edge density, symmetrically ---
+    region = pixels[top:bottom]
+    edges = np.abs(np.diff(region, axis=1)) > CHAT_EDGE_THRESHOLD
+    column_has_edges = np.zeros(width, dtype=bool)
+    column_has_edges[1:] = edges.any(axis=0)
+    edge_columns = np.flatnonzero(column_has_edges)
+    margin = 0
+    if edge_columns.size:
+        margin = max(0, min(int(edge_columns[0]), width - 1 - int(edge_columns[-1])) - CHAT_CROP_PADDING)
+
+    top = max(0, top - CHAT_CROP_PADDING)
+    bottom = min(height, bottom + CHAT_CROP_PADDING)
+    return top, bottom, margin, width - margin
+
+def crop_chat_region_cv(img: np.ndarray) -> Union[np.ndarray, None]:
+    """
+    Crops a messaging screenshot down to its message area, removing the status bar, header,
+    input bar, and keyboard. Falls back to crop_top_bottom_cv when no region is detected.
+
+    Args:
+        img (np.ndarray): A NumPy array containing the image content (BGR or grayscale).
+
+    Returns:
+        Union[np.ndarray, None]: Cropped image or None if crop is invalid.
+    """
+    if img is None:
+        raise ValueError("Unable to open image.")
+
+    if img.ndim == 3:
+        # Integer BT.601 luma, avoids a float copy of the full frame
+        b, g, r = img[..., 0].astype(np.uint16), img[..., 1].astype(np.uint16), img[..., 2].astype(np.uint16)
+        gray = ((r * 77 + g * 150 + b * 29) >> 8).astype(np.uint8)
+    else:
+        gray = img
+
+    bounds = find_chat_region_bounds(gray)
+    if bounds is None:
+        logger.info("Chat region not detected; using fixed top/bottom crop.")
+        return crop_top_bottom_cv(img)
+
+    top, bottom, left, right = bounds
+    logger.debug("Chat region crop: rows %d-%d, cols %d-%d of %dx%d", top, bottom, left, right, img.shape[1], img.shape[0])
+    return img[top:bottom, left:right]
+
 def extract_conversation(user_id: str, page: Any, confidence_threshold: float = 0.80) -> list[dict]:
     """
     Extracts structured conversation text from a single Vision API page object.
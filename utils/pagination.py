@@ -0,0 +1,120 @@
+from datetime import datetime
+from flask import current_app
+from infrastructure.logger import get_logger
+from itsdangerous import BadSignature, URLSafeSerializer
+import hashlib
+import json
+
+logger = get_logger(__name__)
+
+DATETIME_TAG = "$dt"
+LIST_VIEWS = ("full", "summary")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed, tampered with, or used with different filters."""
+
+
+def _serializer(scope: str) -> URLSafeSerializer:
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=f"cursor:{scope}")
+
+
+def _fingerprint(user_id: str, filters: dict | None) -> str:
+    """ Short hash of the user and query filters a cursor belongs to. """
+    canonical = json.dumps({"user_id": user_id, "filters": filters or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(scope: str, user_id: str, filters: dict | None, position: dict) -> str:
+    """
+    Builds an opaque, signed cursor token.
+
+    Args
+        scope: what is being paged (e.g. "conversations"); cursors are not valid across scopes
+            str
+        user_id: owner of the listing
+            str
+        filters: query filters the cursor is valid for
+            dict
+        position: where the next page starts (JSON-serializable values and datetimes)
+            dict
+    Return
+        URL-safe cursor token
+            str
+    """
+    position = {k: {DATETIME_TAG: v.isoformat()} if isinstance(v, datetime) else v for k, v in position.items()}
+    return _serializer(scope).dumps({"f": _fingerprint(user_id, filters), "p": position})
+
+
+def decode_cursor(scope: str, token: str, user_id: str, filters: dict | None) -> dict:
+    """
+    Verifies a cursor token and returns its position.
+
+    Args
+        scope: what is being paged; must match the scope used by encode_cursor
+            str
+        token: cursor from a previous response
+            str
+        user_id: owner of the listing
+            str
+        filters: query filters of the current request
+            dict
+    Return
+        position stored in the cursor
+            dict
+    Raises
+        InvalidCursorError: bad signature, or the cursor belongs to another user/query
+    """
+    try:
+        data = _serializer(scope).loads(token)
+    except BadSignature as e:
+        logger.error("[%s] Error: invalid %s cursor", __name__, scope)
+        raise InvalidCursorError("Invalid cursor") from e
+    if not isinstance(data, dict) or data.get("f") != _fingerprint(user_id, filters):
+        raise InvalidCursorError("Cursor does not match this query")
+    position = data.get("p") or {}
+    # Datetimes come back as datetimes so they compare like the stored field values
+    return {k: datetime.fromisoformat(v[DATETIME_TAG]) if isinstance(v, dict) and DATETIME_TAG in v else v
+            for k, v in position.items()}
+
+
+def parse_list_view(value) -> str:
+    """
+    Parses a list "view" request argument: "full" (whole documents, the default) or "summary"
+    (display fields only).
+
+    Args
+        value: raw "view" argument (may be None)
+            str | None
+    Return
+        list view
+            str
+    """
+    if value in (None, ""):
+        return "full"
+    if value not in LIST_VIEWS:
+        raise ValueError(f"Invalid view: {value}")
+    return value
+
+
+def parse_page_size(value, default: int | None = None) -> int:
+    """
+    Parses a page size request argument, clamped to [1, MAX_PAGE_SIZE].
+
+    Args
+        value: raw "limit" argument (may be None)
+            str | int | None
+        default: page size when value is missing; defaults to DEFAULT_PAGE_SIZE
+            int
+    Return
+        page size
+            int
+    """
+    max_page_size = int(current_app.config.get('MAX_PAGE_SIZE', 100))
+    default = default or int(current_app.config.get('DEFAULT_PAGE_SIZE', 20))
+    if value in (None, ""):
+        return min(default, max_page_size)
+    try:
+        return max(1, min(int(value), max_page_size))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page size: {value}") from e
@@ -1,22 +1,144 @@
+import asyncio
 import base64
+import httpx
 import requests
-import logging
+import threading
+import time
+from flask import current_app
+from infrastructure.image_pool import run_image_task
+from infrastructure.logger import get_logger
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-MODEL_AI_ENDPOINT_URL = 'https://your-model-endpoint'
+logger = get_logger(__name__)
 
-def forward_full_image_to_model(image_bytes: bytes) -> dict:
-	payload = {'image_base64': base64.b64encode(image_bytes).decode('utf-8')}
+DEFAULT_MODEL_AI_ENDPOINT_URL = 'https://your-model-endpoint'
+
+# Long-lived clients: connections are kept alive and reused across requests
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_async_client: httpx.AsyncClient | None = None
+
+
+def _settings() -> dict:
+	config = current_app.config
+	return {
+		"url": config.get('PHOTO_MODEL_ENDPOINT_URL', DEFAULT_MODEL_AI_ENDPOINT_URL),
+		"connect_timeout": config.get('PHOTO_MODEL_CONNECT_TIMEOUT', 3.0),
+		"read_timeout": config.get('PHOTO_MODEL_READ_TIMEOUT', 20.0),
+		"pool_size": config.get('PHOTO_MODEL_POOL_SIZE', 10),
+		"max_side": config.get('PHOTO_MODEL_MAX_SIDE', 1024),
+		"jpeg_quality": config.get('PHOTO_MODEL_JPEG_QUALITY', 85),
+	}
+
+
+def get_photo_model_session(pool_size: int = 10) -> requests.Session:
+	"""
+	Returns the shared requests.Session for the photo model endpoint, creating it on first use.
+	POST is retried on connection errors and 5xx responses; the endpoint is read-only inference.
+	"""
+	global _session
+	if _session is None:
+		with _session_lock:
+			if _session is None:
+				session = requests.Session()
+				retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504], allowed_methods=frozenset(['POST']))
+				adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+				session.mount('http://', adapter)
+				session.mount('https://', adapter)
+				_session = session
+	return _session
+
+
+def get_photo_model_async_client(settings: dict) -> httpx.AsyncClient:
+	"""
+	Returns the shared httpx.AsyncClient for the photo model endpoint. The client is bound to
+	the event loop it is first used on; call close_photo_model_clients() before switching loops.
+	"""
+	global _async_client
+	if _async_client is None:
+		_async_client = httpx.AsyncClient(
+			timeout=httpx.Timeout(settings["read_timeout"], connect=settings["connect_timeout"]),
+			limits=httpx.Limits(max_connections=settings["pool_size"], max_keepalive_connections=settings["pool_size"]),
+			transport=httpx.AsyncHTTPTransport(retries=2),  # Retries connection failures only
+		)
+	return _async_client
+
+
+async def close_photo_model_clients():
+	""" Closes the shared HTTP clients (e.g. at shutdown or in load-test teardown). """
+	global _session, _async_client
+	if _async_client is not None:
+		await _async_client.aclose()
+		_async_client = None
+	if _session is not None:
+		_session.close()
+		_session = None
+
+
+def build_photo_payload(image_bytes, settings: dict) -> dict:
+	"""
+	Downscales the image (in the image pool) so its longest side is at most PHOTO_MODEL_MAX_SIDE,
+	re-encodes it as JPEG, and wraps it in the endpoint's JSON payload.
+	"""
+	downscaled = run_image_task("downscale", image_bytes, max_side=settings["max_side"], jpeg_quality=settings["jpeg_quality"])
+	if downscaled is None:
+		logger.warning("Could not decode image for downscaling; forwarding original bytes.")
+		downscaled = bytes(image_bytes)
+	logger.debug("Photo payload: %d bytes -> %d bytes", len(image_bytes), len(downscaled))
+	return {'image_base64': base64.b64encode(downscaled).decode('utf-8')}
+
+
+def forward_full_image_to_model(image_bytes) -> dict:
+	"""
+	Sends a photo to the photo model endpoint over the pooled keep-alive session.
+
+	Args
+		image_bytes: encoded image
+			bytes | memoryview
+	Return
+		JSON response of the model endpoint
+			dict
+	"""
+	settings = _settings()
+	payload = build_photo_payload(image_bytes, settings)
+	started = time.perf_counter()
 	try:
-		session = requests.Session()
-		retry = Retry(total=3, backoff_factor=2, status_forcelist=[500, 502, 503, 504])
-		adapter = HTTPAdapter(max_retries=retry)
-		session.mount('http://', adapter)
-		session.mount('https://', adapter)
-		resp = session.post(MODEL_AI_ENDPOINT_URL, json=payload)
+		session = get_photo_model_session(settings["pool_size"])
+		resp = session.post(settings["url"], json=payload, timeout=(settings["connect_timeout"], settings["read_timeout"]))
 		resp.raise_for_status()
 		return resp.json()
 	except requests.exceptions.RequestException as e:
-		logging.getLogger(__name__).error("Error forwarding image to model: %s", e)
-		raise
\ No newline at end of file
+		logger.error("Error forwarding image to model: %s", e)
+		raise
+	finally:
+		logger.info("Photo model call took %.1fms", (time.perf_counter() - started) * 1000)
+
+
+async def forward_full_image_to_model_async(image_bytes, settings: dict | None = None) -> dict:
+	"""
+	Async variant of forward_full_image_to_model using the shared httpx.AsyncClient.
+
+	Args
+		image_bytes: encoded image
+			bytes | memoryview
+		settings: endpoint settings; read from the Flask config when omitted
+			dict
+	Return
+		JSON response of the model endpoint
+			dict
+	"""
+	settings = settings or _settings()
+	# Downscaling waits on the image pool, so keep it off the event loop
+	payload = await asyncio.to_thread(build_photo_payload, image_bytes, settings)
+	started = time.perf_counter()
+	try:
+		client = get_photo_model_async_client(settings)
+		resp = await client.post(settings["url"], json=payload)
+		resp.raise_for_status()
+		return resp.json()
+	except httpx.HTTPError as e:
+		logger.error("Error forwarding image to model: %s", e)
+		raise
+	finally:
+		logger.info("Photo model call took %.1fms", (time.perf_counter() - started) * 1000)
@@ -0,0 +1,70 @@
+"""
+Profile text for prompts and display, rendered by a formatter compiled once per profile dataclass.
+
+Compiling resolves which fields are rendered and their labels up front, so rendering is one
+pass over the profile's values with no dataclasses.fields() reflection. The layout is compact:
+one "Label: value" line per non-empty field, lists joined by ", ", and no ids or bookkeeping
+fields.
+
+Rendered text is not memoized: a compiled render costs about as much as building a key to look
+it up, and a memo would keep profile contents in memory after the request is done.
+"""
+from dataclasses import fields
+import threading
+
+# Fields that are ids or bookkeeping rather than something about the person
+SKIPPED_FIELDS = {"user_id", "connection_id", "selected_spurs", "traits_status"}
+FIELD_LABELS = {
+    "greenlights": "Greenlight Topics",
+    "redlights": "Redlight Topics",
+    "personality_traits": "Personality Traits",
+}
+
+_formatters: dict[type, tuple] = {}
+_formatters_lock = threading.Lock()
+
+
+def compile_profile_formatter(profile_cls: type) -> tuple:
+    """
+    Returns the (field name, label) pairs rendered for a profile dataclass, computed once per class.
+
+    Args
+        profile_cls: profile dataclass, e.g. UserProfile or ConnectionProfile
+            type
+    Return
+        rendered fields in declaration order
+            tuple[tuple[str, str], ...]
+    """
+    compiled = _formatters.get(profile_cls)
+    if compiled is None:
+        compiled = tuple(
+            (field.name, FIELD_LABELS.get(field.name, field.name.replace("_", " ").capitalize()))
+            for field in fields(profile_cls) if field.name not in SKIPPED_FIELDS
+        )
+        with _formatters_lock:
+            _formatters[profile_cls] = compiled
+    return compiled
+
+
+def render_profile_text(profile) -> str:
+    """
+    Renders a profile dataclass as compact text.
+
+    Args
+        profile: profile to render
+            UserProfile | ConnectionProfile
+    Return
+        one "Label: value" line per non-empty field
+            str
+    """
+    lines = []
+    for name, label in compile_profile_formatter(type(profile)):
+        value = getattr(profile, name, None)
+        if value is None or value == "" or value == []:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value if item not in (None, ""))
+            if not value:
+                continue
+        lines.append(f"{label}: {value}")
+    return "\n".join(lines)
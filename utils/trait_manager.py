@@ -1,16 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from flask import current_app
+from infrastructure.cache import LRUCache
 from infrastructure.clients import get_openai_client
+from infrastructure.image_pool import run_image_task
 from infrastructure.logger import get_logger
+from services.repository import get_repository
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from utils.prompt_loader import load_system_prompt
+import copy
+import hashlib
 import json
 import openai
 import base64
 import os
+import threading
+import time
 from typing import List, Dict
 
 
 logger = get_logger(__name__)
 
+_stats_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+_cache_stats = {"hits": 0, "stored_hits": 0, "misses": 0}
+_cache: LRUCache | None = None  # Front of the stored per-item traits, keyed by (user_id, "img", sha256) / (user_id, "url", normalized URL)
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "igsh", "si", "ref", "ref_src"}  # Dropped from URLs, as is any utm_*
+
 def infer_situation(conversation):
     """
     Uses GPT to infer the messaging situation from a list of conversation turns.
@@ -88,59 +104,363 @@ Message:
         logger.error("[%s] Error: %s", err_point, e)
         return {"tone": "neutral", "confidence": 0.0}
 
-def infer_personality_traits_from_pics(image_data: List[bytes]) -> List[Dict[str, float]]:
-    """
-    Infer personality traits from one or more pictures of a connection.
+def _load_inference_prompt() -> str:
+    prompt_file = os.path.join(current_app.root_path, 'resources', 'spurly_inference_intro_prompt.txt')
+    with open(prompt_file, 'r') as f:
+        return f.read().strip()
+
+
+def _parse_traits(content: str) -> List[Dict[str, float]]:
+    """ Accepts the prompt's {"personality_traits": [...]} object or a bare list of traits. """
+    parsed = json.loads(content)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("personality_traits", [])
+    return [t for t in parsed if isinstance(t, dict) and "personality_trait" in t and "confidence_score" in t]
+
+
+def _record_inference(kind: str, response, elapsed_ms: float, images: int = 0, image_bytes: int = 0):
+    """ Accumulates token usage and latency per inference kind; see get_trait_inference_stats. """
+    usage = getattr(response, "usage", None)
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+    with _stats_lock:
+        stats = _stats.setdefault(kind, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                         "latency_ms_total": 0.0, "images": 0, "image_bytes": 0})
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_ms_total"] += elapsed_ms
+        stats["images"] += images
+        stats["image_bytes"] += image_bytes
+    logger.info("Trait inference (%s): %.1fms prompt_tokens=%d completion_tokens=%d images=%d image_bytes=%d",
+                kind, elapsed_ms, prompt_tokens, completion_tokens, images, image_bytes)
+
+
+def get_trait_inference_stats() -> dict:
+    """ Returns per-kind call counts, token usage and average latency (ms) of trait inference, and per-item cache hits, in this process. """
+    with _stats_lock:
+        stats = {kind: dict(values) for kind, values in _stats.items()}
+        cache_stats = dict(_cache_stats)
+    for values in stats.values():
+        values["avg_latency_ms"] = values["latency_ms_total"] / max(values["calls"], 1)
+        values["avg_prompt_tokens"] = values["prompt_tokens"] / max(values["calls"], 1)
+    served = cache_stats["hits"] + cache_stats["stored_hits"]
+    cache_stats["hit_rate"] = served / max(served + cache_stats["misses"], 1)
+    stats["cache"] = cache_stats
+    return stats
 
-    Expected callers:
-        - create_connection()
-        - update_connection()
+
+def prepare_trait_images(image_data: List[bytes]) -> List[bytes | None]:
+    """
+    Downscales images (in the image pool) to TRAIT_IMAGE_MAX_SIDE and re-encodes them as JPEG.
 
     Args:
-        image_data (List[bytes]): A list of raw image byte blobs (e.g., JPEG/PNG)
-            for the connection whose personality traits we want to infer.
+        image_data (List[bytes]): raw uploaded images (JPEG/PNG/...)
 
     Returns:
-        List[Dict[str, float]]: A mapping from inferred personality trait names
-            to confidence scores (0.0–1.0).
+        List[bytes | None]: compact JPEG images, None where an image could not be decoded
     """
-    # 1) Base64‑encode each image so it can be sent in a text prompt
-    encoded_imgs = [base64.b64encode(img).decode("utf-8") for img in image_data]
+    max_side = int(current_app.config.get('TRAIT_IMAGE_MAX_SIDE', 512))
+    jpeg_quality = int(current_app.config.get('TRAIT_IMAGE_JPEG_QUALITY', 80))
+    prepared = []
+    for img in image_data:
+        jpeg = run_image_task("downscale", img, max_side=max_side, jpeg_quality=jpeg_quality, reencode=True)
+        if jpeg is None:
+            logger.warning("Could not decode an image for trait inference; skipping it.")
+        prepared.append(jpeg)
+    return prepared
+
+
+def batch_trait_images(images: List[tuple], max_images: int, max_bytes: int) -> List[List[tuple]]:
+    """
+    Splits (key, image) pairs into request batches of at most max_images images and max_bytes of
+    image data, keeping each image with its key. An image larger than max_bytes on its own still
+    gets a batch to itself.
+    """
+    batches: List[List[tuple]] = []
+    current: List[tuple] = []
+    current_bytes = 0
+    for key, img in images:
+        if current and (len(current) >= max_images or current_bytes + len(img) > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append((key, img))
+        current_bytes += len(img)
+    if current:
+        batches.append(current)
+    return batches
 
-    # 2) Build a prompt asking the model to analyze the images
-    prompt_file = os.path.join(current_app.root_path, 'resources', 'spurly_inference_intro_prompt.txt')
-    with open(prompt_file, 'r') as f:
-        prompt_template = f.read().strip()
-    image_prompt_appendix = "\nThe following images are Base64-ended. There is one person commonly shown in all images. You should infer personality traits about that one person. "
-    f"\n\nImages: \n{json.dumps(encoded_imgs)}"
-    prompt = prompt_template.join(image_prompt_appendix)
 
-    # 3) Call the OpenAI ChatCompletion API
+def normalize_profile_url(link: str) -> str:
+    """
+    Canonical form of a profile URL for caching: https, lowercase host without "www.", no
+    trailing slash, and no fragment or tracking parameters.
+    """
+    parts = urlsplit(link.strip() if "://" in link else "https://" + link.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)])
+    return urlunsplit(("https", host, parts.path.rstrip("/"), query, ""))
+
+
+def _trait_cache() -> LRUCache:
+    global _cache
+    if _cache is None:
+        with _stats_lock:
+            if _cache is None:
+                _cache = LRUCache(int(current_app.config.get('TRAIT_CACHE_MAX_ENTRIES', 4096)),
+                                  float(current_app.config.get('TRAIT_CACHE_TTL', 7 * 24 * 3600)))
+    return _cache
+
+
+def _record_cache(hits: int, stored_hits: int, misses: int):
+    with _stats_lock:
+        stats = _cache_stats
+        stats["hits"] += hits
+        stats["stored_hits"] += stored_hits
+        stats["misses"] += misses
+
+
+def _record_id(key: tuple) -> str:
+    """ Stored record id of a cache key: the image hash, or a hash of the normalized URL (URLs are not valid ids). """
+    _, kind, value = key
+    return f"{kind}_{value if kind == 'img' else hashlib.sha256(value.encode('utf-8')).hexdigest()}"
+
+
+def forget_user_traits(user_id: str):
+    """ Drops the user's entries from this process's trait cache (the stored records go with the account). """
+    if _cache is not None:
+        _cache.discard_prefix((user_id,))
+
+
+def _load_stored_traits(user_id: str, keys: List[tuple]) -> Dict[tuple, list]:
+    """
+    The user's per-item traits stored by any process within TRAIT_CACHE_TTL. Expired records
+    are deleted. A storage failure only costs a model call.
+    """
+    ids = {_record_id(key): key for key in keys}
+    repository = get_repository()
+    try:
+        records = repository.get_item_traits(user_id, list(ids))
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: could not read stored item traits: %s", err_point, e)
+        return {}
+    max_age = float(current_app.config.get('TRAIT_CACHE_TTL', 7 * 24 * 3600))
+    now = datetime.now(timezone.utc)
+    stored = {}
+    expired = []
+    for record_id, record in records.items():
+        created_at = record.get("created_at")
+        if isinstance(created_at, datetime) and (now - created_at).total_seconds() <= max_age:
+            stored[ids[record_id]] = record.get("personality_traits") or []
+        else:
+            expired.append(record_id)
+    if expired:
+        try:
+            repository.delete_item_traits(user_id, expired)
+        except Exception as e:
+            err_point = __package__ or __name__
+            logger.error("[%s] Error: could not delete expired item traits: %s", err_point, e)
+    return stored
+
+
+def _store_traits(user_id: str, key: tuple, traits: list):
+    now = datetime.now(timezone.utc)
+    try:
+        get_repository().set_item_traits(user_id, _record_id(key), {
+            "personality_traits": traits,
+            "created_at": now,
+            # For a Firestore TTL policy on item_traits.expires_at; records never read again are removed too
+            "expires_at": now + timedelta(seconds=float(current_app.config.get('TRAIT_CACHE_TTL', 7 * 24 * 3600))),
+        })
+    except Exception as e:
+        err_point = __package__ or __name__
+        logger.error("[%s] Error: could not store item traits: %s", err_point, e)
+
+
+def _infer_image_batch(images: List[bytes]) -> tuple:
+    """ One model call for a batch of prepared images; returns _parse_item_traits output. """
+    prompt = (_load_inference_prompt()
+              + "\n\nINPUT:\nThe attached images all show the same person. Infer personality traits about that one person "
+              + "separately from each image. Respond with {\"images\": [...]}: one entry per image, in the order the images "
+              + "are attached, each entry an object in the OUTPUT FORMAT above.")
+    detail = current_app.config.get('TRAIT_IMAGE_DETAIL', 'low')
+    content = [{"type": "text", "text": prompt}] + [
+        {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64," + base64.b64encode(img).decode("ascii"), "detail": detail}}
+        for img in images
+    ]
     chat_client = get_openai_client()
+    started = time.perf_counter()
     resp = chat_client.chat.completions.create(
-        model=current_app.config['AI_MODEL'], 
-        messages=[{"role": current_app.config['AI_MESSAGES_ROLE_USER'], "content": prompt}], 
+        model=current_app.config['AI_MODEL'],
+        messages=[{"role": current_app.config['AI_MESSAGES_ROLE_USER'], "content": content}],
         temperature=current_app.config['AI_TEMPERATURE_RETRY'],
+        response_format={"type": "json_object"},
     )
-    
+    _record_inference("pics", resp, (time.perf_counter() - started) * 1000, len(images), sum(len(img) for img in images))
+    return _parse_item_traits((resp.choices[0].message.content or "").strip(), "images", len(images))
 
-    # 4) Parse the JSON response
-    content = (resp.choices[0].message.content or "").strip()
-    traits: List[Dict[str, float]] = json.loads(content)
-    return traits
+
+def _infer_links(links: List[str]) -> tuple:
+    """ One model call for a set of profile URLs; returns _parse_item_traits output. """
+    prompt = (_load_inference_prompt()
+              + "\n\nINPUT:\nThe following URLs are all associated with the same person. You should visit each of the URLs and review the available images, posts, text, and other accessible information. You should infer personality traits about that person "
+              + "separately from each URL. Respond with {\"links\": [...]}: one entry per URL, in the order listed, each entry an "
+              + "object in the OUTPUT FORMAT above."
+              + f"\n\nURLs: \n{json.dumps(links)}")
+    chat_client = get_openai_client()
+    started = time.perf_counter()
+    resp = chat_client.chat.completions.create(
+        model=current_app.config['AI_MODEL'],
+        messages=[{"role": current_app.config['AI_MESSAGES_ROLE_USER'], "content": prompt}],
+        temperature=current_app.config['AI_TEMPERATURE_RETRY'],
+        response_format={"type": "json_object"},
+    )
+    _record_inference("links", resp, (time.perf_counter() - started) * 1000)
+    return _parse_item_traits((resp.choices[0].message.content or "").strip(), "links", len(links))
 
 
-def infer_personality_traits_from_links(
-    links: List[str]
-) -> List[Dict[str, float]]:
+def _parse_item_traits(content: str, items_key: str, count: int) -> tuple:
+    """
+    Parses a {items_key: [{"personality_traits": [...]}, ...]} reply into (per-item traits, None).
+    If the model answered for the whole set instead, returns (None, joint traits): those are still
+    used, but not cached, since they are no single item's own result.
     """
-    Infer personality traits from a connection's social media profiles.
+    parsed = json.loads(content)
+    entries = parsed.get(items_key) if isinstance(parsed, dict) else None
+    if isinstance(entries, list) and len(entries) == count:
+        return [_parse_traits(json.dumps(entry)) for entry in entries], None
+    return None, _parse_traits(content)
+
+
+def infer_personality_traits(user_id: str, image_data: List[bytes], links: List[str]) -> List[Dict[str, float]]:
+    """
+    Infer personality traits from a connection's pictures and social media profiles.
+
+    Traits are inferred per item and stored under the user (users/{user_id}/item_traits, so
+    account deletion removes them) by image content hash and normalized URL, with an in-process
+    LRU in front, so re-submitting the same media (e.g. on update, from any process or after a
+    restart) costs no model call. Records older than TRAIT_CACHE_TTL are inferred again. Uncached links and
+    batches of uncached images (see infer_personality_traits_from_pics) are inferred
+    concurrently, up to TRAIT_INFERENCE_CONCURRENCY calls at a time. An item whose call fails
+    contributes no traits and is retried on the next request.
 
     Expected callers:
         - create_connection()
         - update_connection()
 
     Args:
+        user_id (str): owner of the connection; the stored traits are kept under this user
+        image_data (List[bytes]): raw image byte blobs (e.g., JPEG/PNG)
+        links (List[str]): social media profile URLs
+
+    Returns:
+        List[Dict[str, float]]: traits of every item, cached and new, with confidence scores
+            (0.0–1.0); see merge_trait_scores for the top-N selection.
+    """
+    cache = _trait_cache()
+    traits: List[Dict[str, float]] = []
+    pending_images: Dict[tuple, bytes] = {}
+    for img in image_data or []:
+        key = (user_id, "img", hashlib.sha256(img).hexdigest())
+        cached = cache.get(key)
+        if cached is not None:
+            traits += copy.deepcopy(cached)
+        elif key not in pending_images:
+            pending_images[key] = img
+    pending_links: Dict[tuple, str] = {}
+    for link in links or []:
+        if not link or not link.strip():
+            continue
+        key = (user_id, "url", normalize_profile_url(link))
+        cached = cache.get(key)
+        if cached is not None:
+            traits += copy.deepcopy(cached)
+        elif key not in pending_links:
+            pending_links[key] = link.strip()
+    hits = len(image_data or []) + len([link for link in links or [] if link and link.strip()]) - len(pending_images) - len(pending_links)
+    stored = _load_stored_traits(user_id, list(pending_images) + list(pending_links)) if pending_images or pending_links else {}
+    for key, item in stored.items():
+        cache.set(key, copy.deepcopy(item))
+        traits += copy.deepcopy(item)
+        pending_images.pop(key, None)
+        pending_links.pop(key, None)
+    misses = len(pending_images) + len(pending_links)
+    _record_cache(hits, len(stored), misses)
+    if not misses:
+        return traits
+
+    app = current_app._get_current_object()
+
+    def in_app(fn, *args):
+        with app.app_context():
+            return fn(*args)
+
+    concurrency = max(1, int(current_app.config.get('TRAIT_INFERENCE_CONCURRENCY', 4)))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        jobs = []  # (keys, future)
+        if pending_links:
+            jobs.append((list(pending_links), executor.submit(in_app, _infer_links, list(pending_links.values()))))
+        if pending_images:
+            # Downscaling overlaps with the links call
+            prepared = [(key, jpeg) for key, jpeg in zip(pending_images, prepare_trait_images(list(pending_images.values()))) if jpeg is not None]
+            budget = (int(current_app.config.get('TRAIT_IMAGES_PER_REQUEST', 4)),
+                      int(current_app.config.get('TRAIT_IMAGE_REQUEST_MAX_BYTES', 4 * 1024 * 1024)))
+            for batch in batch_trait_images(prepared, *budget):
+                jobs.append(([key for key, _ in batch], executor.submit(in_app, _infer_image_batch, [jpeg for _, jpeg in batch])))
+
+        for keys, future in jobs:
+            try:
+                item_traits, joint_traits = future.result()
+            except Exception as e:
+                err_point = __package__ or __name__
+                logger.error("[%s] Error: trait inference for %d items failed: %s", err_point, len(keys), e)
+                continue
+            if item_traits is None:
+                logger.warning("Trait inference reply was not per item; using it uncached for %d items.", len(keys))
+                traits += joint_traits
+                continue
+            for key, item in zip(keys, item_traits):
+                cache.set(key, copy.deepcopy(item))
+                _store_traits(user_id, key, item)
+                traits += item
+    return traits
+
+
+def infer_personality_traits_from_pics(user_id: str, image_data: List[bytes]) -> List[Dict[str, float]]:
+    """
+    Infer personality traits from one or more pictures of a connection.
+
+    Images are downscaled and re-encoded as JPEG (prepare_trait_images), then sent as multimodal
+    image parts, at most TRAIT_IMAGES_PER_REQUEST images / TRAIT_IMAGE_REQUEST_MAX_BYTES per
+    request. With more images than one request allows, the batches are inferred concurrently.
+    Results are cached per image (see infer_personality_traits).
+
+    Args:
+        user_id (str): owner of the connection
+        image_data (List[bytes]): A list of raw image byte blobs (e.g., JPEG/PNG)
+            for the connection whose personality traits we want to infer.
+
+    Returns:
+        List[Dict[str, float]]: A mapping from inferred personality trait names
+            to confidence scores (0.0–1.0).
+    """
+    return infer_personality_traits(user_id, image_data, [])
+
+
+def infer_personality_traits_from_links(
+    user_id: str,
+    links: List[str]
+) -> List[Dict[str, float]]:
+    """
+    Infer personality traits from a connection's social media profiles. Results are cached per
+    normalized URL (see infer_personality_traits).
+
+    Args:
+        user_id (str): owner of the connection
         links (List[str]): A list of social media profile URLs (e.g., Facebook,
             Instagram, LinkedIn) for the connection.
 
@@ -148,23 +468,31 @@ def infer_personality_traits_from_links(
         List[Dict[str, float]]: A mapping from inferred personality trait names
             to confidence scores (0.0–1.0).
     """
-    # 1) Build a prompt asking the model to analyze the profile URLs.
-    prompt_file = os.path.join(current_app.root_path, 'resources', 'spurly_inference_intro_prompt.txt')
-    with open(prompt_file, 'r') as f:
-        prompt_template = f.read().strip()
-    links_prompt_appendix = "\nThe following URLs are all associated with the same person. You should visit each of the URLs and review the available images, posts, text, and other accessible information. You should infer personality traits about that person. "
-    f"\n\nURLs: \n{json.dumps(links)}"
-    prompt = prompt_template.join(links_prompt_appendix)
+    return infer_personality_traits(user_id, [], links)
 
-    # 2) Call the OpenAI ChatCompletion API
-    chat_client = get_openai_client()
-    resp = chat_client.chat.completions.create(
-        model=current_app.config['AI_MODEL'], 
-        messages=[{"role": current_app.config['AI_MESSAGES_ROLE_USER'], "content": prompt}], 
-        temperature=current_app.config['AI_TEMPERATURE_RETRY'],
-    )
 
-    # 3) Parse the JSON response
-    content = (resp.choices[0].message.content or "").strip()
-    traits: List[Dict[str, float]] = json.loads(content)
-    return traits
\ No newline at end of file
+def merge_trait_scores(traits: List[Dict[str, float]], limit: int = 4) -> List[str]:
+    """
+    Top trait names by confidence across all items. A trait inferred from several items
+    (case-insensitive) counts once, with its highest score.
+
+    Args:
+        traits (List[Dict[str, float]]): traits from infer_personality_traits
+        limit (int): number of traits to keep
+
+    Returns:
+        List[str]: trait names, highest confidence first
+    """
+    best: Dict[str, tuple] = {}
+    for trait in traits:
+        name = str(trait.get("personality_trait") or "").strip()
+        if not name:
+            continue
+        try:
+            score = float(trait.get("confidence_score") or 0.0)
+        except (TypeError, ValueError):
+            score = 0.0
+        key = name.lower()
+        if key not in best or score > best[key][0]:
+            best[key] = (score, name)
+    return [name for _, name in sorted(best.values(), key=lambda item: item[0], reverse=True)[:limit]]
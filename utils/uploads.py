@@ -0,0 +1,69 @@
+from flask import Request
+from infrastructure.logger import get_logger
+from tempfile import SpooledTemporaryFile
+import io
+
+logger = get_logger(__name__)
+
+# Upload parts up to this size stay in memory; larger parts roll over to a temp file on disk.
+UPLOAD_SPOOL_MAX_MEMORY = 512 * 1024
+
+class SpooledUploadRequest(Request):
+    """
+    Request class that buffers each multipart file part in its own SpooledTemporaryFile.
+
+    Werkzeug's default picks memory or disk for every part based on the total request size.
+    Spooling per part keeps small parts in memory and sends large photos to disk while the
+    body is parsed, so a photo-heavy request does not hold every upload in worker memory.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY, mode="rb+")
+
+
+def get_upload_size(file_storage) -> int:
+    """
+    Gets the size of an uploaded file without reading it.
+
+    Args
+        file_storage: uploaded file from request.files
+            werkzeug.datastructures.FileStorage
+    Return
+        size of the upload in bytes
+            int
+    """
+    stream = file_storage.stream
+    position = stream.tell()
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def read_upload_buffer(file_storage) -> memoryview:
+    """
+    Reads an uploaded file into a single buffer and returns a memoryview over it.
+
+    In-memory parts are exposed without copying; spooled parts are read once with readinto,
+    so the bytes are not copied again on their way to the decoder (np.frombuffer, base64,
+    hashing and shared memory all accept memoryviews).
+
+    Args
+        file_storage: uploaded file from request.files
+            werkzeug.datastructures.FileStorage
+    Return
+        view of the upload's bytes
+            memoryview
+    """
+    stream = file_storage.stream
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer()
+
+    size = get_upload_size(file_storage)
+    buffer = bytearray(size)
+    stream.seek(0)
+    read = stream.readinto(buffer)
+    if read != size:
+        logger.warning("Short read on upload '%s': %d of %d bytes", file_storage.filename, read, size)
+        return memoryview(buffer)[:read]
+    return memoryview(buffer)